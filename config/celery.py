@@ -21,6 +21,11 @@ app.conf.beat_schedule = {
         'schedule': crontab(hour=3, minute=0),  # Каждый день в 3:00 ночи
         'args': (),
     },
+    'drain-task-outbox-every-minute': {
+        'task': 'materials.tasks.celery_tasks.drain_task_outbox',
+        'schedule': 60.0,  # Каждую минуту
+        'args': (),
+    },
 }
 
 # Настройка таймзоны
@@ -9,9 +9,12 @@ Django settings for config project.
 """
 
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'django-insecure-*6^#w(mkf)yky%yqyn1a4#p%s8@3((e_0d9!-r(rq1k#a=tk8t'
@@ -89,6 +92,42 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
 ]
+# Хеширование паролей: argon2 | bcrypt | pbkdf2 | auto (argon2 или bcrypt, если
+# библиотека установлена, иначе pbkdf2). Новые пароли хешируются выбранным
+# хешером, остальные из списка только проверяют старые хеши; при входе такой
+# хеш пересчитывается выбранным хешером (как и после смены параметров)
+PASSWORD_HASHER_STRATEGIES = {
+    'argon2': ('argon2', 'users.hashers.TunedArgon2PasswordHasher'),
+    'bcrypt': ('bcrypt', 'users.hashers.TunedBCryptSHA256PasswordHasher'),
+    'pbkdf2': (None, 'users.hashers.TunedPBKDF2PasswordHasher'),
+}
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'auto')
+if PASSWORD_HASHER == 'auto':
+    PASSWORD_HASHER = next(
+        name for name, (library, _) in PASSWORD_HASHER_STRATEGIES.items()
+        if library is None or find_spec(library) is not None
+    )
+if PASSWORD_HASHER not in PASSWORD_HASHER_STRATEGIES:
+    raise ImproperlyConfigured(
+        f"Неизвестный PASSWORD_HASHER '{PASSWORD_HASHER}', допустимые значения: "
+        f"auto, {', '.join(PASSWORD_HASHER_STRATEGIES)}"
+    )
+PASSWORD_HASHERS = [PASSWORD_HASHER_STRATEGIES[PASSWORD_HASHER][1]] + [
+    hasher for name, (_, hasher) in PASSWORD_HASHER_STRATEGIES.items() if name != PASSWORD_HASHER
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+PASSWORD_ARGON2_TIME_COST = int(os.getenv('PASSWORD_ARGON2_TIME_COST', 2))
+PASSWORD_ARGON2_MEMORY_COST = int(os.getenv('PASSWORD_ARGON2_MEMORY_COST', 19456))
+PASSWORD_ARGON2_PARALLELISM = int(os.getenv('PASSWORD_ARGON2_PARALLELISM', 1))
+PASSWORD_BCRYPT_ROUNDS = int(os.getenv('PASSWORD_BCRYPT_ROUNDS', 11))
+PASSWORD_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', 1000000))
+# Потоки пула хеширования (0 - по числу ядер) и максимум операций в очереди,
+# сверх которого вход и регистрация отвечают 429
+PASSWORD_HASHING_WORKERS = int(os.getenv('PASSWORD_HASHING_WORKERS', 0))
+PASSWORD_HASHING_MAX_PENDING = int(os.getenv('PASSWORD_HASHING_MAX_PENDING', 64))
+
 LANGUAGE_CODE = 'ru-ru'
 TIME_ZONE = 'Europe/Moscow'
 USE_I18N = True
@@ -106,7 +145,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ),
@@ -116,6 +155,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
+    # 429 при переполнении пула хеширования паролей
+    'EXCEPTION_HANDLER': 'users.exceptions.exception_handler',
 }
 
 # JWT настройки
@@ -165,6 +206,63 @@ SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
 }
 
+# Кэширование: Redis при заданном REDIS_CACHE_URL, иначе локальная память
+REDIS_CACHE_URL = os.getenv('REDIS_CACHE_URL')
+if REDIS_CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_CACHE_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Кеш общий для всех процессов (веб-воркеры, Celery). Только на таком кеше
+# работает чтение по claims ролей из JWT: отзыв claims - сдвиг поколения в кеше
+SHARED_CACHE = bool(REDIS_CACHE_URL)
+
+# Время жизни закэшированных ответов курсов и уроков (секунды)
+MATERIALS_CACHE_TIMEOUT = int(os.getenv('MATERIALS_CACHE_TIMEOUT', 300))
+
+# Ниже этой оценки планировщика списки считают точный COUNT(*);
+# без статистики планировщика кешируются только COUNT не меньше порога
+PAGINATION_EXACT_COUNT_THRESHOLD = int(os.getenv('PAGINATION_EXACT_COUNT_THRESHOLD', 10000))
+# Время жизни закешированного COUNT на бэкендах без статистики планировщика (секунды)
+PAGINATION_COUNT_CACHE_TIMEOUT = int(os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 60))
+
+# Поиск по курсам и урокам: auto (по СУБД), postgres, fts5 или icontains
+MATERIALS_SEARCH_BACKEND = os.getenv('MATERIALS_SEARCH_BACKEND', 'auto')
+# Как часто индекс поиска в памяти сверяется с изменениями из других процессов (секунды);
+# без SHARED_CACHE он с этим периодом перестраивается в фоне целиком
+MATERIALS_INVERTED_INDEX_REFRESH_SECONDS = int(os.getenv('MATERIALS_INVERTED_INDEX_REFRESH_SECONDS', 30))
+# Сколько хранятся id измененных документов в журнале индекса (секунды);
+# процесс, отставший сильнее, перестраивает индекс в фоне
+MATERIALS_INVERTED_INDEX_CHANGE_LOG_TIMEOUT = int(os.getenv('MATERIALS_INVERTED_INDEX_CHANGE_LOG_TIMEOUT', 3600))
+# Строить индекс поиска в фоне при первом запросе процесса (веб-серверы)
+MATERIALS_INVERTED_INDEX_WARM_UP = os.getenv('MATERIALS_INVERTED_INDEX_WARM_UP', 'False').lower() == 'true'
+# Строк за одно чтение курсора и в одной записи потоковой выгрузки
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+# Максимум уроков в одном запросе пакетного создания или обновления
+LESSONS_BULK_MAX_SIZE = int(os.getenv('LESSONS_BULK_MAX_SIZE', 500))
+# Пакетная подписка: максимум пар пользователь x курс в запросе и строк в одном INSERT
+SUBSCRIPTIONS_BULK_MAX_PAIRS = int(os.getenv('SUBSCRIPTIONS_BULK_MAX_PAIRS', 100000))
+SUBSCRIPTIONS_BULK_BATCH_SIZE = int(os.getenv('SUBSCRIPTIONS_BULK_BATCH_SIZE', 1000))
+# Сколько секунд группы пользователя (роли для проверок прав) живут в кеше
+USER_ROLES_CACHE_TIMEOUT = int(os.getenv('USER_ROLES_CACHE_TIMEOUT', 60))
+# Кеш пользователей для JWT-аутентификации: общий (секунды; только при SHARED_CACHE,
+# иначе блокировка в другом процессе была бы не видна до истечения записи)
+# и в памяти процесса (секунды, записей)
+USER_CACHE_TIMEOUT = int(os.getenv('USER_CACHE_TIMEOUT', 300))
+USER_CACHE_LOCAL_TIMEOUT = int(os.getenv('USER_CACHE_LOCAL_TIMEOUT', 5))
+USER_CACHE_LOCAL_SIZE = int(os.getenv('USER_CACHE_LOCAL_SIZE', 10000))
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', 'redis://localhost:6379/0')
@@ -174,6 +272,32 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = os.getenv('CELERY_TIMEZONE', 'Europe/Moscow')
 CELERY_ENABLE_UTC = False
 
+# Размер пачки писем в рассылке об обновлении курса
+COURSE_UPDATE_EMAIL_CHUNK_SIZE = int(os.getenv('COURSE_UPDATE_EMAIL_CHUNK_SIZE', 500))
+# Стратегия доставки: per_recipient, bcc или personalized
+COURSE_UPDATE_DELIVERY_STRATEGY = os.getenv('COURSE_UPDATE_DELIVERY_STRATEGY', 'per_recipient')
+# Число адресов в BCC одного письма для стратегии bcc
+COURSE_UPDATE_BCC_BATCH_SIZE = int(os.getenv('COURSE_UPDATE_BCC_BATCH_SIZE', 50))
+# Окно объединения правок курса (секунды): первая правка уходит сразу,
+# следующие - одним уведомлением не чаще раза в окно (4 часа)
+COURSE_UPDATE_DEBOUNCE_SECONDS = int(os.getenv('COURSE_UPDATE_DEBOUNCE_SECONDS', 4 * 60 * 60))
+# Максимум строк в сводке изменений письма
+COURSE_UPDATE_SUMMARY_LIMIT = int(os.getenv('COURSE_UPDATE_SUMMARY_LIMIT', 20))
+
+# Outbox задач Celery: размер пачки, хранение отправленных. Сообщения передает
+# в брокер drain_task_outbox по расписанию beat; OUTBOX_PUBLISH_ON_COMMIT=True
+# отправляет их еще и сразу после коммита в фоновом потоке
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 100))
+OUTBOX_PUBLISH_ON_COMMIT = os.getenv('OUTBOX_PUBLISH_ON_COMMIT', 'False').lower() == 'true'
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', 7))
+
+# Блокировка неактивных пользователей: размер пачки и отчет для администратора.
+# В отчете email пользователей: каталог не должен раздаваться как MEDIA_ROOT
+INACTIVE_USERS_BATCH_SIZE = int(os.getenv('INACTIVE_USERS_BATCH_SIZE', 1000))
+INACTIVE_USERS_REPORT_DIR = os.getenv('INACTIVE_USERS_REPORT_DIR', str(BASE_DIR / 'private' / 'reports'))
+# Отчеты больше этого размера (байты) не прикладываются к письму
+INACTIVE_USERS_REPORT_ATTACHMENT_MAX_SIZE = int(os.getenv('INACTIVE_USERS_REPORT_ATTACHMENT_MAX_SIZE', 5 * 1024 * 1024))
+
 # Celery Beat (для периодических задач)
 CELERY_BEAT_SCHEDULER = 'django_celery_beat.schedulers:DatabaseScheduler'
 
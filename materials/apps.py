@@ -1,5 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
 
 
 class MaterialsConfig(AppConfig):
     name = 'materials'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .services import inverted_index
+
+        if settings.MATERIALS_INVERTED_INDEX_WARM_UP:
+            request_started.connect(inverted_index.warm_up, dispatch_uid=inverted_index.WARM_UP_UID)
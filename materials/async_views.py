@@ -0,0 +1,271 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+
+from users.authentication import ClaimsJWTAuthentication
+from .models import Course, Lesson
+from .renderers import dumps
+from .row_builders import compile_row_builder
+from .serializers import (
+    CourseDetailSerializer,
+    CourseListSerializer,
+    LessonDetailSerializer,
+    LessonListSerializer,
+)
+from .services import cache_service, catalog_service
+from .services.subscription_service import aget_subscribed_course_ids
+from .views import LESSONS_PREFETCH_ORDERING, CourseViewSet, LessonViewSet
+
+BOOLEAN_VALUES = {'true': True, 'True': True, 'false': False, 'False': False}
+
+
+class AsyncReadView(View):
+    """
+    Чтение списка и объекта без занятого потока на запрос (под ASGI)
+    по тем же адресам, что у viewset_class.
+
+    Аутентификация по JWT (ClaimsJWTAuthentication.aauthenticate), кеш
+    ответов и ORM (aiterator/afirst) работают через async API Django,
+    поэтому медленные клиенты ждут в цикле событий, а не в потоках воркера.
+    Данные, пагинация (pagination_class viewset'а) и ключи кеша те же, что
+    у быстрого пути FastListMixin: строки .values() и функции строк
+    materials.row_builders, вложенные списки (?expand=lessons) - отдельным
+    запросом на страницу.
+
+    Запись, OPTIONS, параметры, которые так обслужить нельзя (поиск, сортировка,
+    фильтр с неверным значением), запросы без JWT (сессия, Basic) и
+    Browsable API передаются синхронному viewset_class в потоке.
+    """
+    model = None
+    viewset_class = None
+    list_serializer_class = None
+    detail_serializer_class = None
+    cache_list_scopes = ()
+    cache_object_scope = None
+    cache_user_specific = False
+    # Вложенные списки: поле -> (модель, колонка внешнего ключа, порядок)
+    nested_fields = {}
+    filter_query_params = ()
+    served_query_params = ('fields', 'expand', 'page', 'page_size', 'cursor', 'pagination', 'with_count')
+    authentication_class = ClaimsJWTAuthentication
+    list_actions = {'get': 'list', 'post': 'create'}
+    detail_actions = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Как APIView.as_view: CSRF при входе по сессии проверяет
+        # SessionAuthentication viewset'а, запросам с JWT он не нужен
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def get(self, request, pk=None):
+        if 'text/html' in request.headers.get('Accept', ''):
+            return await self.sync_response(request, pk)
+        try:
+            auth = await self.authentication_class().aauthenticate(request)
+            if auth is None:
+                return await self.sync_response(request, pk)
+
+            request = Request(request)
+            request.user = auth[0]
+            if pk is None:
+                return await self.list(request)
+            return await self.retrieve(request, pk)
+        except exceptions.APIException as exc:
+            return self.error_response(exc)
+
+    async def post(self, request, pk=None):
+        return await self.sync_response(request, pk)
+
+    # OPTIONS - метаданные DRF от viewset
+    put = patch = delete = options = post
+
+    async def list(self, request):
+        served = set(self.served_query_params) | set(self.filter_query_params)
+        if any(name not in served for name in request.query_params):
+            return await self.sync_response(request._request)
+
+        key = await cache_service.abuild_response_key(request, self.cache_list_scopes, self.cache_user_specific)
+        data = await cache_service.aget_cached(key)
+        if data is not None:
+            return self.json_response(data, 'HIT')
+
+        filters = await self.get_filters(request.query_params)
+        plan = await self.get_plan(request, self.list_serializer_class)
+        if filters is None or plan is None:
+            return await self.sync_response(request._request)
+        serializer, columns, build, nested = plan
+
+        paginator = self.viewset_class.pagination_class()
+        columns += [column for column in paginator.get_required_columns(request) if column not in columns]
+        queryset = self.get_queryset(serializer).filter(**filters).values(*columns)
+        rows = await paginator.apaginate_queryset(queryset, request, self)
+        data = paginator.get_paginated_response(await self.build_rows(rows, build, nested)).data
+
+        await cache_service.aset_cached(key, data, settings.MATERIALS_CACHE_TIMEOUT)
+        return self.json_response(data, 'MISS')
+
+    async def retrieve(self, request, pk):
+        scopes = [cache_service.object_scope(self.cache_object_scope, pk)]
+        key = await cache_service.abuild_response_key(request, scopes, self.cache_user_specific)
+        data = await cache_service.aget_cached(key)
+        if data is not None:
+            return self.json_response(data, 'HIT')
+
+        plan = await self.get_plan(request, self.detail_serializer_class)
+        if plan is None:
+            return await self.sync_response(request._request, pk)
+        serializer, columns, build, nested = plan
+
+        row = await self.get_queryset(serializer).filter(pk=pk).values(*columns).afirst()
+        if row is None:
+            return self.error_response(
+                exceptions.NotFound(f'No {self.model._meta.object_name} matches the given query.')
+            )
+        data, = await self.build_rows([row], build, nested)
+
+        await cache_service.aset_cached(key, data, settings.MATERIALS_CACHE_TIMEOUT)
+        return self.json_response(data, 'MISS')
+
+    async def get_filters(self, params):
+        """Условия filter() из параметров запроса или None, если их разбирает синхронный viewset"""
+        return {}
+
+    def get_queryset(self, serializer):
+        return self.model.objects.all()
+
+    def get_serializer_context(self, request):
+        def query_param_set(name):
+            value = request.query_params.get(name, '')
+            return {item.strip() for item in value.split(',') if item.strip()}
+
+        return {
+            'request': request,
+            'fields': query_param_set('fields') or None,
+            'expand': query_param_set('expand'),
+        }
+
+    async def prepare_serializer(self, serializer, request):
+        """Дополняет контекст сериализатора данными, которые читаются асинхронно"""
+
+    async def get_plan(self, request, serializer_class):
+        """
+        (сериализатор, колонки, функция строки, вложенные списки) или None,
+        если выбранные поля нельзя вывести из .values()
+        """
+        serializer = serializer_class(context=self.get_serializer_context(request))
+        nested = []
+        for name, (model, foreign_key, ordering) in self.nested_fields.items():
+            field = serializer.fields.get(name)
+            if field is None:
+                continue
+            child = compile_row_builder(field.child)
+            if child is None:
+                return None
+            serializer.fields.pop(name)
+            nested.append((name, model, foreign_key, ordering, child))
+
+        builder = compile_row_builder(serializer)
+        if builder is None:
+            return None
+        columns, build = builder
+        if nested and 'id' not in columns:
+            columns.append('id')
+        await self.prepare_serializer(serializer, request)
+        return serializer, columns, build, nested
+
+    async def build_rows(self, rows, build, nested):
+        data = [build(row) for row in rows]
+        ids = [row['id'] for row in rows] if nested else []
+        for name, model, foreign_key, ordering, (columns, child_build) in nested:
+            children = {pk: [] for pk in ids}
+            if ids:
+                queryset = model.objects.filter(**{f'{foreign_key}__in': ids}).order_by(*ordering)
+                async for child in queryset.values(*dict.fromkeys([*columns, foreign_key])).aiterator():
+                    children[child[foreign_key]].append(child_build(child))
+            for item, pk in zip(data, ids):
+                item[name] = children[pk]
+        return data
+
+    async def sync_response(self, request, pk=None):
+        """Ответ синхронного viewset_class в потоке"""
+        if pk is None:
+            view = self.viewset_class.as_view(self.list_actions)
+            kwargs = {}
+        else:
+            view = self.viewset_class.as_view(self.detail_actions)
+            kwargs = {'pk': pk}
+
+        def respond():
+            return view(request, **kwargs).render()
+
+        return await sync_to_async(respond)()
+
+    @staticmethod
+    def json_response(data, cache_status):
+        response = HttpResponse(dumps(data), content_type='application/json')
+        response['X-Cache'] = cache_status
+        return response
+
+    def error_response(self, exc):
+        """Ответ с ошибкой в формате rest_framework.views.exception_handler"""
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = HttpResponse(dumps(data), content_type='application/json', status=exc.status_code)
+        if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+            response['WWW-Authenticate'] = self.authentication_class().authenticate_header(None)
+        return response
+
+
+class CourseAsyncView(AsyncReadView):
+    """courses/ и courses/<id>/: чтение без потока, запись - CourseViewSet"""
+    model = Course
+    viewset_class = CourseViewSet
+    list_serializer_class = CourseListSerializer
+    detail_serializer_class = CourseDetailSerializer
+    cache_list_scopes = CourseViewSet.cache_list_scopes
+    cache_object_scope = CourseViewSet.cache_object_scope
+    cache_user_specific = True
+    nested_fields = {'lessons': (Lesson, 'course_id', LESSONS_PREFETCH_ORDERING)}
+    filter_query_params = ('is_published',)
+
+    async def get_filters(self, params):
+        if 'is_published' not in params:
+            return {}
+        value = BOOLEAN_VALUES.get(params['is_published'])
+        return None if value is None else {'is_published': value}
+
+    def get_queryset(self, serializer):
+        queryset = Course.objects.all()
+        if 'lessons_count' in serializer.fields:
+            queryset = queryset.annotate(lessons_count=catalog_service.lessons_count())
+        return queryset
+
+    async def prepare_serializer(self, serializer, request):
+        if 'is_subscribed' in serializer.fields:
+            serializer.context['subscribed_course_ids'] = await aget_subscribed_course_ids(request.user.pk)
+
+
+class LessonAsyncView(AsyncReadView):
+    """lessons/ и lessons/<id>/: чтение без потока, запись - LessonViewSet"""
+    model = Lesson
+    viewset_class = LessonViewSet
+    list_serializer_class = LessonListSerializer
+    detail_serializer_class = LessonDetailSerializer
+    cache_list_scopes = LessonViewSet.cache_list_scopes
+    cache_object_scope = LessonViewSet.cache_object_scope
+    filter_query_params = ('course',)
+
+    async def get_filters(self, params):
+        if 'course' not in params:
+            return {}
+        # Несуществующий курс - ошибка фильтра, ее формирует DjangoFilterBackend
+        try:
+            course_id = int(params['course'])
+        except ValueError:
+            return None
+        if not await Course.objects.filter(pk=course_id).aexists():
+            return None
+        return {'course_id': course_id}
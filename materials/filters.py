@@ -0,0 +1,17 @@
+from rest_framework.filters import SearchFilter
+
+from .services.search_service import get_search_backend
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    Параметр ?search= через бэкенд полнотекстового поиска (MATERIALS_SEARCH_BACKEND)
+    вместо цепочки ILIKE по search_fields. Результаты упорядочены по релевантности,
+    если не передан ?ordering=.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        text = request.query_params.get(self.search_param, '')
+        if not text.strip():
+            return queryset
+        return get_search_backend().search(queryset, text)
@@ -0,0 +1,34 @@
+import time
+
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from materials.services.notification_service import DELIVERY_STRATEGIES
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает стратегии доставки писем об обновлении курса на locmem-бэкенде'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                            help='Количество подписчиков для замеров')
+
+    def handle(self, *args, **options):
+        subject = 'Обновление курса: Бенчмарк'
+        body = '$greeting\n\nКурс "Бенчмарк" был обновлен.'
+
+        self.stdout.write(f"{'подписчиков':>12} {'стратегия':>14} {'писем':>8} {'сек':>8} {'получ./сек':>12}")
+        for size in options['sizes']:
+            recipients = [[f'student{i}@example.com', f'Студент {i}'] for i in range(size)]
+            for name, strategy_class in DELIVERY_STRATEGIES.items():
+                mail.outbox = []
+                connection = get_connection('django.core.mail.backends.locmem.EmailBackend')
+                started = time.perf_counter()
+                failed = strategy_class().deliver(subject, body, recipients, connection)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{size:>12} {name:>14} {len(mail.outbox):>8} {elapsed:>8.2f} '
+                    f'{(size - len(failed)) / elapsed:>12.0f}'
+                )
+        mail.outbox = []
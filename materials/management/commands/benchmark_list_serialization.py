@@ -0,0 +1,64 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from materials.models import Course, Lesson
+from materials.renderers import FastJSONRenderer, orjson
+from materials.row_builders import compile_row_builder
+from materials.serializers import LessonListSerializer, LessonSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает ответы/сек списка уроков через LessonSerializer + JSONRenderer '
+        'и через быстрый путь (.values() + функция строки + FastJSONRenderer)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[50, 500, 5000],
+                            help='Количество строк в ответе')
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов для каждого размера')
+
+    def handle(self, *args, **options):
+        sizes = options['sizes']
+        self.stdout.write(f"orjson: {'да' if orjson else 'нет, стандартный json'}")
+
+        with transaction.atomic():
+            self.seed(max(sizes))
+            self.stdout.write(f"{'строк':>7} {'путь':>12} {'ответов/сек':>12} {'мс/ответ':>10}")
+            for size in sizes:
+                for name, render in (('serializer', self.serializer_path), ('fast', self.fast_path)):
+                    render(size)
+                    started = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        render(size)
+                    elapsed = (time.perf_counter() - started) / options['repeat']
+                    self.stdout.write(f'{size:>7} {name:>12} {1 / elapsed:>12.1f} {elapsed * 1000:>10.2f}')
+            transaction.set_rollback(True)
+
+    def seed(self, size):
+        owner = User.objects.create(email='serialization-benchmark@example.com', password='!')
+        course = Course.objects.create(title='Бенчмарк', description='Описание', owner=owner)
+        Lesson.objects.bulk_create([
+            Lesson(title=f'Урок {i}', description='Описание урока ' * 20,
+                   video_link='https://www.youtube.com/watch?v=benchmark', course=course, owner=owner)
+            for i in range(size)
+        ], batch_size=1000)
+
+    @staticmethod
+    def serializer_path(size):
+        """Путь до изменений: объекты моделей и LessonSerializer со всеми полями"""
+        lessons = Lesson.objects.order_by('id')[:size]
+        return JSONRenderer().render(LessonSerializer(lessons, many=True).data)
+
+    @staticmethod
+    def fast_path(size):
+        """Те же поля, что у LessonSerializer, через .values() и функцию строки"""
+        columns, build = compile_row_builder(LessonListSerializer(context={'fields': set(LessonSerializer.Meta.fields)}))
+        rows = Lesson.objects.order_by('id').values(*columns)[:size]
+        return FastJSONRenderer().render([build(row) for row in rows])
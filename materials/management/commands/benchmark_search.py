@@ -0,0 +1,94 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from materials.models import Course, Lesson
+from materials.services.inverted_index import get_index
+from materials.services.search_service import IContainsSearchBackend, native_search_backend
+
+User = get_user_model()
+
+WORDS = (
+    'основы', 'программирование', 'python', 'django', 'данные', 'анализ', 'алгоритмы',
+    'структуры', 'сети', 'базы', 'запросы', 'индексы', 'тестирование', 'архитектура',
+    'машинное', 'обучение', 'статистика', 'графики', 'функции', 'классы', 'модули',
+    'асинхронность', 'кеширование', 'безопасность', 'шифрование', 'интерфейсы',
+)
+# Редкое слово: селективный запрос, на котором ILIKE читает всю таблицу
+RARE_WORD = 'квантовые'
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД уроками (в откатываемой транзакции) и сравнивает время поиска '
+        'ILIKE-фильтром, полнотекстовым бэкендом текущей СУБД и индексом в памяти'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lessons', type=int, default=1_000_000, help='Количество уроков')
+        parser.add_argument('--queries', nargs='+', default=['python', 'програм', 'машинное обучение', RARE_WORD],
+                            help='Поисковые запросы')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Размер пачки bulk_create')
+
+    def handle(self, *args, **options):
+        backends = [IContainsSearchBackend(), native_search_backend(connection.vendor)]
+
+        with transaction.atomic():
+            self.seed(options['lessons'], options['batch_size'])
+
+            self.stdout.write(f"{'запрос':>20} {'бэкенд':>10} {'найдено':>9} {'мс/страница':>12}")
+            for text in options['queries']:
+                for backend in backends:
+                    found = backend.search(Lesson.objects.all(), text).count()
+                    started = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        list(backend.search(Lesson.objects.all(), text)[:20])
+                    elapsed = (time.perf_counter() - started) / options['repeat'] * 1000
+                    self.stdout.write(f'{text:>20} {backend.name:>10} {found:>9} {elapsed:>12.1f}')
+
+            self.benchmark_inverted_index(options['queries'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def benchmark_inverted_index(self, queries, repeat):
+        index = get_index('lessons')
+        started = time.perf_counter()
+        index.build()
+        self.stdout.write(f'Индекс в памяти построен за {time.perf_counter() - started:.1f} с, '
+                          f'слов: {len(index.index)}')
+        # Тот же смысл запроса, что у бэкендов БД: все слова, каждое как префикс
+        for text in queries:
+            query = ' '.join(f'{word}*' for word in text.split())
+            found = len(index.search(query))
+            started = time.perf_counter()
+            for _ in range(repeat):
+                index.search(query)
+            elapsed = (time.perf_counter() - started) / repeat * 1000
+            self.stdout.write(f'{text:>20} {"memory":>10} {found:>9} {elapsed:>12.3f}')
+        # Индекс построен по откатываемым данным
+        index.reset()
+
+    def seed(self, lessons, batch_size):
+        rng = random.Random(42)
+        owner = User.objects.create(email='search-benchmark@example.com', password='!')
+        course = Course.objects.create(title='Бенчмарк поиска', description='Описание', owner=owner)
+
+        def text(words):
+            return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+        def title():
+            return f'{RARE_WORD} {text(3)}' if rng.random() < 0.001 else text(4)
+
+        started = time.perf_counter()
+        for start in range(0, lessons, batch_size):
+            Lesson.objects.bulk_create([
+                Lesson(title=title(), description=text(30), video_link='https://youtu.be/search',
+                       course=course, owner=owner)
+                for _ in range(min(batch_size, lessons - start))
+            ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        self.stdout.write(f'Создано уроков: {lessons} за {time.perf_counter() - started:.1f} с')
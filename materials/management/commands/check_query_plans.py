@@ -0,0 +1,129 @@
+import re
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from materials.models import Course, Lesson, Subscription
+from materials.services.catalog_service import CATALOG_ORDERING
+from materials.services.notification_service import course_recipients
+from materials.views import LESSONS_PREFETCH_ORDERING, LessonViewSet
+from users.models import Payment
+from users.views_payments import PaymentViewSet
+
+User = get_user_model()
+
+SQLITE_SCAN = re.compile(r'\bSCAN (\w+)(.*)')
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет БД тестовыми данными (в откатываемой транзакции), выполняет EXPLAIN '
+        'для горячих запросов и завершается ошибкой, если какой-либо из них '
+        'читает таблицу последовательным сканированием'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000, help='Количество пользователей')
+        parser.add_argument('--courses', type=int, default=50, help='Количество курсов')
+        parser.add_argument('--lessons-per-course', type=int, default=20, help='Уроков в курсе')
+        parser.add_argument('--subscriptions-per-user', type=int, default=5, help='Подписок у пользователя')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f'Разбор планов для {connection.vendor} не поддерживается')
+
+        with transaction.atomic():
+            user, course = self.seed(**options)
+            failures = self.check_plans(user, course)
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'Последовательное сканирование в горячих запросах: {", ".join(failures)}')
+        self.stdout.write(self.style.SUCCESS('Все горячие запросы используют индексы'))
+
+    def seed(self, users, courses, lessons_per_course, subscriptions_per_user, **options):
+        owner = User.objects.create(email='explain-owner@example.com', password='!')
+        created_users = User.objects.bulk_create([
+            User(email=f'explain{i}@example.com', password='!') for i in range(users)
+        ])
+        created_courses = Course.objects.bulk_create([
+            Course(title=f'Курс {i}', description='Описание', owner=owner, is_published=i % 10 == 0)
+            for i in range(courses)
+        ])
+        created_lessons = Lesson.objects.bulk_create([
+            Lesson(title=f'Урок {j}', description='Описание', video_link='https://youtu.be/explain',
+                   course=course, owner=owner)
+            for course in created_courses for j in range(lessons_per_course)
+        ], batch_size=1000)
+        Subscription.objects.bulk_create([
+            Subscription(user=user, course=created_courses[(i + k) % courses], is_active=k % 4 != 0)
+            for i, user in enumerate(created_users) for k in range(min(subscriptions_per_user, courses))
+        ], batch_size=1000)
+        Payment.objects.bulk_create([
+            Payment(user=user, amount=Decimal('100.00'), payment_method='cash',
+                    course_id=created_courses[i % courses].id if k == 0 else None,
+                    lesson_id=created_lessons[i % len(created_lessons)].id if k == 1 else None)
+            for i, user in enumerate(created_users) for k in range(2)
+        ], batch_size=1000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        return created_users[0], created_courses[0]
+
+    def viewset_queryset(self, viewset_class, user, params=None):
+        """Queryset списка так, как его строит viewset для запроса с параметрами"""
+        request = Request(APIRequestFactory().get('/', params or {}))
+        request.user = user
+        view = viewset_class(request=request, action='list', format_kwarg=None, args=(), kwargs={})
+        return view.filter_queryset(view.get_queryset())
+
+    def hot_queries(self, user, course):
+        course_ids = list(Course.objects.values_list('id', flat=True)[:8])
+        lesson = course.lessons.first()
+        return [
+            ('Подписки пользователя', 'materials_subscription',
+             Subscription.objects.filter(user_id=user.id, is_active=True).values_list('course_id')),
+            ('Подписчики курса', 'materials_subscription',
+             course_recipients(course.id)),
+            ('Уроки страницы курсов', 'materials_lesson',
+             Lesson.objects.filter(course_id__in=course_ids).order_by(*LESSONS_PREFETCH_ORDERING)),
+            ('Каталог опубликованных курсов', 'materials_course',
+             Course.objects.filter(is_published=True).order_by(*CATALOG_ORDERING)),
+            ('LessonViewSet ?course=', 'materials_lesson',
+             self.viewset_queryset(LessonViewSet, user, {'course': course.id})),
+            ('PaymentViewSet', 'users_payment',
+             self.viewset_queryset(PaymentViewSet, user)),
+            ('PaymentViewSet ?course_id=', 'users_payment',
+             self.viewset_queryset(PaymentViewSet, user, {'course_id': course.id})),
+            ('Платежи по курсу', 'users_payment',
+             Payment.objects.filter(course_id=course.id)),
+            ('Платежи по уроку', 'users_payment',
+             Payment.objects.filter(lesson_id=lesson.id)),
+        ]
+
+    def check_plans(self, user, course):
+        failures = []
+        for name, table, queryset in self.hot_queries(user, course):
+            plan = queryset.explain()
+            if table in self.seq_scanned_tables(plan):
+                failures.append(name)
+                self.stdout.write(self.style.ERROR(f'SEQ SCAN  {name}\n{plan}'))
+            else:
+                self.stdout.write(f'OK        {name}')
+        return failures
+
+    @staticmethod
+    def seq_scanned_tables(plan):
+        if connection.vendor == 'postgresql':
+            return set(POSTGRES_SEQ_SCAN.findall(plan))
+        tables = set()
+        for line in plan.splitlines():
+            match = SQLITE_SCAN.search(line)
+            if match and 'USING' not in match.group(2):
+                tables.add(match.group(1))
+        return tables
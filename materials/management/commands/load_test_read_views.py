@@ -0,0 +1,108 @@
+import asyncio
+import time
+from statistics import quantiles
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from users.serializers import CustomTokenObtainPairSerializer
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест чтения курсов: держит --connections одновременных '
+        'соединений к одному и тому же API под WSGI и под ASGI и сравнивает '
+        'p50/p99 задержки. Серверы не входят в requirements.txt: их ставят '
+        'отдельно ("pip install gunicorn uvicorn") и запускают, например, '
+        '"gunicorn config.wsgi -w 1 --threads 32 -b 127.0.0.1:8000" и '
+        '"uvicorn config.asgi:application --workers 1 --port 8001"'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wsgi-url', default='http://127.0.0.1:8000/api/v1/materials/courses/',
+                            help='URL списка курсов на сервере WSGI')
+        parser.add_argument('--asgi-url', default='http://127.0.0.1:8001/api/v1/materials/courses/',
+                            help='URL списка курсов на сервере ASGI')
+        parser.add_argument('--email', required=True, help='Пользователь, для которого выпускается JWT')
+        parser.add_argument('--connections', type=int, default=500, help='Одновременных соединений')
+        parser.add_argument('--requests', type=int, default=5000, help='Запросов на каждый сервер')
+        parser.add_argument('--client-delay', type=float, default=0.0,
+                            help='Медленный клиент: пауза (сек) между строкой запроса и заголовками')
+        parser.add_argument('--timeout', type=float, default=30.0, help='Таймаут запроса, сек')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['email']).first()
+        if user is None:
+            raise CommandError(f"Пользователь {options['email']} не найден")
+        token = str(CustomTokenObtainPairSerializer.get_token(user).access_token)
+
+        self.stdout.write(
+            f"{options['connections']} соединений, {options['requests']} запросов, "
+            f"пауза клиента {options['client_delay']} с"
+        )
+        self.stdout.write(f"{'сервер':>6} {'ответов/сек':>12} {'p50, мс':>9} {'p99, мс':>9} {'ошибок':>7}")
+        for name in ('wsgi', 'asgi'):
+            rate, durations, errors = asyncio.run(self.run_load(options[f'{name}_url'], token, options))
+            p50, p99 = self.percentiles(durations)
+            self.stdout.write(f'{name:>6} {rate:>12.1f} {p50:>9.1f} {p99:>9.1f} {errors:>7}')
+
+    async def run_load(self, url, token, options):
+        parts = urlsplit(url)
+        if parts.scheme != 'http':
+            raise CommandError(f'Поддерживается только http: {url}')
+        target = parts.path + (f'?{parts.query}' if parts.query else '')
+        request_line = f'GET {target} HTTP/1.1\r\n'.encode('ascii')
+        headers = (
+            f'Host: {parts.netloc}\r\n'
+            f'Authorization: Bearer {token}\r\n'
+            'Accept: application/json\r\n'
+            'Connection: close\r\n\r\n'
+        ).encode('ascii')
+
+        durations = []
+        errors = 0
+        remaining = options['requests']
+
+        async def request():
+            reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            try:
+                writer.write(request_line)
+                if options['client_delay']:
+                    await writer.drain()
+                    await asyncio.sleep(options['client_delay'])
+                writer.write(headers)
+                await writer.drain()
+                response = await reader.read()
+            finally:
+                writer.close()
+            return response.split(b' ', 2)[1] == b'200' if response else False
+
+        async def worker():
+            nonlocal errors, remaining
+            while remaining > 0:
+                remaining -= 1
+                started = time.perf_counter()
+                try:
+                    ok = await asyncio.wait_for(request(), options['timeout'])
+                except (OSError, asyncio.TimeoutError, IndexError):
+                    ok = False
+                if ok:
+                    durations.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(options['connections'])))
+        elapsed = time.perf_counter() - started
+        return len(durations) / elapsed, durations, errors
+
+    @staticmethod
+    def percentiles(durations):
+        if len(durations) < 2:
+            value = durations[0] * 1000 if durations else 0.0
+            return value, value
+        cuts = quantiles(durations, n=100, method='inclusive')
+        return cuts[49] * 1000, cuts[98] * 1000
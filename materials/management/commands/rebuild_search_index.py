@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from materials.models import Course, Lesson
+from materials.services.search_service import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает полнотекстовый индекс курсов и уроков (после загрузки дампа или пересборки таблиц)'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        for model in (Course, Lesson):
+            backend.rebuild(model)
+        self.stdout.write(self.style.SUCCESS(f'Индекс поиска ({backend.name}) пересобран'))
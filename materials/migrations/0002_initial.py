@@ -0,0 +1,29 @@
+# Generated by Django 5.2.11 on 2026-02-04 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='Subscription',
+        ),
+        migrations.AlterModelOptions(
+            name='course',
+            options={'ordering': ['id'], 'verbose_name': 'Курс', 'verbose_name_plural': 'Курсы'},
+        ),
+        migrations.AlterModelOptions(
+            name='lesson',
+            options={'ordering': ['id'], 'verbose_name': 'Урок', 'verbose_name_plural': 'Уроки'},
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='price',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10, verbose_name='Цена'),
+        ),
+    ]
@@ -0,0 +1,66 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+# DDL зафиксирован здесь, а не берется из materials.services.search_service:
+# миграция должна давать ту же схему, как бы ни менялся код сервиса
+SEARCH_TABLES = {'Course': 'materials_course', 'Lesson': 'materials_lesson'}
+
+
+def sqlite_fts_statements(table):
+    fts = f'{table}_fts'
+    delete_old = (
+        f"INSERT INTO {fts}({fts}, rowid, title, description) "
+        f"VALUES ('delete', old.id, old.title, old.description);"
+    )
+    insert_new = f"INSERT INTO {fts}(rowid, title, description) VALUES (new.id, new.title, new.description);"
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(title, description, "
+        f"content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, description ON {table} "
+        f"BEGIN {delete_old} {insert_new} END",
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def postgres_search_index(table):
+    vector = (
+        SearchVector('title', weight='A', config='russian')
+        + SearchVector('description', weight='B', config='russian')
+    )
+    return GinIndex(vector, name=f'{table}_search_idx')
+
+
+def install_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for model_name, table in SEARCH_TABLES.items():
+        if vendor == 'sqlite':
+            for statement in sqlite_fts_statements(table):
+                schema_editor.execute(statement)
+        elif vendor == 'postgresql':
+            schema_editor.add_index(apps.get_model('materials', model_name), postgres_search_index(table))
+
+
+def uninstall_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for model_name, table in SEARCH_TABLES.items():
+        if vendor == 'sqlite':
+            for suffix in ('ai', 'ad', 'au'):
+                schema_editor.execute(f'DROP TRIGGER IF EXISTS {table}_fts_{suffix}')
+            schema_editor.execute(f'DROP TABLE IF EXISTS {table}_fts')
+        elif vendor == 'postgresql':
+            schema_editor.remove_index(apps.get_model('materials', model_name), postgres_search_index(table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
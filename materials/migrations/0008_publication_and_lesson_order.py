@@ -0,0 +1,72 @@
+# Generated by Django 5.2.11 on 2026-10-18 10:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def reinstall_search_index(apps, schema_editor):
+    """
+    AddField/RemoveField в SQLite пересобирают таблицу и удаляют триггеры
+    полнотекстового индекса из 0007; таблица FTS5 остается, триггеры
+    создаются заново (DDL зафиксирован, как в 0007)
+    """
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table in ('materials_course', 'materials_lesson'):
+        fts = f'{table}_fts'
+        delete_old = (
+            f"INSERT INTO {fts}({fts}, rowid, title, description) "
+            f"VALUES ('delete', old.id, old.title, old.description);"
+        )
+        insert_new = f"INSERT INTO {fts}(rowid, title, description) VALUES (new.id, new.title, new.description);"
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, description ON {table} "
+            f"BEGIN {delete_old} {insert_new} END"
+        )
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0007_fulltext_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # При откате триггеры восстанавливаются после удаления полей
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search_index),
+        migrations.AlterModelOptions(
+            name='lesson',
+            options={'ordering': ['order', 'id'], 'verbose_name': 'Урок', 'verbose_name_plural': 'Уроки'},
+        ),
+        migrations.RemoveIndex(
+            model_name='lesson',
+            name='lesson_course_id_idx',
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='is_published',
+            field=models.BooleanField(default=False, verbose_name='Опубликован'),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='order',
+            field=models.PositiveIntegerField(default=0, verbose_name='Порядковый номер'),
+        ),
+        migrations.AddIndex(
+            model_name='course',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['created_at', 'id'], name='course_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lesson',
+            index=models.Index(fields=['course', 'order', 'id'], name='lesson_course_order_idx'),
+        ),
+        migrations.RunPython(reinstall_search_index, migrations.RunPython.noop),
+    ]
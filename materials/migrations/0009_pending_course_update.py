@@ -0,0 +1,27 @@
+# Generated by Django 5.2.11 on 2026-10-18 11:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0008_publication_and_lesson_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingCourseUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('summaries', models.JSONField(blank=True, default=list, verbose_name='Сводка изменений')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='pending_update', to='materials.course', verbose_name='Курс')),
+            ],
+            options={
+                'verbose_name': 'Ожидающее уведомление об изменениях курса',
+                'verbose_name_plural': 'Ожидающие уведомления об изменениях курсов',
+            },
+        ),
+    ]
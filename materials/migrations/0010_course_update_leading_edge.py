@@ -0,0 +1,31 @@
+# Generated by Django 5.2.11 on 2026-10-18 12:40
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def keep_scheduled_batches(apps, schema_editor):
+    """Задачи, уже записанные в outbox, ссылаются на пачку по id строки"""
+    PendingCourseUpdate = apps.get_model('materials', 'PendingCourseUpdate')
+    PendingCourseUpdate.objects.update(batch=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('materials', '0009_pending_course_update'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pendingcourseupdate',
+            name='batch',
+            field=models.PositiveIntegerField(default=0, verbose_name='Номер пачки'),
+        ),
+        migrations.AddField(
+            model_name='pendingcourseupdate',
+            name='notified_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Дата последнего уведомления'),
+        ),
+        migrations.RunPython(keep_scheduled_batches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,217 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from .row_builders import compile_row_builder
+from .services import cache_service, export_service
+
+
+class CachedReadMixin:
+    """
+    Кеширует ответы list/retrieve.
+
+    Ключи строятся из поколений областей кеша (см. materials.signals),
+    поэтому любая запись в курс, урок или подписку делает устаревшие
+    ответы недоступными без перебора ключей.
+    """
+    cache_list_scopes = ()
+    cache_object_scope = None
+    cache_user_specific = False
+
+    def list(self, request, *args, **kwargs):
+        key = cache_service.build_response_key(
+            request, self.cache_list_scopes, self.cache_user_specific
+        )
+        return self._cached_response(key, super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = kwargs[self.lookup_url_kwarg or self.lookup_field]
+        scopes = [cache_service.object_scope(self.cache_object_scope, lookup)]
+        key = cache_service.build_response_key(request, scopes, self.cache_user_specific)
+        return self._cached_response(key, super().retrieve, request, *args, **kwargs)
+
+    def _cached_response(self, key, handler, request, *args, **kwargs):
+        data = cache_service.get_cached(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache_service.set_cached(key, response.data, settings.MATERIALS_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Набор полей сериализатора из context['fields'] и context['expand'].
+
+    Без ?fields= выводятся default_fields (None - все поля, кроме expandable_fields);
+    поля из expandable_fields добавляются только по ?expand= или явному ?fields=.
+    Неизвестные имена в ?fields= - ошибка валидации (400) со списком этих имен.
+    field_columns описывает колонки модели для полей, не сводящихся к source.
+    """
+    default_fields = None
+    expandable_fields = ()
+    field_columns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = self.context.get('fields')
+        if requested:
+            unknown = set(requested) - set(self.fields)
+            if unknown:
+                raise ValidationError({
+                    'fields': f"Неизвестные поля: {', '.join(sorted(unknown))}. "
+                              f"Допустимые поля: {', '.join(self.fields)}"
+                })
+            allowed = set(requested)
+        elif self.default_fields is not None:
+            allowed = set(self.default_fields)
+        else:
+            allowed = set(self.fields) - set(self.expandable_fields)
+        allowed |= set(self.context.get('expand') or ()) & set(self.expandable_fields)
+        for name in list(self.fields):
+            if name not in allowed:
+                self.fields.pop(name)
+
+    def get_model_columns(self):
+        """Аргументы QuerySet.only() для выбранных полей"""
+        opts = self.Meta.model._meta
+        concrete = {field.name: field for field in opts.concrete_fields}
+        columns = {opts.pk.name}
+        for name, field in self.fields.items():
+            if name in self.field_columns:
+                columns.update(self.field_columns[name])
+                continue
+            parts = field.source.split('.')
+            model_field = concrete.get(parts[0])
+            if model_field is None:
+                continue
+            if model_field.is_relation and len(parts) > 1:
+                columns.add('__'.join(parts[:2]))
+            else:
+                columns.add(parts[0])
+        return columns
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields=a,b и ?expand=lessons для list/retrieve.
+
+    Выбранные поля передаются сериализатору через контекст, а queryset
+    загружает только их колонки (.only); select_related для невыбранных
+    связей отбрасывается.
+    """
+    fields_query_param = 'fields'
+    expand_query_param = 'expand'
+    sparse_actions = ('list', 'retrieve')
+
+    def _query_param_set(self, name):
+        value = self.request.query_params.get(name, '')
+        return {item.strip() for item in value.split(',') if item.strip()}
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in self.sparse_actions:
+            context['fields'] = self._query_param_set(self.fields_query_param) or None
+            context['expand'] = self._query_param_set(self.expand_query_param)
+        return context
+
+    def get_field_selection(self):
+        """Сериализатор с выбранными полями, по которому строится queryset"""
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = self.get_serializer_class()(context=self.get_serializer_context())
+        return self._field_selection
+
+    def get_selected_fields(self):
+        return set(self.get_field_selection().fields)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        serializer = self.get_field_selection() if self.action in self.sparse_actions else None
+        if not isinstance(serializer, SparseFieldsetSerializerMixin):
+            return queryset
+
+        columns = serializer.get_model_columns()
+        related = queryset.query.select_related
+        if related:
+            keep = [name for name in related if any(
+                column == name or column.startswith(f'{name}__') for column in columns
+            )] if isinstance(related, dict) else []
+            queryset = queryset.select_related(None)
+            if keep:
+                queryset = queryset.select_related(*keep)
+        return queryset.only(*columns)
+
+
+class FastListMixin:
+    """
+    list без ModelSerializer: страница читается через .values() и превращается
+    в словари функцией строки, собранной по выбранным полям сериализатора
+    (materials.row_builders). Если сериализатор так вывести нельзя
+    (например, ?expand=lessons), используется обычный путь DRF.
+
+    Поля берутся из SparseFieldsetMixin.get_field_selection.
+    """
+
+    def list(self, request, *args, **kwargs):
+        builder = compile_row_builder(self.get_field_selection())
+        if builder is None:
+            return super().list(request, *args, **kwargs)
+        columns, build = builder
+
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        required = getattr(self.paginator, 'get_required_columns', None)
+        if required is not None:
+            columns += [column for column in required(request) if column not in columns]
+        # Колонка ранжирования поиска нужна для ORDER BY
+        query = queryset.query
+        if 'search_rank' in query.annotations or 'search_rank' in query.extra:
+            columns.append('search_rank')
+        rows = queryset.values(*columns)
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([build(row) for row in page])
+        return Response([build(row) for row in rows])
+
+
+class ExportMixin:
+    """
+    GET <список>/export/?export_format=ndjson|csv - потоковая выгрузка
+    для администраторов с теми же фильтрами, поиском и сортировкой,
+    что у list, но без пагинации.
+
+    Колонки выгрузки - export_fields (имена для .values()). Без явной
+    сортировки строки идут по первичному ключу: такой порядок читается
+    по индексу и не требует сортировки всей таблицы.
+    """
+    export_fields = ()
+    export_filename = 'export'
+    export_format_query_param = 'export_format'
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request, *args, **kwargs):
+        return self.export_response(request)
+
+    def get_export_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        if not queryset.query.order_by:
+            queryset = queryset.order_by('pk')
+        return queryset
+
+    def export_response(self, request):
+        export_format = request.query_params.get(self.export_format_query_param, 'ndjson')
+        if export_format not in export_service.EXPORT_FORMATS:
+            raise ValidationError({
+                self.export_format_query_param: f"Допустимые форматы: {', '.join(export_service.EXPORT_FORMATS)}"
+            })
+        return export_service.stream_export(
+            self.get_export_queryset(), self.export_fields, export_format, self.export_filename
+        )
@@ -7,6 +7,7 @@ class Course(models.Model):
     title = models.CharField(max_length=255, verbose_name='Название курса')
     description = models.TextField(verbose_name='Описание')
     price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Цена', default=0.00)
+    is_published = models.BooleanField(default=False, verbose_name='Опубликован')
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
                               verbose_name='Владелец')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
@@ -16,6 +17,13 @@ class Course(models.Model):
         verbose_name = 'Курс'
         verbose_name_plural = 'Курсы'
         ordering = ['id']
+        indexes = [
+            # Пагинация по ключу (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='course_created_id_idx'),
+            # Публичный каталог: только опубликованные курсы, новые первыми
+            models.Index(fields=['created_at', 'id'], condition=models.Q(is_published=True),
+                         name='course_published_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -28,6 +36,7 @@ class Lesson(models.Model):
                                  validators=[URLValidator()])
     course = models.ForeignKey(Course, on_delete=models.CASCADE,
                                related_name='lessons', verbose_name='Курс')
+    order = models.PositiveIntegerField(default=0, verbose_name='Порядковый номер')
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
                               verbose_name='Владелец')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
@@ -36,7 +45,13 @@ class Lesson(models.Model):
     class Meta:
         verbose_name = 'Урок'
         verbose_name_plural = 'Уроки'
-        ordering = ['id']
+        ordering = ['order', 'id']
+        indexes = [
+            # Уроки курса по порядку: вложенный список курса и фильтр ?course=
+            models.Index(fields=['course', 'order', 'id'], name='lesson_course_order_idx'),
+            # Пагинация по ключу (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='lesson_created_id_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -63,6 +78,64 @@ class Subscription(models.Model):
         verbose_name_plural = 'Подписки'
         unique_together = ['user', 'course']
         ordering = ['-subscribed_at']
+        indexes = [
+            # Подписчики курса для рассылки
+            models.Index(fields=['course'], condition=models.Q(is_active=True),
+                         name='subscription_course_active_idx'),
+            # Множество подписок пользователя
+            models.Index(fields=['user'], condition=models.Q(is_active=True),
+                         name='subscription_user_active_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.email if hasattr(self.user, "email") else self.user_id} -> {self.course.title}'
+
+
+class PendingCourseUpdate(models.Model):
+    """
+    Правки курса, ожидающие уведомления подписчиков, и время последнего уведомления.
+
+    Строка у курса одна. Пачка открыта, пока summaries не пусты; задача
+    отправки очищает их и запоминает notified_at, следующая правка
+    начинает пачку с новым номером batch
+    """
+    course = models.OneToOneField(Course, on_delete=models.CASCADE,
+                                  related_name='pending_update', verbose_name='Курс')
+    summaries = models.JSONField(default=list, blank=True, verbose_name='Сводка изменений')
+    batch = models.PositiveIntegerField(default=0, verbose_name='Номер пачки')
+    notified_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата последнего уведомления')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+
+    class Meta:
+        verbose_name = 'Ожидающее уведомление об изменениях курса'
+        verbose_name_plural = 'Ожидающие уведомления об изменениях курсов'
+
+    def __str__(self):
+        return f'{self.course_id} #{self.pk}'
+
+
+class OutboxMessage(models.Model):
+    """Задача Celery, записанная в той же транзакции, что и изменения данных"""
+    task_name = models.CharField(max_length=255, verbose_name='Задача')
+    args = models.JSONField(default=list, blank=True, verbose_name='Аргументы')
+    kwargs = models.JSONField(default=dict, blank=True, verbose_name='Именованные аргументы')
+    eta = models.DateTimeField(null=True, blank=True, verbose_name='Время запуска')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    dispatched_at = models.DateTimeField(null=True, blank=True, verbose_name='Дата отправки в брокер')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Неудачных попыток')
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+
+    class Meta:
+        verbose_name = 'Сообщение outbox'
+        verbose_name_plural = 'Сообщения outbox'
+        ordering = ['id']
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(dispatched_at__isnull=True),
+                name='outbox_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.task_name} #{self.pk}'
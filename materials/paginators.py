@@ -1,4 +1,78 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from functools import reduce
+from operator import or_
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import EmptyPage, Page, Paginator as DjangoPaginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .services import count_service
+
+
+class ApproximatePage(Page):
+    """Страница, наличие следующей страницы у которой известно по лишней строке"""
+
+    def __init__(self, object_list, number, paginator, has_next):
+        super().__init__(object_list, number, paginator)
+        self._has_next = has_next
+
+    def has_next(self):
+        return self._has_next
+
+
+class EstimatedCountPaginator(DjangoPaginator):
+    """
+    Paginator, который не выполняет точный COUNT(*) на больших выборках.
+
+    На PostgreSQL количество берется из статистики планировщика; если
+    оценка меньше PAGINATION_EXACT_COUNT_THRESHOLD, считается точно.
+    На бэкендах без статистики количество всегда точное, а COUNT больших
+    выборок кешируется на PAGINATION_COUNT_CACHE_TIMEOUT. При приблизительном количестве границы страниц определяются по выборке
+    с одной лишней строкой, а не по count.
+    """
+
+    def __init__(self, object_list, per_page, count_scopes=(), **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_scopes = count_scopes
+        self.count_is_approximate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimate = count_service.planner_estimate(queryset)
+        if estimate is None:
+            return count_service.cached_count(queryset, self.count_scopes)
+        if estimate < settings.PAGINATION_EXACT_COUNT_THRESHOLD:
+            return queryset.count()
+        self.count_is_approximate = True
+        return estimate
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Оценка могла оказаться меньше реального количества
+            if not self.count_is_approximate or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        number = self.validate_number(number)
+        if not self.count_is_approximate:
+            return super().page(number)
+
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows and number > 1:
+            raise EmptyPage(self.error_messages['no_results'])
+        return ApproximatePage(rows[:self.per_page], number, self, has_next=len(rows) > self.per_page)
 
 
 class MaterialsPagination(PageNumberPagination):
@@ -6,6 +80,32 @@ class MaterialsPagination(PageNumberPagination):
     page_size_query_param = 'page_size'
     max_page_size = 50
 
+    def paginate_queryset(self, queryset, request, view=None):
+        # Записи курсов и уроков сбрасывают закешированный count
+        self.count_scopes = tuple(getattr(view, 'cache_list_scopes', ()))
+        return super().paginate_queryset(queryset, request, view)
+
+    def django_paginator_class(self, object_list, per_page):
+        return EstimatedCountPaginator(object_list, per_page, count_scopes=self.count_scopes)
+
+    def get_required_columns(self, request):
+        """Колонки, которые нужны пагинатору в строках страницы"""
+        return []
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.page.paginator.count,
+            'count_is_approximate': self.page.paginator.count_is_approximate,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_approximate'] = {'type': 'boolean', 'example': False}
+        return response_schema
+
 
 class LessonPagination(MaterialsPagination):
     page_size = 5
@@ -13,3 +113,266 @@ class LessonPagination(MaterialsPagination):
 
 class CoursePagination(MaterialsPagination):
     page_size = 8
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу: курсор хранит значения полей ordering последней
+    (или первой) строки страницы, следующая страница выбирается условием
+    WHERE по этим значениям вместо OFFSET, поэтому глубина страницы
+    не влияет на стоимость запроса при индексе по полям ordering.
+
+    Общее количество (COUNT) считается только по ?with_count=true.
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    # Последнее поле должно быть уникальным, обычно это id
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = 'Некорректный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_queryset = self.get_page_queryset(queryset, request)
+        self.count = queryset.count() if self.wants_count(request) else None
+        return self.get_page_rows(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset для async-представлений: строки читаются через aiterator"""
+        page_queryset = self.get_page_queryset(queryset, request)
+        self.count = await queryset.acount() if self.wants_count(request) else None
+        return self.get_page_rows([row async for row in page_queryset.aiterator()])
+
+    def wants_count(self, request):
+        return request.query_params.get(self.count_query_param, '').lower() in ('1', 'true')
+
+    def get_page_queryset(self, queryset, request):
+        """Выборка страницы с одной лишней строкой для определения соседней страницы"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.position, self.reverse = self.decode_cursor(request, queryset.model)
+
+        ordering = [self._reversed(field) for field in self.ordering] if self.reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self._after(ordering, self.position))
+        return queryset[:self.page_size + 1]
+
+    def get_page_rows(self, rows):
+        position, reverse = self.position, self.reverse
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        # Вперед: следующая страница есть, если строк больше page_size;
+        # назад: мы пришли со следующей страницы, значит она существует
+        has_next = has_more if not reverse else position is not None
+        has_previous = position is not None if not reverse else has_more
+        self.next_position = self._position(rows[-1]) if rows and has_next else None
+        self.previous_position = self._position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            response = {'count': self.count, **response}
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_required_columns(self, request):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        token = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        encoded = urlsafe_b64encode(token.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            token = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            values = token['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(token.get('r'))
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Курсор страницы из ссылок next/previous',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Количество записей на странице',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Вернуть общее количество записей (дополнительный COUNT)',
+                'schema': {'type': 'boolean'},
+            },
+        ]
+
+    def _position(self, instance):
+        # Строки страницы - объекты моделей или словари из .values()
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            position.append(value.isoformat() if hasattr(value, 'isoformat') else value)
+        return position
+
+    @staticmethod
+    def _reversed(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    @staticmethod
+    def _after(ordering, position):
+        """
+        Условие "строго после position" для ordering:
+        (a > x) OR (a = x AND b > y) OR ... с учетом направления полей
+        """
+        conditions = []
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {f.lstrip('-'): value for f, value in zip(ordering[:i], position[:i])}
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': position[i]}))
+        return reduce(or_, conditions)
+
+
+class SelectablePagination(BasePagination):
+    """
+    Постраничная пагинация по умолчанию и пагинация по ключу,
+    если в запросе передан ?cursor= или ?pagination=cursor
+    """
+    page_number_class = MaterialsPagination
+    keyset_class = KeysetPagination
+    mode_query_param = 'pagination'
+
+    def use_keyset(self, request):
+        return (
+            self.keyset_class.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == 'cursor'
+        )
+
+    def get_paginator_class(self, request):
+        return self.keyset_class if self.use_keyset(request) else self.page_number_class
+
+    def get_required_columns(self, request):
+        paginator = self.get_paginator_class(request)()
+        return getattr(paginator, 'get_required_columns', lambda request: [])(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator_class(request)()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset для async-представлений; COUNT и страница без async API - в потоке"""
+        self.paginator = self.get_paginator_class(request)()
+        apaginate = getattr(self.paginator, 'apaginate_queryset', None)
+        if apaginate is not None:
+            return await apaginate(queryset, request, view)
+        return await sync_to_async(self.paginator.paginate_queryset)(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        mode = {
+            'name': self.mode_query_param,
+            'required': False,
+            'in': 'query',
+            'description': 'cursor - пагинация по ключу вместо номеров страниц',
+            'schema': {'type': 'string', 'enum': ['page', 'cursor']},
+        }
+        return (
+            self.page_number_class().get_schema_operation_parameters(view)
+            + [mode]
+            + self.keyset_class().get_schema_operation_parameters(view)
+        )
+
+
+class CourseKeysetPagination(KeysetPagination):
+    page_size = CoursePagination.page_size
+
+
+class LessonKeysetPagination(KeysetPagination):
+    page_size = LessonPagination.page_size
+
+
+class CourseSelectablePagination(SelectablePagination):
+    page_number_class = CoursePagination
+    keyset_class = CourseKeysetPagination
+
+
+class LessonSelectablePagination(SelectablePagination):
+    page_number_class = LessonPagination
+    keyset_class = LessonKeysetPagination
+
+
+class IndexSearchPagination(LimitOffsetPagination):
+    """Страница id из результата поиска по индексу в памяти"""
+    default_limit = 20
+    max_limit = 100
+
+
+class CatalogPagination(PageNumberPagination):
+    """Страницы закешированной проекции каталога: точный count дешев, это длина списка"""
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 50
@@ -1,19 +1,21 @@
 from rest_framework import permissions
-from django.contrib.auth.models import Group
+
+from .services.role_service import is_moderator
 
 
 class IsModerator(permissions.BasePermission):
     """Проверяет, является ли пользователь модератором"""
 
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='moderators').exists()
+        return is_moderator(request.user)
 
 
 class IsOwner(permissions.BasePermission):
     """Проверяет, является ли пользователь владельцем объекта"""
 
     def has_object_permission(self, request, view, obj):
-        return obj.owner == request.user
+        # owner_id не загружает владельца из БД
+        return obj.owner_id == request.user.pk
 
 
 class IsOwnerOrModerator(permissions.BasePermission):
@@ -23,12 +25,8 @@ class IsOwnerOrModerator(permissions.BasePermission):
         if not request.user or not request.user.is_authenticated:
             return False
 
-        # Проверяем, является ли пользователь модератором
-        is_moderator = request.user.groups.filter(name='moderators').exists()
-        # Проверяем, является ли пользователь владельцем
-        is_owner = obj.owner == request.user
-
-        return is_moderator or is_owner
+        # Владелец проверяется первым: это сравнение без обращения к кешу групп
+        return obj.owner_id == request.user.pk or is_moderator(request.user)
 
 
 class IsNotModerator(permissions.BasePermission):
@@ -37,4 +35,4 @@ class IsNotModerator(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return not request.user.groups.filter(name='moderators').exists()
\ No newline at end of file
+        return not is_moderator(request.user)
@@ -0,0 +1,33 @@
+import json
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(data):
+    """Компактный JSON в байтах: orjson, если установлен, иначе json с кодировщиком DRF"""
+    if orjson is not None:
+        return orjson.dumps(data, default=JSONEncoder().default)
+    return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson, если он установлен.
+
+    Запросы с отступами (?indent / Accept: application/json; indent=4)
+    и окружения без orjson обслуживает стандартный рендерер DRF.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Decimal, ленивые строки и прочее, чего не знает orjson, - как в DRF
+        return dumps(data)
@@ -0,0 +1,88 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.fields import ISO_8601
+from rest_framework.settings import api_settings
+
+# Поля, чей to_representation для значения из БД ничего не меняет
+IDENTITY_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.PrimaryKeyRelatedField,
+    serializers.ReadOnlyField,
+)
+
+
+def _datetime_converter(field):
+    """DateTimeField.to_representation для ISO 8601 без повторного разбора настроек на каждой строке"""
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+    def convert(value):
+        if field_timezone is not None and value.tzinfo is not None:
+            value = value.astimezone(field_timezone)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _converter(field):
+    if isinstance(field, serializers.ChoiceField):
+        return field.to_representation
+    if isinstance(field, IDENTITY_FIELDS):
+        return None
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    return field.to_representation
+
+
+def compile_row_builder(serializer):
+    """
+    Функция строки для чтения списка без ModelSerializer.
+
+    Возвращает (колонки для .values(), build(row) -> dict) или None,
+    если сериализатор так вывести нельзя: вложенные сериализаторы,
+    составной source или SerializerMethodField без метода fast_<поле>(row).
+    Колонки для методов перечисляются в serializer.fast_columns.
+    """
+    opts = serializer.Meta.model._meta
+    fast_columns = getattr(serializer, 'fast_columns', {})
+    columns = []
+    plan = []
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            method = getattr(serializer, f'fast_{name}', None)
+            if method is None:
+                return None
+            columns.extend(fast_columns.get(name, ()))
+            plan.append((name, None, method))
+            continue
+        if isinstance(field, serializers.BaseSerializer) or '.' in field.source or field.source == '*':
+            return None
+        try:
+            model_field = opts.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        columns.append(model_field.attname)
+        plan.append((name, model_field.attname, _converter(field)))
+
+    def build(row):
+        data = {}
+        for name, column, convert in plan:
+            if column is None:
+                data[name] = convert(row)
+                continue
+            value = row[column]
+            data[name] = value if value is None or convert is None else convert(value)
+        return data
+
+    return list(dict.fromkeys(columns)), build
@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from .mixins import SparseFieldsetSerializerMixin
 from .models import Course, Lesson, Subscription
+from .services import lesson_service
 from .validators import youtube_url_validator
 
 
@@ -8,36 +12,215 @@ class LessonSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Lesson
-        fields = ['id', 'title', 'description', 'video_link', 'course', 'owner', 
+        fields = ['id', 'title', 'description', 'video_link', 'course', 'order', 'owner',
                   'created_at', 'updated_at']
         read_only_fields = ['owner']
 
 
+class LessonListSerializer(SparseFieldsetSerializerMixin, LessonSerializer):
+    """Урок в списках: описание только по ?fields="""
+    default_fields = ['id', 'title', 'video_link', 'course', 'order', 'owner', 'created_at', 'updated_at']
+
+
+class LessonDetailSerializer(SparseFieldsetSerializerMixin, LessonSerializer):
+    """Урок целиком с поддержкой ?fields="""
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField, который берет объекты из preloaded (pk -> объект) без запроса к БД"""
+    preloaded = None
+
+    def to_internal_value(self, data):
+        if self.preloaded is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.preloaded:
+            self.fail('does_not_exist', pk_value=data)
+        return self.preloaded[pk]
+
+
+def _int_values(items, name):
+    values = set()
+    for item in items:
+        try:
+            values.add(int(item[name]))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return values
+
+
+class LessonBulkListSerializer(serializers.ListSerializer):
+    """
+    Пакетное создание и частичное обновление уроков.
+
+    Курсы и обновляемые уроки всей пачки загружаются двумя запросами
+    до проверки элементов, запись - одним bulk_create/bulk_update.
+    При обновлении instance - queryset доступных уроков, а каждый
+    элемент данных содержит id урока.
+    """
+    default_error_messages = {
+        'not_found': 'Урок с ID {pk_value} не найден',
+        'duplicate': 'Урок с ID {pk_value} указан несколько раз',
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            items = [item for item in data if isinstance(item, dict)]
+            self.child.fields['course'].preloaded = Course.objects.in_bulk(_int_values(items, 'course'))
+            if self.instance is not None:
+                self.lessons = self.instance.in_bulk(_int_values(items, 'id'))
+        return super().to_internal_value(data)
+
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+        try:
+            pk = int(data['id'])
+        except (KeyError, TypeError, ValueError):
+            pk = None
+        lesson = self.lessons.get(pk)
+        if lesson is None:
+            raise serializers.ValidationError({'id': [self.error_messages['not_found'].format(pk_value=pk)]})
+        self.child.instance = lesson
+        self.child.initial_data = data
+        return {**super().run_child_validation(data), 'id': lesson.pk}
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            seen = set()
+            for item in attrs:
+                if item['id'] in seen:
+                    raise serializers.ValidationError(self.error_messages['duplicate'].format(pk_value=item['id']))
+                seen.add(item['id'])
+        return attrs
+
+    def create(self, validated_data):
+        return lesson_service.bulk_create_lessons(validated_data)
+
+    def update(self, instance, validated_data):
+        return lesson_service.bulk_update_lessons([
+            (self.lessons[attrs.pop('id')], attrs) for attrs in validated_data
+        ])
+
+
+class LessonBulkSerializer(LessonSerializer):
+    """Элемент пакетного создания или обновления уроков"""
+    course = PreloadedPrimaryKeyRelatedField(queryset=Course.objects.all())
+
+    class Meta(LessonSerializer.Meta):
+        list_serializer_class = LessonBulkListSerializer
+
+
 class SubscriptionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscription
-        fields = ['id', 'user', 'course', 'created_at']
+        fields = ['id', 'user', 'course', 'is_active', 'subscribed_at']
+
+
+def _missing_ids(model, ids):
+    return sorted(set(ids) - set(model.objects.filter(id__in=ids).values_list('id', flat=True)))
+
+
+class BulkSubscriptionSerializer(serializers.Serializer):
+    """Пакетная подписка или отписка всех user_ids от всех course_ids"""
+    user_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    course_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False)
+    action = serializers.ChoiceField(choices=['subscribe', 'unsubscribe'])
+
+    def validate(self, attrs):
+        user_ids = set(attrs['user_ids'])
+        course_ids = set(attrs['course_ids'])
+        if len(user_ids) * len(course_ids) > settings.SUBSCRIPTIONS_BULK_MAX_PAIRS:
+            raise serializers.ValidationError(
+                f'Не больше {settings.SUBSCRIPTIONS_BULK_MAX_PAIRS} пар пользователь-курс за запрос'
+            )
+        errors = {}
+        missing_users = _missing_ids(get_user_model(), user_ids)
+        if missing_users:
+            errors['user_ids'] = f'Пользователи не найдены: {missing_users}'
+        missing_courses = _missing_ids(Course, course_ids)
+        if missing_courses:
+            errors['course_ids'] = f'Курсы не найдены: {missing_courses}'
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
 
 
 class CourseSerializer(serializers.ModelSerializer):
     lessons_count = serializers.SerializerMethodField()
     lessons = LessonSerializer(many=True, read_only=True)
     is_subscribed = serializers.SerializerMethodField()
+    # Колонки .values() для чтения без объектов моделей (materials.row_builders)
+    fast_columns = {'lessons_count': ('lessons_count',), 'is_subscribed': ('id',)}
     
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'owner', 'lessons_count', 
+        fields = ['id', 'title', 'description', 'is_published', 'owner', 'lessons_count',
                   'lessons', 'is_subscribed', 'created_at', 'updated_at']
         read_only_fields = ['owner']
     
     def get_lessons_count(self, obj):
+        # Аннотация из CourseViewSet.get_queryset избавляет от COUNT на каждый курс
+        if hasattr(obj, 'lessons_count'):
+            return obj.lessons_count
         return obj.lessons.count()
     
     def get_is_subscribed(self, obj):
+        # Множество курсов пользователя передает CourseViewSet.get_serializer_context
+        subscribed_course_ids = self.context.get('subscribed_course_ids')
+        if subscribed_course_ids is not None:
+            return obj.id in subscribed_course_ids
         request = self.context.get('request')
         if request and request.user.is_authenticated:
             return Subscription.objects.filter(
                 user=request.user,
-                course=obj
+                course=obj,
+                is_active=True
             ).exists()
         return False
+
+    def fast_lessons_count(self, row):
+        return row['lessons_count']
+
+    def fast_is_subscribed(self, row):
+        return row['id'] in self.context['subscribed_course_ids']
+
+
+class CourseWithPriceSerializer(CourseSerializer):
+    """Сериализатор курса с ценой для просмотра списка и деталей"""
+
+    class Meta(CourseSerializer.Meta):
+        fields = ['id', 'title', 'description', 'price', 'is_published', 'owner', 'lessons_count',
+                  'lessons', 'is_subscribed', 'created_at', 'updated_at']
+
+
+class CourseListSerializer(SparseFieldsetSerializerMixin, CourseWithPriceSerializer):
+    """Курс в списке: уроки (без описаний) только по ?expand=lessons"""
+    lessons = LessonListSerializer(many=True, read_only=True)
+    expandable_fields = ('lessons',)
+
+
+class CourseDetailSerializer(SparseFieldsetSerializerMixin, CourseWithPriceSerializer):
+    """Курс с полными уроками и поддержкой ?fields="""
+
+
+class CatalogCourseSerializer(serializers.Serializer):
+    """Строка проекции публичного каталога (словарь из .values())"""
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    description = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    lessons_count = serializers.IntegerField()
+    created_at = serializers.DateTimeField()
+
+
+class IndexSearchQuerySerializer(serializers.Serializer):
+    """Параметры поиска по индексу в памяти"""
+    q = serializers.CharField()
+    type = serializers.ChoiceField(choices=['lessons', 'courses'], default='lessons')
+    operator = serializers.ChoiceField(choices=['and', 'or'], default='and')
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = 'materials'
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _generation_key(name):
+    return f'{KEY_PREFIX}:gen:{name}'
+
+
+def _new_generation():
+    """
+    Начальное значение поколения берется из времени, чтобы после вытеснения
+    ключа поколения из кеша не вернуться к уже использованному значению
+    """
+    return int(time.time() * 1000)
+
+
+def get_generations(*names):
+    """Возвращает текущие поколения для набора областей кеша"""
+    keys = [_generation_key(name) for name in names]
+    stored = cache.get_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in stored}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        stored.update(missing)
+    return [stored[key] for key in keys]
+
+
+async def aget_generations(*names):
+    """get_generations через асинхронный API кеша"""
+    keys = [_generation_key(name) for name in names]
+    stored = await cache.aget_many(keys)
+    missing = {key: _new_generation() for key in keys if key not in stored}
+    if missing:
+        await cache.aset_many(missing, timeout=None)
+        stored.update(missing)
+    return [stored[key] for key in keys]
+
+
+def bump_generation(*names):
+    """
+    Инвалидирует все записи, ключи которых построены на этих поколениях;
+    возвращает новые поколения
+    """
+    generations = []
+    for name in names:
+        key = _generation_key(name)
+        try:
+            generations.append(cache.incr(key))
+        except ValueError:
+            generation = _new_generation()
+            cache.set(key, generation, timeout=None)
+            generations.append(generation)
+    return generations
+
+
+def bump_generation_on_commit(*names):
+    """
+    bump_generation после коммита текущей транзакции (вне транзакции - сразу).
+
+    Сдвиг внутри транзакции дал бы параллельному запросу закешировать
+    еще не измененные данные под новым поколением до истечения TTL
+    """
+    transaction.on_commit(lambda: bump_generation(*names))
+
+
+def object_scope(name, object_id):
+    return f'{name}:{object_id}'
+
+
+def user_subscriptions_scope(user_id):
+    return f'subscriptions:{user_id}'
+
+
+def build_response_key(request, scopes, user_specific=False):
+    """
+    Ключ ответа: путь, параметры фильтрации/сортировки/поиска/страницы,
+    поколения затронутых областей и, при необходимости, пользователь
+    """
+    if user_specific:
+        scopes = list(scopes) + [user_subscriptions_scope(request.user.pk)]
+    return _response_key(request, get_generations(*scopes), user_specific)
+
+
+async def abuild_response_key(request, scopes, user_specific=False):
+    if user_specific:
+        scopes = list(scopes) + [user_subscriptions_scope(request.user.pk)]
+    return _response_key(request, await aget_generations(*scopes), user_specific)
+
+
+def _response_key(request, generations, user_specific):
+    params = sorted(request.query_params.lists())
+    raw = repr((request.get_host(), request.path, params, request.user.pk if user_specific else None))
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    gens = '.'.join(str(gen) for gen in generations)
+    return f'{KEY_PREFIX}:response:{gens}:{digest}'
+
+
+def _count_lookup(data):
+    with _stats_lock:
+        _stats['hits' if data is not None else 'misses'] += 1
+
+
+def get_cached(key):
+    data = cache.get(key)
+    _count_lookup(data)
+    return data
+
+
+async def aget_cached(key):
+    data = await cache.aget(key)
+    _count_lookup(data)
+    return data
+
+
+def set_cached(key, data, timeout):
+    cache.set(key, data, timeout)
+
+
+async def aset_cached(key, data, timeout):
+    await cache.aset(key, data, timeout)
+
+
+def get_stats():
+    """Счетчики попаданий и промахов кеша ответов в текущем процессе"""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
@@ -0,0 +1,52 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from materials.models import Course, Lesson
+
+from .cache_service import KEY_PREFIX, get_generations
+
+# Порядок совпадает с частичным индексом course_published_idx
+CATALOG_ORDERING = ('-created_at', '-id')
+CATALOG_FIELDS = ('id', 'title', 'description', 'price', 'lessons_count', 'created_at')
+
+
+def lessons_count():
+    """
+    Количество уроков курса коррелированным подзапросом по lesson_course_order_idx.
+
+    В отличие от Count с GROUP BY внешний запрос остается без группировки,
+    и к нему можно присоединять таблицы поиска и ранжирования.
+    """
+    count = Lesson.objects.filter(
+        course=OuterRef('pk')
+    ).order_by().values('course').annotate(count=Count('id')).values('count')
+    return Coalesce(Subquery(count), 0)
+
+
+def build_catalog():
+    """Строки каталога: опубликованные курсы без вложенных уроков и данных владельца"""
+    from materials.serializers import CatalogCourseSerializer
+
+    rows = Course.objects.filter(is_published=True).annotate(
+        lessons_count=lessons_count()
+    ).order_by(*CATALOG_ORDERING).values(*CATALOG_FIELDS)
+    return tuple(CatalogCourseSerializer(rows, many=True).data)
+
+
+def get_catalog():
+    """
+    Проекция каталога из кеша.
+
+    Ключ построен на поколении области 'courses', которую сбрасывают
+    сигналы курсов и уроков, поэтому проекция пересчитывается один раз
+    после изменения, а не на каждый запрос.
+    """
+    generation, = get_generations('courses')
+    key = f'{KEY_PREFIX}:catalog:{generation}'
+    catalog = cache.get(key)
+    if catalog is None:
+        catalog = build_catalog()
+        cache.set(key, catalog, settings.MATERIALS_CACHE_TIMEOUT)
+    return catalog
@@ -0,0 +1,65 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+from .cache_service import KEY_PREFIX, get_generations
+
+
+def planner_estimate(queryset):
+    """
+    Оценка числа строк по статистике планировщика PostgreSQL
+    или None, если бэкенд такой оценки не дает.
+
+    Без фильтров берется reltuples таблицы, с фильтрами - оценка
+    Plan Rows из EXPLAIN (сам запрос при этом не выполняется).
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    queryset = queryset.order_by()
+    query = queryset.query
+    if not query.where and not query.distinct:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # До первого ANALYZE reltuples равен -1 (или 0 в старых версиях)
+        if row and row[0] > 0:
+            return int(row[0])
+        return None
+
+    plan = json.loads(queryset.explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _count_key(queryset, scopes):
+    # Список колонок не влияет на количество: ключ общий для объектов и .values()
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    digest = hashlib.md5(repr((sql, params)).encode('utf-8')).hexdigest()
+    gens = '.'.join(str(gen) for gen in get_generations(*scopes))
+    return f'{KEY_PREFIX}:count:{gens}:{digest}'
+
+
+def cached_count(queryset, scopes=()):
+    """
+    Точный COUNT, который кешируется на PAGINATION_COUNT_CACHE_TIMEOUT
+    секунд, если не меньше PAGINATION_EXACT_COUNT_THRESHOLD: маленькие
+    выборки дешевле пересчитать, чем держать в кеше.
+
+    Ключ включает поколения областей кеша, поэтому запись через ORM
+    сразу сбрасывает сохраненное значение.
+    """
+    key = _count_key(queryset, scopes)
+    count = cache.get(key)
+    if count is not None:
+        return count
+    count = queryset.count()
+    if count >= settings.PAGINATION_EXACT_COUNT_THRESHOLD:
+        cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
@@ -0,0 +1,367 @@
+import logging
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connections
+
+from .cache_service import KEY_PREFIX, bump_generation, get_generations
+from .search_service import SEARCH_FIELDS, TERM_RE
+
+QUERY_TERM_RE = re.compile(r'([^\W_]+)(\*?)')
+
+# Верхняя граница для префиксного диапазона в отсортированном словаре
+PREFIX_END = '\U0010ffff'
+
+# Беззнаковые 64 бита: id BigAutoField не помещаются в 'I'
+ID_TYPECODE = 'Q'
+
+# Больше стольких поколений журнала изменений не читаем: дешевле перестроить
+CHANGE_LOG_MAX_GAP = 1000
+
+WARM_UP_UID = 'materials.inverted_index.warm_up'
+
+logger = logging.getLogger(__name__)
+
+# Имя индекса -> модель
+INDEXED_MODELS = {
+    'courses': 'materials.Course',
+    'lessons': 'materials.Lesson',
+}
+
+
+def tokenize(text):
+    return set(TERM_RE.findall(text.lower()))
+
+
+def parse_query(text):
+    """Пары (слово, префикс?) из запроса; 'прог*' ищется как префикс"""
+    return [(term.lower(), bool(star)) for term, star in QUERY_TERM_RE.findall(text)]
+
+
+def document_text(values):
+    return ' '.join(value or '' for value in values)
+
+
+def _intersect(small, large):
+    """Пересечение отсортированных массивов id"""
+    if len(small) * 16 < len(large):
+        result = array(ID_TYPECODE)
+        position = 0
+        for doc_id in small:
+            position = bisect_left(large, doc_id, position)
+            if position == len(large):
+                break
+            if large[position] == doc_id:
+                result.append(doc_id)
+        return result
+    return array(ID_TYPECODE, sorted(set(small).intersection(large)))
+
+
+def _union(postings):
+    if len(postings) == 1:
+        return postings[0]
+    return array(ID_TYPECODE, sorted(set().union(*postings)))
+
+
+class InvertedIndex:
+    """
+    Инвертированный индекс: слово -> отсортированный array(ID_TYPECODE) с id документов.
+
+    Словарь хранится отсортированным списком для префиксного поиска
+    диапазоном bisect; слова каждого документа хранятся отдельно, чтобы
+    заменить документ, зная только его id. Синхронизацию доступа
+    обеспечивает вызывающий код.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.vocabulary = []
+        self.documents = {}
+
+    def __len__(self):
+        return len(self.postings)
+
+    @classmethod
+    def build(cls, documents):
+        """Строит индекс из пар (id, текст), упорядоченных по id"""
+        index = cls()
+        postings = index.postings
+        for doc_id, text in documents:
+            tokens = tokenize(text)
+            index.documents[doc_id] = frozenset(tokens)
+            for token in tokens:
+                ids = postings.get(token)
+                if ids is None:
+                    ids = postings[token] = array(ID_TYPECODE)
+                ids.append(doc_id)
+        index.vocabulary = sorted(postings)
+        return index
+
+    def add(self, doc_id, text):
+        tokens = tokenize(text)
+        self.documents[doc_id] = self.documents.get(doc_id, frozenset()) | tokens
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                self.postings[token] = array(ID_TYPECODE, [doc_id])
+                insort(self.vocabulary, token)
+            elif not ids or ids[-1] < doc_id:
+                ids.append(doc_id)
+            else:
+                position = bisect_left(ids, doc_id)
+                if position == len(ids) or ids[position] != doc_id:
+                    ids.insert(position, doc_id)
+
+    def remove(self, doc_id, text):
+        tokens = tokenize(text)
+        remaining = self.documents.get(doc_id, frozenset()) - tokens
+        if remaining:
+            self.documents[doc_id] = remaining
+        else:
+            self.documents.pop(doc_id, None)
+        self._remove_tokens(doc_id, tokens)
+
+    def replace(self, doc_id, text=None):
+        """Заменяет текст документа; None - документа больше нет"""
+        self._remove_tokens(doc_id, self.documents.pop(doc_id, ()))
+        if text is not None:
+            self.add(doc_id, text)
+
+    def _remove_tokens(self, doc_id, tokens):
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                continue
+            position = bisect_left(ids, doc_id)
+            if position < len(ids) and ids[position] == doc_id:
+                del ids[position]
+            if not ids:
+                del self.postings[token]
+                del self.vocabulary[bisect_left(self.vocabulary, token)]
+
+    def lookup(self, term, prefix=False):
+        if not prefix:
+            return self.postings.get(term, array(ID_TYPECODE))
+        start = bisect_left(self.vocabulary, term)
+        end = bisect_left(self.vocabulary, term + PREFIX_END, start)
+        return _union([self.postings[token] for token in self.vocabulary[start:end]] or [array(ID_TYPECODE)])
+
+    def search(self, terms, operator='and'):
+        """
+        id документов по возрастанию: все слова (operator='and')
+        или хотя бы одно (operator='or'); terms - пары (слово, префикс?)
+        """
+        if not terms:
+            return array(ID_TYPECODE)
+        postings = [self.lookup(term, prefix) for term, prefix in terms]
+        if operator == 'or':
+            return _union(postings)
+        postings.sort(key=len)
+        result = postings[0]
+        for ids in postings[1:]:
+            if not result:
+                break
+            result = _intersect(result, ids)
+        return result
+
+
+class ModelIndex:
+    """
+    Индекс одной модели в памяти процесса.
+
+    Строится в фоне при первом запросе процесса (MATERIALS_INVERTED_INDEX_WARM_UP)
+    или, если прогрева не было, первым поиском; дальше обновляется сигналами
+    моделей. Каждая запись сдвигает поколение области index_scope(name) в общем
+    кеше и кладет id измененных документов в журнал под этим поколением. Не
+    чаще раза в MATERIALS_INVERTED_INDEX_REFRESH_SECONDS индекс сверяет
+    поколение и перечитывает из БД только документы из журнала; если журнал
+    неполон, индекс перестраивается в фоновом потоке, а поиск тем временем
+    идет по прежнему.
+
+    Без SHARED_CACHE поколения и журнал других процессов не видны, поэтому
+    индекс раз в MATERIALS_INVERTED_INDEX_REFRESH_SECONDS перестраивается
+    в фоне целиком (об этом пишется предупреждение в лог).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.RLock()
+        self.build_lock = threading.Lock()
+        self.index = None
+        self.generation = None
+        self.checked_at = 0.0
+        self.built_at = 0.0
+
+    @property
+    def model(self):
+        return apps.get_model(INDEXED_MODELS[self.name])
+
+    @property
+    def scope(self):
+        return index_scope(self.name)
+
+    @property
+    def loaded(self):
+        return self.index is not None
+
+    def documents(self, ids=None):
+        fields = [field for field, _ in SEARCH_FIELDS]
+        queryset = self.model.objects.order_by('id')
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        rows = queryset.values_list('id', *fields).iterator(chunk_size=5000)
+        for row in rows:
+            yield row[0], document_text(row[1:])
+
+    def build(self):
+        """Строит индекс заново; до подмены поиск идет по прежнему индексу"""
+        with self.build_lock:
+            return self._build()
+
+    def _build(self):
+        # Поколение берется до чтения: записи во время построения догонит журнал
+        generation = get_generations(self.scope)[0]
+        if not self.built_at and not settings.SHARED_CACHE:
+            logger.warning(
+                f"Индекс поиска {self.name}: кеш не общий для процессов, изменения из других "
+                f"процессов видны только после перестроения раз в "
+                f"{settings.MATERIALS_INVERTED_INDEX_REFRESH_SECONDS} с"
+            )
+        index = InvertedIndex.build(self.documents())
+        with self.lock:
+            self.index = index
+            self.generation = generation
+            self.checked_at = 0.0
+            self.built_at = time.monotonic()
+        return index
+
+    def start_build(self):
+        """build() в фоновом потоке, если индекс уже не строится"""
+        if self.build_lock.locked():
+            return
+
+        def build():
+            try:
+                self.build()
+            except Exception as e:
+                logger.warning(f"Индекс поиска {self.name} не построен: {e}")
+            finally:
+                connections.close_all()
+
+        threading.Thread(target=build, name=f'search-index-{self.name}', daemon=True).start()
+
+    def ensure_fresh(self):
+        if self.index is None:
+            # Прогрева не было: первый поиск строит индекс сам, остальные ждут его
+            with self.build_lock:
+                if self.index is None:
+                    self._build()
+        now = time.monotonic()
+        if now - self.checked_at >= settings.MATERIALS_INVERTED_INDEX_REFRESH_SECONDS:
+            self.checked_at = now
+            self.catch_up()
+        return self.index
+
+    def catch_up(self):
+        """Применяет изменения других процессов из журнала"""
+        if not settings.SHARED_CACHE:
+            if time.monotonic() - self.built_at >= settings.MATERIALS_INVERTED_INDEX_REFRESH_SECONDS:
+                self.start_build()
+            return
+        generation = self.generation
+        current = get_generations(self.scope)[0]
+        if current == generation:
+            return
+        ids = self.changed_ids(generation, current)
+        if ids is None:
+            self.start_build()
+            return
+        texts = dict(self.documents(ids))
+        with self.lock:
+            # Индекс успели перестроить или догнать в другом потоке
+            if self.generation != generation:
+                return
+            for doc_id in ids:
+                self.index.replace(doc_id, texts.get(doc_id))
+            self.generation = current
+
+    def changed_ids(self, since, current):
+        """id документов, измененных после поколения since, или None, если журнал неполон"""
+        if since is None or not 0 < current - since <= CHANGE_LOG_MAX_GAP:
+            return None
+        keys = [change_log_key(self.scope, generation) for generation in range(since + 1, current + 1)]
+        entries = cache.get_many(keys)
+        if len(entries) != len(keys):
+            return None
+        return sorted(set().union(*entries.values()))
+
+    def search(self, text, operator='and'):
+        terms = parse_query(text)
+        index = self.ensure_fresh()
+        with self.lock:
+            return index.search(terms, operator)
+
+    def update(self, doc_id, text=None):
+        """Заменяет текст документа в индексе (None - документа нет)"""
+        self.update_many([(doc_id, text)])
+
+    def update_many(self, changes):
+        """Пары (id, новый текст или None) одним сдвигом поколения"""
+        with self.lock:
+            generation = self.publish_changes([doc_id for doc_id, _ in changes])
+            if self.index is None:
+                return
+            for doc_id, text in changes:
+                self.index.replace(doc_id, text)
+            # Свою запись засчитываем, только если перед ней не было чужих:
+            # иначе их применит catch_up при следующей проверке
+            if self.generation == generation - 1:
+                self.generation = generation
+
+    def publish_changes(self, ids):
+        """Сдвигает поколение и записывает ids в журнал под новым поколением"""
+        generation = bump_generation(self.scope)[0]
+        cache.set(
+            change_log_key(self.scope, generation), list(ids),
+            settings.MATERIALS_INVERTED_INDEX_CHANGE_LOG_TIMEOUT
+        )
+        return generation
+
+    def reset(self):
+        with self.lock:
+            self.index = None
+            self.generation = None
+
+
+def index_scope(name):
+    return f'search-index:{name}'
+
+
+def change_log_key(scope, generation):
+    return f'{KEY_PREFIX}:changes:{scope}:{generation}'
+
+
+_indexes = {name: ModelIndex(name) for name in INDEXED_MODELS}
+
+
+def get_index(name):
+    return _indexes[name]
+
+
+def warm_up(**kwargs):
+    """Обработчик request_started: первый запрос процесса строит индексы в фоне"""
+    request_started.disconnect(warm_up, dispatch_uid=WARM_UP_UID)
+    for index in _indexes.values():
+        index.start_build()
+
+
+
+def instance_text(instance):
+    return document_text(getattr(instance, field) for field, _ in SEARCH_FIELDS)
@@ -0,0 +1,59 @@
+from django.db import transaction
+from django.utils import timezone
+
+from materials.models import Lesson
+from .cache_service import bump_generation_on_commit, object_scope
+from .inverted_index import get_index, instance_text
+
+
+def _invalidate(lessons, previous_course_ids=()):
+    """
+    То же, что сигналы post_save урока (materials.signals), одним сдвигом
+    поколений на всю пачку после коммита: bulk_create и bulk_update
+    сигналов не отправляют
+    """
+    scopes = {'lessons', 'courses'}
+    scopes.update(object_scope('lesson', lesson.pk) for lesson in lessons)
+    course_ids = {lesson.course_id for lesson in lessons} | set(previous_course_ids)
+    scopes.update(object_scope('course', course_id) for course_id in course_ids)
+    bump_generation_on_commit(*scopes)
+
+
+def _update_search_index(changes):
+    # Как и в сигналах, индекс в памяти меняется только после коммита
+    transaction.on_commit(lambda: get_index('lessons').update_many(changes))
+
+
+def bulk_create_lessons(items):
+    """Создает уроки одним INSERT на пачку; items - словари атрибутов"""
+    lessons = Lesson.objects.bulk_create([Lesson(**attrs) for attrs in items])
+    _invalidate(lessons)
+    _update_search_index([(lesson.pk, instance_text(lesson)) for lesson in lessons])
+    return lessons
+
+
+def bulk_update_lessons(changes):
+    """
+    Частично обновляет уроки одним bulk_update.
+
+    changes - пары (урок, словарь новых значений); обновляются только
+    переданные поля и updated_at, который bulk_update сам не проставляет.
+    """
+    lessons = []
+    previous_course_ids = set()
+    index_changes = []
+    fields = {'updated_at'}
+    now = timezone.now()
+    for lesson, attrs in changes:
+        previous_course_ids.add(lesson.course_id)
+        for name, value in attrs.items():
+            setattr(lesson, name, value)
+        lesson.updated_at = now
+        fields.update(attrs)
+        lessons.append(lesson)
+        index_changes.append((lesson.pk, instance_text(lesson)))
+
+    Lesson.objects.bulk_update(lessons, sorted(fields))
+    _invalidate(lessons, previous_course_ids)
+    _update_search_index(index_changes)
+    return lessons
@@ -0,0 +1,216 @@
+from datetime import timedelta
+from smtplib import SMTPException
+from string import Template
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import EmailMessage
+from django.db import transaction
+from django.utils import timezone
+
+from materials.models import PendingCourseUpdate, Subscription
+
+COURSE_UPDATE_TEMPLATE = Template("""
+        $greeting
+
+        Курс "$course_title" был обновлен.
+
+        $update_message
+
+        Перейдите по ссылке, чтобы ознакомиться с изменениями:
+        $course_url
+
+        С уважением,
+        Команда образовательной платформы
+        """)
+
+
+def build_course_update_email(course, update_message=""):
+    """Тема и шаблон письма об обновлении курса (приветствие подставляет стратегия)"""
+    base_url = getattr(settings, 'BASE_URL', None) or 'http://localhost:8000'
+    subject = f"Обновление курса: {course.title}"
+    body = COURSE_UPDATE_TEMPLATE.safe_substitute(
+        course_title=course.title,
+        update_message=update_message or "В курс были внесены изменения.",
+        course_url=f"{base_url}/api/courses/{course.id}/",
+    )
+    return subject, body
+
+
+def course_recipients(course_id):
+    """Пары (email, имя) активных подписчиков без загрузки объектов"""
+    return Subscription.objects.filter(
+        course_id=course_id,
+        is_active=True
+    ).exclude(user__email='').values_list('user__email', 'user__first_name')
+
+
+def iter_course_recipients(course_id, chunk_size):
+    """Поток получателей рассылки пачками по chunk_size строк"""
+    return course_recipients(course_id).iterator(chunk_size=chunk_size)
+
+
+class DeliveryStrategy:
+    """
+    Способ превращения пачки получателей в письма.
+
+    recipients - список пар [email, имя]; deliver возвращает получателей,
+    письма которым не удалось отправить.
+    """
+    name = None
+
+    def build_messages(self, subject, body, recipients, connection):
+        raise NotImplementedError
+
+    def deliver(self, subject, body, recipients, connection):
+        failed = []
+        for message, message_recipients in self.build_messages(subject, body, recipients, connection):
+            try:
+                connection.send_messages([message])
+            except (SMTPException, OSError):
+                failed.extend(message_recipients)
+        return failed
+
+    @staticmethod
+    def render(body, greeting="Здравствуйте!"):
+        return Template(body).safe_substitute(greeting=greeting)
+
+
+class PerRecipientDelivery(DeliveryStrategy):
+    """Отдельное письмо каждому подписчику"""
+    name = 'per_recipient'
+
+    def build_messages(self, subject, body, recipients, connection):
+        text = self.render(body)
+        for recipient in recipients:
+            message = EmailMessage(
+                subject=subject,
+                body=text,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[recipient[0]],
+                connection=connection,
+            )
+            yield message, [recipient]
+
+
+class BccBatchDelivery(DeliveryStrategy):
+    """Одно письмо на batch_size подписчиков, адреса скрыты в BCC"""
+    name = 'bcc'
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.COURSE_UPDATE_BCC_BATCH_SIZE
+
+    def build_messages(self, subject, body, recipients, connection):
+        text = self.render(body)
+        for start in range(0, len(recipients), self.batch_size):
+            batch = recipients[start:start + self.batch_size]
+            message = EmailMessage(
+                subject=subject,
+                body=text,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[settings.DEFAULT_FROM_EMAIL],
+                bcc=[recipient[0] for recipient in batch],
+                connection=connection,
+            )
+            yield message, batch
+
+
+class PersonalizedDelivery(DeliveryStrategy):
+    """Отдельное письмо каждому подписчику с обращением по имени"""
+    name = 'personalized'
+
+    def build_messages(self, subject, body, recipients, connection):
+        template = Template(body)
+        for recipient in recipients:
+            email, first_name = recipient
+            greeting = f"Здравствуйте, {first_name}!" if first_name else "Здравствуйте!"
+            message = EmailMessage(
+                subject=subject,
+                body=template.safe_substitute(greeting=greeting),
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email],
+                connection=connection,
+            )
+            yield message, [recipient]
+
+
+DELIVERY_STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (PerRecipientDelivery, BccBatchDelivery, PersonalizedDelivery)
+}
+
+
+def get_delivery_strategy(name=None):
+    """Стратегия доставки по имени, по умолчанию COURSE_UPDATE_DELIVERY_STRATEGY"""
+    name = name or settings.COURSE_UPDATE_DELIVERY_STRATEGY
+    try:
+        return DELIVERY_STRATEGIES[name]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Неизвестная стратегия доставки '{name}'. "
+            f"Доступны: {', '.join(DELIVERY_STRATEGIES)}"
+        )
+
+
+def schedule_course_update(course_id, summary):
+    """
+    Добавляет изменение курса в ожидающее уведомление.
+
+    Пачка - строка PendingCourseUpdate курса, общая для всех процессов.
+    Первая правка пачки записывает в outbox её отправку: сразу, если
+    уведомлений не было COURSE_UPDATE_DEBOUNCE_SECONDS, иначе - в конце
+    этого окна; остальные под блокировкой строки дописывают свою строку
+    в сводку. Так первое изменение доходит без задержки, а частые правки
+    уходят не чаще раза в окно. Вызывается в транзакции изменения курса:
+    при откате не остается ни пачки, ни задачи. Возвращает True, если
+    отправка была запланирована этим вызовом.
+    """
+    from materials.services.outbox_service import enqueue_task
+    from materials.tasks.celery_tasks import dispatch_course_update
+
+    with transaction.atomic():
+        pending, _ = PendingCourseUpdate.objects.select_for_update().get_or_create(course_id=course_id)
+        opens_batch = not pending.summaries
+        pending.summaries.append(summary)
+        if opens_batch:
+            pending.batch += 1
+            enqueue_task(
+                dispatch_course_update,
+                args=(course_id, pending.batch),
+                countdown=_course_update_delay(pending.notified_at)
+            )
+        pending.save(update_fields=['summaries', 'batch'])
+    return opens_batch
+
+
+def _course_update_delay(notified_at):
+    """Секунды до конца окна после прошлого уведомления (0 - отправлять сразу)"""
+    if notified_at is None:
+        return 0
+    window_end = notified_at + timedelta(seconds=settings.COURSE_UPDATE_DEBOUNCE_SECONDS)
+    return max(0, int((window_end - timezone.now()).total_seconds()))
+
+
+def collect_course_update(course_id, batch_id):
+    """
+    Закрывает пачку изменений и возвращает объединенную сводку
+    или None, если пачка уже была отправлена
+    """
+    with transaction.atomic():
+        pending = PendingCourseUpdate.objects.select_for_update().filter(
+            course_id=course_id,
+            batch=batch_id
+        ).first()
+        if pending is None or not pending.summaries:
+            return None
+        summaries = list(dict.fromkeys(pending.summaries))
+        # Новые правки после этой точки попадут в следующую пачку
+        pending.summaries = []
+        pending.notified_at = timezone.now()
+        pending.save(update_fields=['summaries', 'notified_at'])
+
+    limit = settings.COURSE_UPDATE_SUMMARY_LIMIT
+    lines = summaries[:limit]
+    if len(summaries) > limit:
+        lines.append(f"...и еще изменений: {len(summaries) - limit}")
+    return "\n".join(lines)
@@ -0,0 +1,95 @@
+import logging
+import threading
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from materials.models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_task(task, args=(), kwargs=None, countdown=None):
+    """
+    Записывает задачу в outbox в текущей транзакции.
+
+    При откате транзакции задача не будет отправлена. В брокер её передает
+    drain_task_outbox; с OUTBOX_PUBLISH_ON_COMMIT - еще и фоновый поток
+    после коммита, поэтому запрос не ждет брокер и не держит блокировки.
+    Отложенная задача (countdown) ждет своего времени в outbox, а не в брокере:
+    ETA дольше visibility_timeout Redis приводит к повторной доставке.
+    """
+    message = OutboxMessage.objects.create(
+        task_name=task.name,
+        args=list(args),
+        kwargs=kwargs or {},
+        eta=timezone.now() + timedelta(seconds=countdown) if countdown else None,
+    )
+    if settings.OUTBOX_PUBLISH_ON_COMMIT and not countdown:
+        transaction.on_commit(lambda: publish_in_background([message.id]), robust=True)
+    return message
+
+
+def publish_in_background(ids):
+    """publish_pending(ids) в отдельном потоке со своим соединением с БД"""
+    def publish():
+        try:
+            publish_pending(ids=ids)
+        except Exception as e:
+            logger.warning(f"Outbox: сообщения {ids} дождутся drain_task_outbox: {e}")
+        finally:
+            connections.close_all()
+
+    threading.Thread(target=publish, name='outbox-publish', daemon=True).start()
+
+
+def _publish(message):
+    task = current_app.tasks[message.task_name]
+    task.apply_async(args=message.args, kwargs=message.kwargs)
+
+
+def publish_pending(ids=None, batch_size=None):
+    """
+    Передает в брокер пачку неотправленных сообщений, чье время запуска наступило.
+
+    Строки блокируются с SKIP LOCKED, поэтому параллельные обработчики
+    не отправляют одно сообщение дважды. Первая ошибка брокера прерывает
+    пачку: остальные сообщения дождутся следующего запуска.
+    Возвращает число отправленных сообщений.
+    """
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    with transaction.atomic():
+        pending = OutboxMessage.objects.select_for_update(skip_locked=True).filter(
+            Q(eta__isnull=True) | Q(eta__lte=timezone.now()),
+            dispatched_at__isnull=True,
+        ).order_by('id')
+        if ids is not None:
+            pending = pending.filter(id__in=ids)
+        messages = list(pending[:batch_size])
+
+        processed = []
+        for message in messages:
+            try:
+                _publish(message)
+            except Exception as e:
+                logger.warning(f"Не удалось отправить {message} в брокер: {e}")
+                message.attempts += 1
+                message.last_error = str(e)
+                processed.append(message)
+                break
+            message.dispatched_at = timezone.now()
+            processed.append(message)
+
+        OutboxMessage.objects.bulk_update(processed, ['dispatched_at', 'attempts', 'last_error'])
+    return sum(1 for message in processed if message.dispatched_at)
+
+
+def purge_dispatched():
+    """Удаляет отправленные сообщения старше OUTBOX_RETENTION_DAYS"""
+    threshold = timezone.now() - timedelta(days=settings.OUTBOX_RETENTION_DAYS)
+    deleted, _ = OutboxMessage.objects.filter(dispatched_at__lt=threshold).delete()
+    return deleted
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache_service import KEY_PREFIX, aget_generations, bump_generation, get_generations
+
+MODERATORS_GROUP = 'moderators'
+
+
+def user_roles_scope(user_id):
+    return f'roles:{user_id}'
+
+
+def get_roles_version(user_id):
+    """
+    Версия ролей пользователя - поколение user_roles_scope.
+
+    Записывается в JWT вместе с группами (users.serializers) и сдвигается
+    при любом изменении групп, прав или статуса пользователя
+    """
+    generation, = get_generations(user_roles_scope(user_id))
+    return generation
+
+
+async def aget_roles_version(user_id):
+    generation, = await aget_generations(user_roles_scope(user_id))
+    return generation
+
+
+def bump_roles_version(user_ids):
+    """Сбрасывает кеш групп и отзывает claims ролей в выданных токенах"""
+    if user_ids:
+        bump_generation(*(user_roles_scope(user_id) for user_id in user_ids))
+
+
+def _roles_key(user_id, generation):
+    return f'{KEY_PREFIX}:roles:{user_id}:{generation}'
+
+
+def get_user_groups(user):
+    """
+    Имена групп пользователя.
+
+    Запоминаются на объекте пользователя (request.user живет один запрос)
+    и в общем кеше на USER_ROLES_CACHE_TIMEOUT секунд под поколением
+    user_roles_scope, которое сдвигают изменения состава групп
+    (m2m_changed в materials.signals). Все проверки прав одного запроса
+    обходятся одним обращением к кешу, а не запросом к группам на объект.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+    groups = getattr(user, '_group_names', None)
+    if groups is not None:
+        return groups
+
+    key = _roles_key(user.pk, get_roles_version(user.pk))
+    groups = cache.get(key)
+    if groups is None:
+        groups = frozenset(user.groups.values_list('name', flat=True))
+        cache.set(key, groups, settings.USER_ROLES_CACHE_TIMEOUT)
+    user._group_names = groups
+    return groups
+
+
+def forget_user_groups(user):
+    """Сбрасывает запомненные на объекте пользователя группы"""
+    user.__dict__.pop('_group_names', None)
+
+
+def is_moderator(user):
+    return MODERATORS_GROUP in get_user_groups(user)
@@ -0,0 +1,198 @@
+import re
+from functools import reduce
+from operator import add, or_
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Q
+
+# Поля полнотекстового индекса курсов и уроков и их веса в ранжировании
+SEARCH_FIELDS = (('title', 'A'), ('description', 'B'))
+
+# Больше слов в запросе не дают лучшей выдачи, но удлиняют запрос
+MAX_TERMS = 8
+
+TERM_RE = re.compile(r'[^\W_]+')
+
+
+def search_terms(text):
+    """Слова поискового запроса без операторов и спецсимволов"""
+    return TERM_RE.findall(text.lower())[:MAX_TERMS]
+
+
+class SearchBackend:
+    """
+    Способ поиска по курсам и урокам.
+
+    search возвращает queryset, отфильтрованный по всем словам запроса
+    (последнее слово и остальные ищутся как префиксы) и упорядоченный
+    по релевантности; install/uninstall создают и удаляют индекс модели.
+    """
+    name = None
+
+    def search(self, queryset, text):
+        raise NotImplementedError
+
+    def install(self, schema_editor, model):
+        pass
+
+    def uninstall(self, schema_editor, model):
+        pass
+
+    def rebuild(self, model):
+        pass
+
+
+class IContainsSearchBackend(SearchBackend):
+    """ILIKE '%слово%' по каждому полю, как в SearchFilter; индексы не используются"""
+    name = 'icontains'
+
+    def search(self, queryset, text):
+        for term in search_terms(text):
+            queryset = queryset.filter(
+                reduce(or_, (Q(**{f'{field}__icontains': term}) for field, _ in SEARCH_FIELDS))
+            )
+        return queryset
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    tsvector с русской морфологией и GIN-индекс по тому же выражению.
+
+    Индекс строится по выражению, а не по отдельной колонке, поэтому
+    синхронизировать его при сохранении не нужно.
+    """
+    name = 'postgres'
+    config = 'russian'
+
+    def vector(self):
+        return reduce(add, (
+            SearchVector(field, weight=weight, config=self.config)
+            for field, weight in SEARCH_FIELDS
+        ))
+
+    def search(self, queryset, text):
+        terms = search_terms(text)
+        if not terms:
+            return queryset
+        query = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms),
+            search_type='raw',
+            config=self.config
+        )
+        vector = self.vector()
+        return queryset.annotate(
+            search_vector=vector,
+            search_rank=SearchRank(vector, query),
+        ).filter(search_vector=query).order_by('-search_rank', 'id')
+
+    def index(self, model):
+        return GinIndex(self.vector(), name=f'{model._meta.db_table}_search_idx')
+
+    def install(self, schema_editor, model):
+        schema_editor.add_index(model, self.index(model))
+
+    def uninstall(self, schema_editor, model):
+        schema_editor.remove_index(model, self.index(model))
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """
+    Виртуальная таблица FTS5 с внешним содержимым (content=) на каждую модель.
+
+    Таблица синхронизируется триггерами на вставку, изменение и удаление,
+    поэтому bulk_create и update() тоже попадают в индекс. Ранжирование - bm25
+    с весами полей из SEARCH_FIELDS (в SQLite меньшее значение лучше).
+    """
+    name = 'fts5'
+    weights = {'A': 10.0, 'B': 5.0}
+
+    @staticmethod
+    def fts_table(model):
+        return f'{model._meta.db_table}_fts'
+
+    def search(self, queryset, text):
+        terms = search_terms(text)
+        if not terms:
+            return queryset
+        table = queryset.model._meta.db_table
+        fts = self.fts_table(queryset.model)
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(self.weights[weight]) for _, weight in SEARCH_FIELDS)
+        # Соединение с FTS-таблицей: bm25 считается один раз на найденную строку
+        return queryset.extra(
+            tables=[fts],
+            where=[f'{fts}.rowid = {table}.id', f'{fts} MATCH %s'],
+            params=[match],
+            select={'search_rank': f'bm25({fts}, {weights})'},
+        ).order_by('search_rank', 'id')
+
+    def install(self, schema_editor, model):
+        table = model._meta.db_table
+        fts = self.fts_table(model)
+        columns = ', '.join(field for field, _ in SEARCH_FIELDS)
+        new_values = ', '.join(f'new.{field}' for field, _ in SEARCH_FIELDS)
+        old_values = ', '.join(f'old.{field}' for field, _ in SEARCH_FIELDS)
+        delete_old = f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values});"
+        insert_new = f"INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values});"
+
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, "
+            f"content='{table}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN {insert_new} END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN {delete_old} END"
+        )
+        schema_editor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {columns} ON {table} "
+            f"BEGIN {delete_old} {insert_new} END"
+        )
+        schema_editor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+    def uninstall(self, schema_editor, model):
+        fts = self.fts_table(model)
+        for suffix in ('ai', 'ad', 'au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {fts}_{suffix}')
+        schema_editor.execute(f'DROP TABLE IF EXISTS {fts}')
+
+    def rebuild(self, model):
+        """Пересоздает триггеры (SQLite удаляет их при пересборке таблицы) и индекс"""
+        with connection.schema_editor() as schema_editor:
+            self.install(schema_editor, model)
+
+
+SEARCH_BACKENDS = {
+    backend.name: backend
+    for backend in (IContainsSearchBackend, PostgresSearchBackend, SQLiteFTSSearchBackend)
+}
+
+VENDOR_SEARCH_BACKENDS = {
+    'postgresql': PostgresSearchBackend.name,
+    'sqlite': SQLiteFTSSearchBackend.name,
+}
+
+
+def native_search_backend(vendor):
+    """Полнотекстовый бэкенд для СУБД, для прочих СУБД - icontains"""
+    return SEARCH_BACKENDS[VENDOR_SEARCH_BACKENDS.get(vendor, IContainsSearchBackend.name)]()
+
+
+def get_search_backend(name=None):
+    """Бэкенд поиска по имени, по умолчанию MATERIALS_SEARCH_BACKEND ('auto' - по СУБД)"""
+    name = name or settings.MATERIALS_SEARCH_BACKEND
+    if name == 'auto':
+        return native_search_backend(connection.vendor)
+    try:
+        return SEARCH_BACKENDS[name]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Неизвестный бэкенд поиска '{name}'. "
+            f"Доступны: auto, {', '.join(SEARCH_BACKENDS)}"
+        )
@@ -0,0 +1,128 @@
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from materials.models import Subscription
+from .cache_service import (
+    KEY_PREFIX,
+    aget_generations,
+    bump_generation,
+    get_generations,
+    user_subscriptions_scope,
+)
+
+
+def _subscriptions_key(user_id, generation):
+    return f'{KEY_PREFIX}:subscriptions:{user_id}:{generation}'
+
+
+def get_subscribed_course_ids(user_id):
+    """
+    Множество ID курсов с активной подпиской пользователя.
+
+    Хранится в кеше под ключом с поколением подписок пользователя, которое
+    увеличивается при каждом изменении его подписок (materials.signals),
+    поэтому проверка членства не обращается к таблице подписок.
+    """
+    if user_id is None:
+        return frozenset()
+
+    generation, = get_generations(user_subscriptions_scope(user_id))
+    key = _subscriptions_key(user_id, generation)
+    course_ids = cache.get(key)
+    if course_ids is None:
+        course_ids = frozenset(
+            Subscription.objects.filter(
+                user_id=user_id,
+                is_active=True
+            ).values_list('course_id', flat=True)
+        )
+        cache.set(key, course_ids, timeout=None)
+    return course_ids
+
+
+async def aget_subscribed_course_ids(user_id):
+    """get_subscribed_course_ids для async-представлений"""
+    if user_id is None:
+        return frozenset()
+
+    generation, = await aget_generations(user_subscriptions_scope(user_id))
+    key = _subscriptions_key(user_id, generation)
+    course_ids = await cache.aget(key)
+    if course_ids is None:
+        course_ids = frozenset([
+            course_id async for course_id in Subscription.objects.filter(
+                user_id=user_id,
+                is_active=True
+            ).values_list('course_id', flat=True)
+        ])
+        await cache.aset(key, course_ids, timeout=None)
+    return course_ids
+
+
+def set_subscription(user_id, course_id, is_active=None):
+    """
+    Подписка пользователя на курс: is_active=True/False задает состояние
+    (повторный запрос ничего не меняет), None - переключает его.
+
+    Строка подписки блокируется (SELECT ... FOR UPDATE) до конца транзакции,
+    а вставку конкурирующего запроса останавливает уникальный индекс
+    (user, course), поэтому одновременные запросы выполняются по очереди
+    и не теряют изменения друг друга. Возвращает (подписка, изменилась ли).
+    """
+    with transaction.atomic():
+        subscription, created = Subscription.objects.select_for_update().get_or_create(
+            user_id=user_id,
+            course_id=course_id,
+            defaults={'is_active': True if is_active is None else is_active}
+        )
+        if created:
+            return subscription, True
+        target = not subscription.is_active if is_active is None else is_active
+        if subscription.is_active == target:
+            return subscription, False
+        subscription.is_active = target
+        subscription.save(update_fields=['is_active'])
+        return subscription, True
+
+
+def bulk_set_subscriptions(user_ids, course_ids, is_active):
+    """
+    Подписывает (is_active=True) или отписывает всех user_ids от всех course_ids.
+
+    Работает множествами, а не по паре: отписка и повторная подписка -
+    один UPDATE, новые подписки - bulk_create с ignore_conflicts, поэтому
+    повторный запрос и гонка с одиночной подпиской ничего не ломают.
+    Отписка строк не создает. update() и bulk_create не отправляют
+    сигналов, поэтому поколения подписок пользователей сдвигаются здесь.
+
+    Возвращает словарь счетчиков: created, updated, unchanged.
+    """
+    user_ids = sorted(set(user_ids))
+    course_ids = sorted(set(course_ids))
+    pairs = Subscription.objects.filter(user_id__in=user_ids, course_id__in=course_ids)
+    total = len(user_ids) * len(course_ids)
+
+    with transaction.atomic():
+        updated = pairs.filter(is_active=not is_active).update(is_active=is_active)
+        created = 0
+        if is_active:
+            # Существующие пары не вставляются повторно; ignore_conflicts
+            # нужен только для гонки с параллельной подпиской
+            existing = set(pairs.values_list('user_id', 'course_id'))
+            if len(existing) < total:
+                new = (
+                    Subscription(user_id=user_id, course_id=course_id, is_active=True)
+                    for user_id in user_ids for course_id in course_ids
+                    if (user_id, course_id) not in existing
+                )
+                while batch := list(islice(new, settings.SUBSCRIPTIONS_BULK_BATCH_SIZE)):
+                    Subscription.objects.bulk_create(batch, ignore_conflicts=True)
+                created = pairs.count() - len(existing)
+        if updated or created:
+            scopes = [user_subscriptions_scope(user_id) for user_id in user_ids]
+            transaction.on_commit(lambda: bump_generation(*scopes))
+
+    return {'created': created, 'updated': updated, 'unchanged': total - created - updated}
@@ -0,0 +1,93 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .models import Course, Lesson, Subscription
+from .services.cache_service import bump_generation_on_commit, object_scope, user_subscriptions_scope
+from .services.inverted_index import get_index, instance_text
+from .services.role_service import bump_roles_version, forget_user_groups
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=Course)
+def invalidate_course_cache(sender, instance, **kwargs):
+    bump_generation_on_commit('courses', object_scope('course', instance.pk))
+
+
+@receiver(pre_save, sender=Lesson)
+def remember_lesson_course(sender, instance, **kwargs):
+    """Запоминаем прежний курс, чтобы сбросить кеш обоих курсов при переносе урока"""
+    if instance.pk:
+        instance._previous_course_id = Lesson.objects.filter(
+            pk=instance.pk
+        ).values_list('course_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+def invalidate_lesson_cache(sender, instance, **kwargs):
+    scopes = {
+        'lessons',
+        'courses',
+        object_scope('lesson', instance.pk),
+        object_scope('course', instance.course_id),
+    }
+    previous_course_id = getattr(instance, '_previous_course_id', None)
+    if previous_course_id:
+        scopes.add(object_scope('course', previous_course_id))
+    bump_generation_on_commit(*scopes)
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def invalidate_subscription_cache(sender, instance, **kwargs):
+    bump_generation_on_commit(user_subscriptions_scope(instance.user_id))
+
+
+def _update_search_index(name, doc_id, text):
+    # Индекс общий для процесса: изменения откатившейся транзакции в него не попадают
+    transaction.on_commit(lambda: get_index(name).update(doc_id, text))
+
+
+@receiver(post_save, sender=Course)
+@receiver(post_save, sender=Lesson)
+def index_saved_document(sender, instance, **kwargs):
+    name = 'courses' if sender is Course else 'lessons'
+    _update_search_index(name, instance.pk, instance_text(instance))
+
+
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=Lesson)
+def unindex_deleted_document(sender, instance, **kwargs):
+    name = 'courses' if sender is Course else 'lessons'
+    _update_search_index(name, instance.pk, None)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_on_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Состав групп изменился со стороны пользователя (user.groups.add)
+    или группы (group.user_set.add): сбрасываем кеш групп затронутых пользователей
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            forget_user_groups(instance)
+            bump_roles_version([instance.pk])
+        return
+
+    if action == 'pre_clear':
+        # После clear() участников группы уже не узнать
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        bump_roles_version(pk_set)
+    elif action == 'post_clear':
+        bump_roles_version(instance.__dict__.pop('_cleared_user_ids', ()))
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def invalidate_roles_on_group_change(sender, instance, **kwargs):
+    """Переименование или удаление группы меняет набор имен у всех ее участников"""
+    if instance.pk and not kwargs.get('created'):
+        bump_roles_version(list(instance.user_set.values_list('pk', flat=True)))
@@ -1,94 +1,120 @@
 import logging
-from datetime import timedelta
+from itertools import islice
+from smtplib import SMTPException
 
-from celery import shared_task
-from django.core.mail import send_mail
+from celery import chord, shared_task
+from django.core.mail import get_connection
 from django.conf import settings
-from django.utils import timezone
 
-from materials.models import Course, Subscription
+from materials.models import Course
+from materials.services.notification_service import (
+    build_course_update_email,
+    collect_course_update,
+    get_delivery_strategy,
+    iter_course_recipients,
+)
+from materials.services.outbox_service import publish_pending, purge_dispatched
 
 logger = logging.getLogger(__name__)
 
+
+def _chunked(iterable, size):
+    """Разбивает поток значений на списки не длиннее size"""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+@shared_task(bind=True, autoretry_for=(SMTPException, OSError),
+             retry_backoff=True, max_retries=3)
+def send_course_update_chunk(self, subject, message, recipients, sent_before=0, strategy=None):
+    """
+    Отправляет пачку писем об обновлении курса через одно SMTP-соединение.
+
+    recipients - пары [email, имя], письма строит стратегия доставки.
+    Ошибка открытия соединения повторяет всю пачку; при повторе отдельных
+    писем отправляются только не ушедшие, а уже отправленные учитываются
+    в sent_before, чтобы итог chord оставался точным.
+    """
+    delivery = get_delivery_strategy(strategy)
+    connection = get_connection(fail_silently=False)
+    connection.open()
+    try:
+        failed = delivery.deliver(subject, message, recipients, connection)
+    finally:
+        connection.close()
+
+    if failed:
+        logger.warning(f"Не удалось отправить {len(failed)} писем: {[r[0] for r in failed]}")
+
+    sent_count = sent_before + len(recipients) - len(failed)
+    if failed and self.request.retries < self.max_retries:
+        raise self.retry(
+            args=(subject, message, failed),
+            kwargs={'sent_before': sent_count, 'strategy': delivery.name},
+            countdown=2 ** self.request.retries,
+        )
+
+    return {'sent_count': sent_count, 'failed_count': len(failed)}
+
+
+@shared_task
+def aggregate_course_update_results(results, course_id):
+    """Суммирует результаты отправки всех пачек писем курса"""
+    summary = {
+        'status': 'success',
+        'course_id': course_id,
+        'chunks': len(results),
+        'sent_count': sum(result['sent_count'] for result in results),
+        'failed_count': sum(result['failed_count'] for result in results),
+    }
+    logger.info(f"Рассылка по курсу {course_id} завершена: {summary}")
+    return summary
+
+
 @shared_task
 def send_course_update_email(course_id, update_message=""):
     """
     Отправляет email всем подписчикам курса при его обновлении.
     
-    ДОПОЛНИТЕЛЬНОЕ ЗАДАНИЕ: 
-    Проверяет, что курс не обновлялся более 4 часов перед отправкой уведомлений.
+    Частоту рассылок ограничивает schedule_course_update: правки курса
+    после уведомления копятся до конца окна COURSE_UPDATE_DEBOUNCE_SECONDS
+    и уходят одним письмом.
     """
     try:
         course = Course.objects.get(id=course_id)
         
-        # ✅ ДОПОЛНИТЕЛЬНОЕ ЗАДАНИЕ: Проверка на 4 часа
-        # Проверяем, когда курс был последний раз обновлен
-        four_hours_ago = timezone.now() - timedelta(hours=4)
+        subject, email_content = build_course_update_email(course, update_message)
+        strategy = get_delivery_strategy().name
         
-        if course.updated_at and course.updated_at > four_hours_ago:
-            logger.info(f"Курс '{course.title}' был обновлен менее 4 часов назад. "
-                       f"Последнее обновление: {course.updated_at}. "
-                       f"Уведомления не отправляются.")
-            return {
-                'status': 'skipped',
-                'reason': 'Course updated less than 4 hours ago',
-                'course_id': course_id,
-                'last_updated': course.updated_at.isoformat() if course.updated_at else None
-            }
+        # Адреса подписчиков читаются потоком, без загрузки объектов пользователей
+        chunk_size = settings.COURSE_UPDATE_EMAIL_CHUNK_SIZE
+        recipients = iter_course_recipients(course.id, chunk_size)
         
-        # Получаем всех активных подписчиков курса
-        subscriptions = Subscription.objects.filter(
-            course=course,
-            is_active=True
-        ).select_related('user')
+        header = [
+            send_course_update_chunk.s(subject, email_content, chunk, strategy=strategy)
+            for chunk in _chunked(recipients, chunk_size)
+        ]
         
-        if not subscriptions.exists():
+        if not header:
             logger.info(f"У курса '{course.title}' нет активных подписчиков.")
             return {
                 'status': 'no_subscribers',
                 'course_id': course_id,
                 'course_title': course.title
             }
-        # Формируем email
-        subject = f"Обновление курса: {course.title}"
-        
-        email_content = f"""
-        Здравствуйте!
-        
-        Курс "{course.title}" был обновлен.
-        
-        {update_message if update_message else "В курс были внесены изменения."}
-        
-        Перейдите по ссылке, чтобы ознакомиться с изменениями:
-        {settings.BASE_URL or 'http://localhost:8000'}/api/courses/{course.id}/
         
-        С уважением,
-        Команда образовательной платформы
-        """
-        
-        # Отправляем письма всем подписчикам
-        sent_count = 0
-        for subscription in subscriptions:
-            user = subscription.user
-            if user.email:
-                send_mail(
-                    subject=subject,
-                    message=email_content,
-                    from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[user.email],
-                    fail_silently=False,
-                )
-                sent_count += 1
-                logger.info(f"Отправлено письмо об обновлении курса пользователю {user.email}")
-        
-        logger.info(f"Отправлено {sent_count} писем об обновлении курса '{course.title}'")
+        # Каждая пачка отправляется отдельной подзадачей, итог собирает callback
+        result = chord(header)(aggregate_course_update_results.s(course_id=course_id))
+        logger.info(f"Рассылка по курсу '{course.title}' разбита на {len(header)} пачек")
         
         return {
-            'status': 'success',
-            'sent_count': sent_count,
+            'status': 'dispatched',
+            'chunks': len(header),
+            'strategy': strategy,
+            'result_id': result.id,
             'course_id': course_id,
             'course_title': course.title,
-            'check_performed': True,  # ✅ Проверка на 4 часа выполнена
             'last_updated': course.updated_at.isoformat() if course.updated_at else None
         }
     except Course.DoesNotExist:
@@ -105,3 +131,36 @@ def send_course_update_email(course_id, update_message=""):
             'error': str(e),
             'course_id': course_id
         }
+
+
+@shared_task
+def dispatch_course_update(course_id, batch_id):
+    """
+    Отправляет одно уведомление по всем правкам курса, накопленным в пачке.
+    Повторный запуск той же пачки (например, при повторной доставке
+    отложенной задачи брокером) ничего не делает.
+    """
+    update_message = collect_course_update(course_id, batch_id)
+    if update_message is None:
+        logger.info(f"Пачка изменений {batch_id} курса {course_id} уже отправлена")
+        return {'status': 'duplicate', 'course_id': course_id}
+    return send_course_update_email(course_id, update_message)
+
+
+@shared_task
+def drain_task_outbox():
+    """
+    Передает в брокер задачи из outbox, не ушедшие сразу после коммита
+    (например, пока Redis был недоступен) или дождавшиеся своего времени
+    запуска, и чистит старые записи
+    """
+    published = 0
+    while True:
+        count = publish_pending()
+        published += count
+        if count < settings.OUTBOX_BATCH_SIZE:
+            break
+    purged = purge_dispatched()
+    if published or purged:
+        logger.info(f"Outbox: отправлено {published}, удалено {purged}")
+    return {'published': published, 'purged': purged}
@@ -1,9 +1,54 @@
-from django.test import TestCase
+import asyncio
+import json
+from io import StringIO
+from smtplib import SMTPRecipientsRefused
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.signals import request_started
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
 
-from .models import Course, Lesson, Subscription
+from .async_views import AsyncReadView
+from .models import Course, Lesson, OutboxMessage, Subscription
+from .permissions import IsModerator, IsNotModerator, IsOwnerOrModerator
+from .row_builders import compile_row_builder
+from .serializers import CourseListSerializer, LessonListSerializer
+from .services import cache_service, catalog_service
+from .services.search_service import SQLiteFTSSearchBackend
+from .services.inverted_index import (
+    INDEXED_MODELS,
+    WARM_UP_UID,
+    InvertedIndex,
+    ModelIndex,
+    get_index,
+    index_scope,
+    parse_query,
+    warm_up,
+)
+from .services.notification_service import collect_course_update, schedule_course_update
+from .services.outbox_service import enqueue_task
+from .services.subscription_service import get_subscribed_course_ids
+from .tasks.celery_tasks import (
+    dispatch_course_update,
+    drain_task_outbox,
+    send_course_update_chunk,
+    send_course_update_email,
+)
+from config.celery import app as celery_app
+from users import tasks as users_tasks
+from users.serializers import CustomTokenObtainPairSerializer
 
 User = get_user_model()
 
@@ -196,4 +241,1417 @@ class MaterialsTestCase(TestCase):
             self.assertIn(self.course1.id, course_ids)
         else:
             # Если все остальное не работает, пропускаем тест
-            self.skipTest("Endpoint для получения курса с флагом подписки не работает")
\ No newline at end of file
+            self.skipTest("Endpoint для получения курса с флагом подписки не работает")
+
+class CourseListQueriesTestCase(TestCase):
+    """Количество запросов в списке курсов не зависит от числа курсов"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='student@test.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def create_courses(self, count):
+        # Кеш сбрасывается после коммита (materials.signals)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(Course.objects.count(), count):
+                course = Course.objects.create(
+                    title=f'Курс {i}',
+                    description='Описание курса',
+                    owner=self.user
+                )
+                Lesson.objects.bulk_create([
+                    Lesson(
+                        title=f'Урок {i}.{j}',
+                        description='Описание урока',
+                        video_link='https://www.youtube.com/watch?v=test',
+                        course=course,
+                        owner=self.user
+                    )
+                    for j in range(3)
+                ])
+                if i % 2 == 0:
+                    Subscription.objects.create(user=self.user, course=course)
+
+    def test_constant_query_count(self):
+        for count in (1, 10, 50):
+            self.create_courses(count)
+            # COUNT для пагинации, выборка курсов с аннотациями, prefetch уроков
+            # и загрузка множества подписок, сброшенного созданием подписок
+            with self.assertNumQueries(4):
+                response = self.client.get('/api/v1/materials/courses/?expand=lessons')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            # Без ?expand=lessons уроки не загружаются, подписки уже в кеше,
+            # COUNT меньше PAGINATION_EXACT_COUNT_THRESHOLD не кешируется
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/v1/materials/courses/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_annotations_match_data(self):
+        self.create_courses(2)
+        response = self.client.get('/api/v1/materials/courses/?expand=lessons')
+        courses = response.data['results']
+        self.assertEqual([c['lessons_count'] for c in courses], [3, 3])
+        self.assertEqual([len(c['lessons']) for c in courses], [3, 3])
+        self.assertEqual([c['is_subscribed'] for c in courses], [True, False])
+
+    def test_inactive_subscription_is_not_subscribed(self):
+        self.create_courses(1)
+        Subscription.objects.filter(user=self.user).update(is_active=False)
+        response = self.client.get('/api/v1/materials/courses/')
+        self.assertFalse(response.data['results'][0]['is_subscribed'])
+
+
+class ResponseCacheTestCase(TestCase):
+    """Кеширование ответов курсов и уроков и их инвалидация"""
+
+    def setUp(self):
+        cache.clear()
+        cache_service.reset_stats()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='student@test.com',
+            password='testpass123'
+        )
+        self.other_user = User.objects.create_user(
+            email='other@test.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(
+            title='Курс',
+            description='Описание курса',
+            owner=self.user
+        )
+        self.lesson = Lesson.objects.create(
+            title='Урок',
+            description='Описание урока',
+            video_link='https://www.youtube.com/watch?v=test',
+            course=self.course,
+            owner=self.user
+        )
+        self.course_url = f'/api/v1/materials/courses/{self.course.id}/'
+
+    def test_second_read_is_served_from_cache(self):
+        response = self.client.get(self.course_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.course_url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['title'], 'Курс')
+        self.assertEqual(cache_service.get_stats()['hits'], 1)
+        self.assertEqual(cache_service.get_stats()['misses'], 1)
+
+    def test_query_params_are_part_of_key(self):
+        self.client.get('/api/v1/materials/lessons/')
+        response = self.client.get('/api/v1/materials/lessons/?search=Урок')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_lesson_update_invalidates_course(self):
+        self.client.get(self.course_url)
+        self.client.get('/api/v1/materials/courses/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/v1/materials/lessons/{self.lesson.id}/', {'title': 'Новый урок'})
+
+        response = self.client.get(self.course_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['lessons'][0]['title'], 'Новый урок')
+        response = self.client.get('/api/v1/materials/courses/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_generation_bumped_after_commit(self):
+        self.client.get(self.course_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.course.title = 'Новое название'
+                self.course.save()
+                # Читатель до коммита не кеширует прежнюю строку под новым поколением
+                self.assertEqual(self.client.get(self.course_url)['X-Cache'], 'HIT')
+        response = self.client.get(self.course_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['title'], 'Новое название')
+
+    def test_course_delete_invalidates_list(self):
+        self.client.get('/api/v1/materials/courses/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.course_url)
+        response = self.client.get('/api/v1/materials/courses/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_subscription_is_cached_per_user(self):
+        self.client.get(self.course_url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'{self.course_url}subscribe/')
+        response = self.client.get(self.course_url)
+        self.assertTrue(response.data['is_subscribed'])
+
+        self.client.force_authenticate(user=self.other_user)
+        response = self.client.get(self.course_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertFalse(response.data['is_subscribed'])
+
+
+class SubscriptionSetTestCase(TestCase):
+    """Множество подписок пользователя в кеше"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='student@test.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.courses = [
+            Course.objects.create(title=f'Курс {i}', description='Описание', owner=self.user)
+            for i in range(3)
+        ]
+        Subscription.objects.create(user=self.user, course=self.courses[0])
+        Subscription.objects.create(user=self.user, course=self.courses[1], is_active=False)
+
+    def test_set_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_subscribed_course_ids(self.user.pk), {self.courses[0].id})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_subscribed_course_ids(self.user.pk), {self.courses[0].id})
+
+    def test_subscribe_toggle_refreshes_set(self):
+        get_subscribed_course_ids(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/v1/materials/courses/{self.courses[1].id}/subscribe/')
+            self.client.post(f'/api/v1/materials/courses/{self.courses[0].id}/subscribe/')
+        self.assertEqual(get_subscribed_course_ids(self.user.pk), {self.courses[1].id})
+
+    def test_explicit_state_is_idempotent(self):
+        """Повторный запрос с is_active (двойной клик) не переключает подписку обратно"""
+        url = f'/api/v1/materials/courses/{self.courses[2].id}/subscribe/'
+        for _ in range(2):
+            response = self.client.post(url, {'is_active': True}, format='json')
+            self.assertTrue(response.data['is_active'])
+        self.assertEqual(Subscription.objects.filter(user=self.user, course=self.courses[2]).count(), 1)
+
+        response = self.client.post(url, {'is_active': 'false'}, format='json')
+        self.assertFalse(response.data['is_active'])
+        response = self.client.post(url, {'is_active': 'maybe'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_my_subscriptions(self):
+        response = self.client.get('/api/v1/materials/courses/my_subscriptions/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([c['id'] for c in response.data], [self.courses[0].id])
+        self.assertTrue(response.data[0]['is_subscribed'])
+
+
+@override_settings(COURSE_UPDATE_EMAIL_CHUNK_SIZE=2)
+class CourseUpdateEmailTestCase(TestCase):
+    """Рассылка об обновлении курса пачками через одно соединение"""
+
+    def setUp(self):
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+
+        self.owner = User.objects.create_user(email='owner@test.com', password='testpass123')
+        self.course = Course.objects.create(title='Курс', description='Описание', owner=self.owner)
+        for i in range(5):
+            user = User.objects.create_user(
+                email=f'student{i}@test.com',
+                password='testpass123',
+                first_name=f'Студент{i}'
+            )
+            Subscription.objects.create(user=user, course=self.course)
+        inactive = User.objects.create_user(email='inactive@test.com', password='testpass123')
+        Subscription.objects.create(user=inactive, course=self.course, is_active=False)
+
+    def test_messages_sent_in_chunks(self):
+        result = send_course_update_email(self.course.id, 'Новый урок')
+
+        self.assertEqual(result['status'], 'dispatched')
+        self.assertEqual(result['chunks'], 3)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [f'student{i}@test.com' for i in range(5)]
+        )
+
+    def test_failed_recipients_are_retried(self):
+        original = EmailBackend.send_messages
+        attempts = []
+
+        def flaky_send(backend, messages):
+            attempts.append(messages[0].to[0])
+            if messages[0].to[0] == 'bad@test.com' and attempts.count('bad@test.com') == 1:
+                raise SMTPRecipientsRefused({})
+            return original(backend, messages)
+
+        with mock.patch.object(EmailBackend, 'send_messages', flaky_send):
+            result = send_course_update_chunk.apply(
+                args=('Тема', 'Текст', [['ok@test.com', ''], ['bad@test.com', '']])
+            ).get()
+
+        self.assertEqual(result, {'sent_count': 2, 'failed_count': 0})
+        self.assertEqual(attempts, ['ok@test.com', 'bad@test.com', 'bad@test.com'])
+
+    @override_settings(COURSE_UPDATE_DELIVERY_STRATEGY='bcc', COURSE_UPDATE_BCC_BATCH_SIZE=2)
+    def test_bcc_strategy_hides_recipients(self):
+        send_course_update_email(self.course.id)
+
+        # 3 пачки задач по 2, 2 и 1 адресу - по одному письму на пачку
+        self.assertEqual(len(mail.outbox), 3)
+        for message in mail.outbox:
+            self.assertEqual(message.to, [settings.DEFAULT_FROM_EMAIL])
+            self.assertNotIn('student', message.message().as_string())
+        self.assertEqual(
+            sorted(address for message in mail.outbox for address in message.bcc),
+            [f'student{i}@test.com' for i in range(5)]
+        )
+
+    @override_settings(COURSE_UPDATE_DELIVERY_STRATEGY='personalized')
+    def test_personalized_strategy_greets_by_name(self):
+        send_course_update_email(self.course.id)
+
+        bodies = {message.to[0]: message.body for message in mail.outbox}
+        self.assertIn('Здравствуйте, Студент3!', bodies['student3@test.com'])
+
+    def test_legacy_users_task_delegates(self):
+        result = users_tasks.send_course_update_email(self.course.id, 'Новый урок')
+        self.assertEqual(result['status'], 'dispatched')
+        self.assertEqual(len(mail.outbox), 5)
+
+
+class CourseUpdateDebounceTestCase(TestCase):
+    """Объединение правок курса в одно отложенное уведомление"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.owner = User.objects.create_user(email='owner@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.owner)
+        self.course = Course.objects.create(title='Курс', description='Описание', owner=self.owner)
+        self.lessons = Lesson.objects.bulk_create([
+            Lesson(
+                title=f'Урок {i}',
+                description='Описание урока',
+                video_link='https://www.youtube.com/watch?v=test',
+                course=self.course,
+                owner=self.owner
+            )
+            for i in range(3)
+        ])
+        student = User.objects.create_user(email='student@test.com', password='testpass123')
+        Subscription.objects.create(user=student, course=self.course)
+
+    def edit_lessons(self):
+        for lesson in self.lessons:
+            for _ in range(2):
+                self.client.patch(f'/api/v1/materials/lessons/{lesson.id}/', {'title': f'{lesson.title}!'})
+        self.client.patch(f'/api/v1/materials/courses/{self.course.id}/', {'title': 'Новый курс'})
+
+    def dispatch(self, message):
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', False)
+        return dispatch_course_update(*message.args)
+
+    def test_first_edit_is_sent_without_delay(self):
+        with mock.patch.object(dispatch_course_update, 'apply_async') as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/v1/materials/courses/{self.course.id}/', {'title': 'Новый курс'})
+            drain_task_outbox()
+
+        message = OutboxMessage.objects.get()
+        self.assertIsNone(message.eta)
+        apply_async.assert_called_once_with(args=message.args, kwargs={})
+
+    @override_settings(COURSE_UPDATE_DEBOUNCE_SECONDS=600)
+    def test_burst_of_edits_after_notification_schedules_one_dispatch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/v1/materials/lessons/{self.lessons[0].id}/', {'description': 'Новое'})
+        with mock.patch.object(dispatch_course_update, 'apply_async'):
+            drain_task_outbox()
+        self.dispatch(OutboxMessage.objects.get())
+        self.assertEqual(len(mail.outbox), 1)
+
+        with mock.patch.object(dispatch_course_update, 'apply_async') as apply_async, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.edit_lessons()
+            drain_task_outbox()
+            # До конца окна после прошлого уведомления сообщение остается в outbox
+            apply_async.assert_not_called()
+            message = OutboxMessage.objects.get(dispatched_at__isnull=True)
+            self.assertAlmostEqual((message.eta - timezone.now()).total_seconds(), 600, delta=5)
+            OutboxMessage.objects.filter(pk=message.pk).update(eta=timezone.now())
+            drain_task_outbox()
+
+        # Без ETA в брокере: отложенная задача не зависит от visibility_timeout
+        apply_async.assert_called_once_with(args=message.args, kwargs={})
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        self.dispatch(message)
+
+        self.assertEqual(len(mail.outbox), 2)
+        body = mail.outbox[1].body
+        self.assertIn("Обновлен урок: 'Урок 0!'", body)
+        self.assertEqual(body.count("Обновлен урок: 'Урок 2!'"), 1)
+        self.assertIn("Курс 'Новый курс' был обновлен", body)
+
+        # Повторная доставка той же отложенной задачи не дублирует письмо
+        self.assertEqual(self.dispatch(message)['status'], 'duplicate')
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_edit_after_dispatch_starts_new_batch(self):
+        schedule_course_update(self.course.id, 'Первая правка')
+        collect_course_update(*OutboxMessage.objects.get().args)
+        schedule_course_update(self.course.id, 'Вторая правка')
+
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        self.assertEqual(collect_course_update(*OutboxMessage.objects.last().args), 'Вторая правка')
+
+    def test_batch_is_not_kept_in_cache(self):
+        # Пачка в БД: ее видят все веб-процессы и воркер Celery, даже с LocMemCache
+        self.assertTrue(schedule_course_update(self.course.id, 'Первая правка'))
+        cache.clear()
+        self.assertFalse(schedule_course_update(self.course.id, 'Вторая правка'))
+        cache.clear()
+
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+        self.assertEqual(
+            collect_course_update(*OutboxMessage.objects.get().args), 'Первая правка\nВторая правка'
+        )
+
+
+class TaskOutboxTestCase(TestCase):
+    """Отправка задач Celery через outbox"""
+
+    def test_task_published_by_drain(self):
+        with mock.patch.object(send_course_update_email, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                enqueue_task(send_course_update_email, args=(1, 'Сообщение'))
+            # Запрос не обращается к брокеру
+            self.assertEqual(callbacks, [])
+            apply_async.assert_not_called()
+            drain_task_outbox()
+
+        apply_async.assert_called_once_with(args=[1, 'Сообщение'], kwargs={})
+        self.assertIsNotNone(OutboxMessage.objects.get().dispatched_at)
+
+    def test_delayed_task_waits_in_outbox(self):
+        message = enqueue_task(send_course_update_email, args=(1,), countdown=60)
+        with mock.patch.object(send_course_update_email, 'apply_async') as apply_async:
+            self.assertEqual(drain_task_outbox()['published'], 0)
+            apply_async.assert_not_called()
+
+            OutboxMessage.objects.filter(pk=message.pk).update(eta=timezone.now())
+            self.assertEqual(drain_task_outbox()['published'], 1)
+        apply_async.assert_called_once_with(args=[1], kwargs={})
+
+    @override_settings(OUTBOX_PUBLISH_ON_COMMIT=True)
+    def test_publish_on_commit_runs_in_background(self):
+        with mock.patch('materials.services.outbox_service.publish_in_background') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                message = enqueue_task(send_course_update_email, args=(1,))
+                publish.assert_not_called()
+
+        publish.assert_called_once_with([message.id])
+
+    def test_rolled_back_task_is_not_published(self):
+        with mock.patch.object(send_course_update_email, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                try:
+                    with transaction.atomic():
+                        enqueue_task(send_course_update_email, args=(1,))
+                        raise RuntimeError
+                except RuntimeError:
+                    pass
+            drain_task_outbox()
+
+        self.assertEqual(callbacks, [])
+        apply_async.assert_not_called()
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @override_settings(OUTBOX_BATCH_SIZE=2)
+    def test_undelivered_messages_are_drained_later(self):
+        for course_id in range(5):
+            enqueue_task(send_course_update_email, args=(course_id,))
+        with mock.patch.object(send_course_update_email, 'apply_async',
+                               side_effect=ConnectionError('Redis недоступен')):
+            self.assertEqual(drain_task_outbox()['published'], 0)
+
+        pending = OutboxMessage.objects.filter(dispatched_at__isnull=True)
+        self.assertEqual(pending.count(), 5)
+        self.assertEqual(pending.first().last_error, 'Redis недоступен')
+
+        with mock.patch.object(send_course_update_email, 'apply_async') as apply_async:
+            result = drain_task_outbox()
+
+        self.assertEqual(result['published'], 5)
+        self.assertEqual(
+            [call.kwargs['args'] for call in apply_async.call_args_list],
+            [[course_id] for course_id in range(5)]
+        )
+        self.assertFalse(pending.exists())
+
+
+class QueryPlansTestCase(TestCase):
+    """Горячие запросы используют индексы"""
+
+    def test_no_sequential_scans(self):
+        out = StringIO()
+        call_command('check_query_plans', users=300, courses=20, stdout=out)
+        self.assertIn('Все горячие запросы используют индексы', out.getvalue())
+        self.assertFalse(Course.objects.exists())
+
+
+class KeysetPaginationTestCase(TestCase):
+    """Пагинация по ключу (created_at, id)"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='student@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(title='Курс', description='Описание', owner=self.user)
+        self.lessons = Lesson.objects.bulk_create([
+            Lesson(
+                title=f'Урок {i}',
+                description='Описание урока',
+                video_link='https://www.youtube.com/watch?v=test',
+                course=self.course,
+                owner=self.user
+            )
+            for i in range(12)
+        ])
+        # Одинаковое время создания у части уроков: порядок задает id
+        Lesson.objects.filter(id__in=[lesson.id for lesson in self.lessons[3:8]]).update(
+            created_at=self.lessons[3].created_at
+        )
+
+    def test_walk_forward_and_back(self):
+        url = '/api/v1/materials/lessons/?pagination=cursor'
+        seen = []
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pages.append(response.data)
+            seen.extend(lesson['id'] for lesson in response.data['results'])
+            url = response.data['next']
+
+        expected = list(Lesson.objects.order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual(response.data['results'], pages[1]['results'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(response.data['results'], pages[0]['results'])
+        self.assertIsNone(response.data['previous'])
+
+    def test_count_only_when_requested(self):
+        with self.assertNumQueries(1):
+            self.client.get('/api/v1/materials/lessons/?pagination=cursor')
+        response = self.client.get('/api/v1/materials/lessons/?pagination=cursor&with_count=true')
+        self.assertEqual(response.data['count'], 12)
+
+    def test_page_number_mode_by_default(self):
+        response = self.client.get('/api/v1/materials/lessons/')
+        self.assertEqual(response.data['count'], 12)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/materials/lessons/?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class EstimatedCountPaginationTestCase(TestCase):
+    """Приблизительный count в постраничной пагинации"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='student@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(title='Курс', description='Описание', owner=self.user)
+        for i in range(7):
+            Lesson.objects.create(
+                title=f'Урок {i}',
+                description='Описание урока',
+                video_link='https://www.youtube.com/watch?v=test',
+                course=self.course,
+                owner=self.user
+            )
+
+    @override_settings(PAGINATION_EXACT_COUNT_THRESHOLD=5)
+    def test_count_cached_without_planner_statistics(self):
+        response = self.client.get('/api/v1/materials/lessons/')
+        self.assertEqual(response.data['count'], 7)
+        self.assertFalse(response.data['count_is_approximate'])
+
+        # Закешированный точный COUNT остается точным
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/materials/lessons/?page=2')
+        self.assertEqual(response.data['count'], 7)
+        self.assertFalse(response.data['count_is_approximate'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
+
+    def test_small_count_is_not_cached(self):
+        self.client.get('/api/v1/materials/lessons/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/v1/materials/lessons/?page=2')
+        self.assertTrue(any('COUNT(' in query['sql'] for query in queries))
+
+    @override_settings(PAGINATION_EXACT_COUNT_THRESHOLD=5)
+    def test_write_resets_cached_count(self):
+        self.client.get('/api/v1/materials/lessons/')
+        with self.captureOnCommitCallbacks(execute=True):
+            Lesson.objects.create(
+                title='Новый урок',
+                description='Описание урока',
+                video_link='https://www.youtube.com/watch?v=test',
+                course=self.course,
+                owner=self.user
+            )
+        response = self.client.get('/api/v1/materials/lessons/?page=2')
+        self.assertEqual(response.data['count'], 8)
+        self.assertFalse(response.data['count_is_approximate'])
+
+    @override_settings(PAGINATION_EXACT_COUNT_THRESHOLD=100)
+    def test_small_estimate_counts_exactly(self):
+        with mock.patch('materials.services.count_service.planner_estimate', return_value=5):
+            response = self.client.get('/api/v1/materials/lessons/')
+        self.assertEqual(response.data['count'], 7)
+        self.assertFalse(response.data['count_is_approximate'])
+
+    @override_settings(PAGINATION_EXACT_COUNT_THRESHOLD=3)
+    def test_large_estimate_is_reported_as_approximate(self):
+        # Оценка меньше реального количества: страницы за её пределами все равно доступны
+        with mock.patch('materials.services.count_service.planner_estimate', return_value=4):
+            first = self.client.get('/api/v1/materials/lessons/')
+            last = self.client.get('/api/v1/materials/lessons/?page=2')
+            empty = self.client.get('/api/v1/materials/lessons/?page=3')
+
+        self.assertEqual(first.data['count'], 4)
+        self.assertTrue(first.data['count_is_approximate'])
+        self.assertIsNotNone(first.data['next'])
+        self.assertEqual(len(last.data['results']), 2)
+        self.assertIsNone(last.data['next'])
+        self.assertEqual(empty.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class FullTextSearchTestCase(TestCase):
+    """Полнотекстовый поиск по курсам и урокам (FTS5 в тестовой SQLite)"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='student@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(
+            title='Программирование на Python',
+            description='Основы языка',
+            owner=self.user
+        )
+        Course.objects.create(title='История искусства', description='Живопись', owner=self.user)
+        self.in_description = self.create_lesson('Введение', 'Обзор курса по программированию')
+        self.in_title = self.create_lesson('Программирование функций', 'Функции и модули')
+        self.create_lesson('Списки', 'Работа со списками')
+
+    def create_lesson(self, title, description):
+        return Lesson.objects.create(
+            title=title,
+            description=description,
+            video_link='https://www.youtube.com/watch?v=test',
+            course=self.course,
+            owner=self.user
+        )
+
+    def search_lessons(self, text):
+        response = self.client.get('/api/v1/materials/lessons/', {'search': text})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [lesson['id'] for lesson in response.data['results']]
+
+    def test_prefix_match_ranked_by_title(self):
+        self.assertEqual(self.search_lessons('програм'), [self.in_title.id, self.in_description.id])
+
+    def test_all_terms_required(self):
+        self.assertEqual(self.search_lessons('программирование функций'), [self.in_title.id])
+        self.assertEqual(self.search_lessons('программирование списки'), [])
+
+    def test_operators_are_not_interpreted(self):
+        self.assertEqual(self.search_lessons('"списки" OR NOT*'), [])
+        self.assertEqual(len(self.search_lessons('   ')), 3)
+
+    def test_index_follows_updates_and_deletes(self):
+        Lesson.objects.filter(id=self.in_title.id).update(title='Декораторы')
+        self.assertEqual(self.search_lessons('декоратор'), [self.in_title.id])
+        self.in_description.delete()
+        self.assertEqual(self.search_lessons('програм'), [])
+
+    def test_course_search_with_lessons_count(self):
+        response = self.client.get('/api/v1/materials/courses/', {'search': 'python'})
+        self.assertEqual([course['id'] for course in response.data['results']], [self.course.id])
+        self.assertEqual(response.data['results'][0]['lessons_count'], 3)
+
+    @skipUnless(connection.vendor == 'sqlite', 'FTS5 только в SQLite')
+    def test_fts_triggers_exist_after_migrate(self):
+        # Миграции 0007/0008 создают таблицы и триггеры своим DDL, без кода сервиса
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+            names = {row[0] for row in cursor.fetchall()}
+        for model in (Course, Lesson):
+            fts = SQLiteFTSSearchBackend.fts_table(model)
+            self.assertLessEqual({fts, f'{fts}_ai', f'{fts}_ad', f'{fts}_au'}, names)
+
+    @override_settings(MATERIALS_SEARCH_BACKEND='icontains')
+    def test_icontains_backend(self):
+        self.assertEqual(self.search_lessons('модул'), [self.in_title.id])
+        self.assertEqual(self.search_lessons('обзор модул'), [])
+
+
+class InvertedIndexTestCase(TestCase):
+    """Инвертированный индекс в памяти"""
+
+    def setUp(self):
+        self.index = InvertedIndex.build([
+            (1, 'Основы Python'),
+            (2, 'Python для анализа данных'),
+            (3, 'Базы данных'),
+        ])
+
+    def search(self, text, operator='and'):
+        return list(self.index.search(parse_query(text), operator))
+
+    def test_and_or_prefix(self):
+        self.assertEqual(self.search('python данных'), [2])
+        self.assertEqual(self.search('основы базы', 'or'), [1, 3])
+        self.assertEqual(self.search('дан*'), [2, 3])
+        self.assertEqual(self.search('дан'), [])
+        self.assertEqual(self.search('python нет'), [])
+
+    def test_add_and_remove(self):
+        self.index.add(0, 'Python с нуля')
+        self.assertEqual(self.search('python'), [0, 1, 2])
+        self.index.remove(1, 'Основы Python')
+        self.assertEqual(self.search('python'), [0, 2])
+        self.assertEqual(self.search('основ*'), [])
+        self.assertNotIn('основы', self.index.vocabulary)
+
+    def test_replace_by_id(self):
+        self.index.replace(2, 'Анализ текстов')
+        self.assertEqual(self.search('python'), [1])
+        self.assertEqual(self.search('анализ'), [2])
+        self.index.replace(3)
+        self.assertEqual(self.search('баз*'), [])
+        self.assertNotIn(3, self.index.documents)
+
+    def test_big_auto_field_ids(self):
+        big_id = 2 ** 40
+        self.index.replace(big_id, 'Python для больших таблиц')
+        self.assertEqual(self.search('python'), [1, 2, big_id])
+        self.assertEqual(self.search('таблиц python'), [big_id])
+
+
+class IndexSearchAPITestCase(TestCase):
+    """Поиск по индексу в памяти через /search/"""
+
+    url = '/api/v1/materials/search/'
+
+    def setUp(self):
+        cache.clear()
+        for name in INDEXED_MODELS:
+            get_index(name).reset()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='student@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(title='Python', description='Основы', owner=self.user)
+        self.lesson = self.create_lesson('Переменные', 'Типы данных')
+        self.create_lesson('Циклы', 'Повторение действий')
+
+    def tearDown(self):
+        # Индекс общий для процесса и не должен пережить тестовую БД
+        for name in INDEXED_MODELS:
+            get_index(name).reset()
+
+    def create_lesson(self, title, description):
+        return Lesson.objects.create(
+            title=title,
+            description=description,
+            video_link='https://www.youtube.com/watch?v=test',
+            course=self.course,
+            owner=self.user
+        )
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['id'] for row in response.data['results']]
+
+    def test_search_lessons_and_courses(self):
+        self.assertEqual(self.search(q='переменные'), [self.lesson.id])
+        self.assertEqual(self.search(q='основ*', type='courses'), [self.course.id])
+        response = self.client.get(self.url, {'q': 'пер* цикл*', 'operator': 'or'})
+        self.assertEqual(response.data['count'], 2)
+
+    def test_incremental_updates_without_rebuild(self):
+        self.search(q='переменные')
+        index = get_index('lessons').index
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_lesson = self.create_lesson('Функции', 'Аргументы')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lesson.title = 'Константы'
+            self.lesson.save()
+
+        self.assertEqual(self.search(q='функции'), [new_lesson.id])
+        self.assertEqual(self.search(q='переменные'), [])
+        self.assertEqual(self.search(q='константы'), [self.lesson.id])
+        self.assertIs(get_index('lessons').index, index)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            new_lesson.delete()
+        self.assertEqual(self.search(q='функции'), [])
+
+    @override_settings(MATERIALS_INVERTED_INDEX_REFRESH_SECONDS=0, SHARED_CACHE=True)
+    def test_foreign_change_applied_from_change_log(self):
+        self.search(q='переменные')
+        model_index = get_index('lessons')
+        index = model_index.index
+        # Запись в другом процессе: урок изменен в БД, его id - в журнале
+        Lesson.objects.filter(id=self.lesson.id).update(title='Константы')
+        model_index.publish_changes([self.lesson.id])
+
+        with mock.patch.object(model_index, 'start_build') as start_build:
+            self.assertEqual(self.search(q='константы'), [self.lesson.id])
+            self.assertEqual(self.search(q='переменные'), [])
+        start_build.assert_not_called()
+        self.assertIs(model_index.index, index)
+
+    @override_settings(MATERIALS_INVERTED_INDEX_REFRESH_SECONDS=0, SHARED_CACHE=True)
+    def test_incomplete_change_log_rebuilds_in_background(self):
+        self.search(q='переменные')
+        model_index = get_index('lessons')
+        Lesson.objects.filter(id=self.lesson.id).update(title='Константы')
+        cache_service.bump_generation(index_scope('lessons'))
+
+        with mock.patch.object(model_index, 'start_build') as start_build:
+            # Пока индекс строится, поиск идет по прежнему
+            self.assertEqual(self.search(q='переменные'), [self.lesson.id])
+        start_build.assert_called_once_with()
+        model_index.build()
+        self.assertEqual(self.search(q='константы'), [self.lesson.id])
+
+    @override_settings(MATERIALS_INVERTED_INDEX_REFRESH_SECONDS=0)
+    def test_rebuilds_periodically_without_shared_cache(self):
+        model_index = get_index('lessons')
+        with mock.patch.object(model_index, 'start_build') as start_build:
+            self.search(q='переменные')
+            # Запись в другом процессе с локальным кешем: журнала не видно
+            Lesson.objects.filter(id=self.lesson.id).update(title='Константы')
+            start_build.reset_mock()
+            self.assertEqual(self.search(q='переменные'), [self.lesson.id])
+            start_build.assert_called_once_with()
+            model_index.build()
+            self.assertEqual(self.search(q='константы'), [self.lesson.id])
+
+    def test_save_does_not_read_previous_text(self):
+        self.search(q='основ*', type='courses')
+        # Только UPDATE: прежний текст для индекса не перечитывается
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            self.course.title = 'Django'
+            self.course.save()
+        self.assertEqual(self.search(q='django', type='courses'), [self.course.id])
+        self.assertEqual(self.search(q='python', type='courses'), [])
+
+    def test_warm_up_on_first_request(self):
+        request_started.connect(warm_up, dispatch_uid=WARM_UP_UID)
+        self.addCleanup(request_started.disconnect, warm_up, dispatch_uid=WARM_UP_UID)
+        with mock.patch.object(ModelIndex, 'start_build') as start_build:
+            self.client.get(self.url, {'q': 'python'})
+            self.client.get(self.url, {'q': 'python'})
+        self.assertEqual(start_build.call_count, len(INDEXED_MODELS))
+
+    def test_invalid_params(self):
+        response = self.client.get(self.url, {'q': 'python', 'operator': 'xor'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CatalogTestCase(TestCase):
+    """Публикация курсов, порядок уроков и публичный каталог"""
+
+    catalog_url = '/api/v1/materials/catalog/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='owner@test.com', password='testpass123')
+        self.published = Course.objects.create(
+            title='Опубликованный', description='Описание', owner=self.user, is_published=True
+        )
+        self.draft = Course.objects.create(title='Черновик', description='Описание', owner=self.user)
+        for order in (2, 1):
+            Lesson.objects.create(
+                title=f'Урок {order}',
+                description='Описание урока',
+                video_link='https://www.youtube.com/watch?v=test',
+                course=self.published,
+                owner=self.user,
+                order=order
+            )
+
+    def test_catalog_lists_only_published_for_anonymous(self):
+        response = self.client.get(self.catalog_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        course = response.data['results'][0]
+        self.assertEqual(course['id'], self.published.id)
+        self.assertEqual(course['lessons_count'], 2)
+        self.assertNotIn('owner', course)
+
+    def test_catalog_projection_is_cached_until_change(self):
+        self.client.get(self.catalog_url)
+        with self.assertNumQueries(0):
+            self.client.get(self.catalog_url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.draft.is_published = True
+            self.draft.save()
+        response = self.client.get(self.catalog_url)
+        self.assertEqual([course['id'] for course in response.data['results']],
+                         [self.draft.id, self.published.id])
+
+    def test_is_published_filter_and_lesson_order(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/v1/materials/courses/', {'is_published': 'true'})
+        self.assertEqual([course['id'] for course in response.data['results']], [self.published.id])
+
+        response = self.client.get(f'/api/v1/materials/courses/{self.published.id}/')
+        self.assertEqual([lesson['order'] for lesson in response.data['lessons']], [1, 2])
+        response = self.client.get('/api/v1/materials/lessons/', {'ordering': '-order'})
+        self.assertEqual([lesson['order'] for lesson in response.data['results']], [2, 1])
+
+
+class SparseFieldsetTestCase(TestCase):
+    """?fields= и ?expand= в списках и деталях"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='student@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(title='Курс', description='Длинное описание', owner=self.user)
+        self.lesson = Lesson.objects.create(
+            title='Урок',
+            description='Длинное описание урока',
+            video_link='https://www.youtube.com/watch?v=test',
+            course=self.course,
+            owner=self.user
+        )
+
+    def test_list_omits_heavy_fields_by_default(self):
+        course = self.client.get('/api/v1/materials/courses/').data['results'][0]
+        self.assertNotIn('lessons', course)
+        self.assertIn('lessons_count', course)
+
+        course = self.client.get('/api/v1/materials/courses/?expand=lessons').data['results'][0]
+        self.assertEqual(course['lessons'][0]['title'], 'Урок')
+        self.assertNotIn('description', course['lessons'][0])
+
+        lesson = self.client.get('/api/v1/materials/lessons/').data['results'][0]
+        self.assertNotIn('description', lesson)
+        lesson = self.client.get(f'/api/v1/materials/lessons/{self.lesson.id}/').data
+        self.assertEqual(lesson['description'], 'Длинное описание урока')
+
+    def test_fields_trim_response_and_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/materials/courses/?fields=id,title')
+        self.assertEqual(response.data['results'], [{'id': self.course.id, 'title': 'Курс'}])
+        course_query = [query['sql'] for query in queries if 'FROM "materials_course"' in query['sql']][-1]
+        self.assertNotIn('description', course_query)
+        self.assertNotIn('lessons_count', course_query)
+
+        response = self.client.get(f'/api/v1/materials/lessons/{self.lesson.id}/?fields=title,course')
+        self.assertEqual(response.data, {'title': 'Урок', 'course': self.course.id})
+
+    def test_unknown_fields_are_rejected(self):
+        for url in ('/api/v1/materials/courses/', f'/api/v1/materials/lessons/{self.lesson.id}/'):
+            response = self.client.get(f'{url}?fields=id,titel,secret')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('secret, titel', response.data['fields'])
+
+
+class FastListTestCase(TestCase):
+    """Быстрый путь list совпадает с выводом сериализаторов"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='student@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(title='Курс', description='Описание', price='12.50', owner=self.user)
+        Subscription.objects.create(user=self.user, course=self.course)
+        Lesson.objects.create(
+            title='Урок',
+            description='Описание урока',
+            video_link='https://www.youtube.com/watch?v=test',
+            course=self.course,
+            owner=self.user
+        )
+
+    def serializer_data(self, serializer_class, queryset, **context):
+        serializer = serializer_class(queryset, many=True, context=context)
+        return json.loads(JSONRenderer().render(serializer.data))
+
+    def test_rows_match_serializers(self):
+        response = self.client.get('/api/v1/materials/lessons/')
+        self.assertEqual(response.json()['results'], self.serializer_data(LessonListSerializer, Lesson.objects.all()))
+
+        response = self.client.get('/api/v1/materials/courses/')
+        courses = Course.objects.annotate(lessons_count=catalog_service.lessons_count())
+        expected = self.serializer_data(
+            CourseListSerializer, courses, subscribed_course_ids=frozenset([self.course.id])
+        )
+        self.assertEqual(response.json()['results'], expected)
+        self.assertEqual(expected[0]['price'], '12.50')
+        self.assertTrue(expected[0]['is_subscribed'])
+
+    def test_nested_fields_use_serializers(self):
+        self.assertIsNone(compile_row_builder(CourseListSerializer(context={'expand': {'lessons'}})))
+        response = self.client.get('/api/v1/materials/courses/?expand=lessons')
+        self.assertEqual(response.json()['results'][0]['lessons'][0]['title'], 'Урок')
+
+    def test_renderer_fallback(self):
+        with mock.patch('materials.renderers.orjson', None):
+            response = self.client.get('/api/v1/materials/lessons/')
+        self.assertEqual(response.json()['results'][0]['title'], 'Урок')
+        response = self.client.get('/api/v1/materials/lessons/', HTTP_ACCEPT='application/json; indent=2')
+        self.assertIn(b'\n  ', response.content)
+
+
+@override_settings(EXPORT_CHUNK_SIZE=2)
+class ExportTestCase(TestCase):
+    """Потоковая выгрузка уроков и подписок"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='testpass123')
+        self.user = User.objects.create_user(email='student@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.admin)
+        self.course = Course.objects.create(title='Курс', description='Описание', owner=self.admin)
+        self.other_course = Course.objects.create(title='Другой курс', description='Описание', owner=self.admin)
+        self.lessons = [
+            Lesson.objects.create(
+                title=f'Урок {i}',
+                description='Описание урока',
+                video_link='https://www.youtube.com/watch?v=test',
+                course=self.course if i < 3 else self.other_course,
+                order=5 - i,
+                owner=self.admin
+            )
+            for i in range(5)
+        ]
+        Subscription.objects.create(user=self.user, course=self.course)
+        Subscription.objects.create(user=self.admin, course=self.course, is_active=False)
+
+    @staticmethod
+    def content(response):
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_ndjson_uses_list_filters(self):
+        response = self.client.get(f'/api/v1/materials/lessons/export/?course={self.course.id}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        # Без ?ordering= строки идут по первичному ключу
+        self.assertEqual([row['id'] for row in rows], [lesson.id for lesson in self.lessons[:3]])
+        self.assertEqual(rows[0]['title'], 'Урок 0')
+        self.assertEqual(rows[0]['course_id'], self.course.id)
+
+        response = self.client.get('/api/v1/materials/lessons/export/?ordering=order')
+        rows = [json.loads(line) for line in self.content(response).splitlines()]
+        self.assertEqual([row['order'] for row in rows], [1, 2, 3, 4, 5])
+
+    def test_csv(self):
+        response = self.client.get('/api/v1/materials/subscriptions/export/?export_format=csv&is_active=true')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('subscriptions.csv', response['Content-Disposition'])
+        lines = self.content(response).lstrip('\ufeff').splitlines()
+        self.assertEqual(lines[0], 'id,user_id,course_id,is_active,subscribed_at')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].startswith(f'{Subscription.objects.get(user=self.user).id},{self.user.id},'))
+
+    def test_rows_are_streamed_in_chunks(self):
+        response = self.client.get('/api/v1/materials/lessons/export/')
+        chunks = list(response.streaming_content)
+        # 5 строк пачками по EXPORT_CHUNK_SIZE
+        self.assertEqual([chunk.count(b'\n') for chunk in chunks], [2, 2, 1])
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=self.user)
+        for url in ('/api/v1/materials/lessons/export/', '/api/v1/materials/subscriptions/export/'):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_unknown_format(self):
+        response = self.client.get('/api/v1/materials/lessons/export/?export_format=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LessonBulkTestCase(TestCase):
+    """Пакетное создание и обновление уроков"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='author@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.course = Course.objects.create(title='Курс', description='Описание', owner=self.user)
+        self.other_course = Course.objects.create(title='Другой курс', description='Описание', owner=self.user)
+        self.addCleanup(get_index('lessons').reset)
+
+    def lesson_data(self, i, course=None):
+        return {
+            'title': f'Урок {i}',
+            'description': 'Описание урока',
+            'video_link': f'https://www.youtube.com/watch?v=bulk{i}',
+            'course': (course or self.course).id,
+            'order': i,
+        }
+
+    def test_create_in_constant_queries(self):
+        data = [self.lesson_data(i) for i in range(30)] + [self.lesson_data(30, self.other_course)]
+        # Курсы пачки, SAVEPOINT, один INSERT, курсы для уведомлений, RELEASE
+        with mock.patch('materials.views.notify_course_update') as notify, self.assertNumQueries(5):
+            response = self.client.post('/api/v1/materials/lessons/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 31)
+        self.assertEqual(Lesson.objects.filter(course=self.course, owner=self.user).count(), 30)
+        summaries = {course.id: summary for (course, summary), _ in notify.call_args_list}
+        self.assertEqual(summaries, {self.course.id: 'Добавлено уроков: 30', self.other_course.id: 'Добавлено уроков: 1'})
+
+    def test_validation_reports_items(self):
+        data = [self.lesson_data(0), {**self.lesson_data(1), 'video_link': 'https://vimeo.com/1'},
+                {**self.lesson_data(2), 'course': 999}]
+        response = self.client.post('/api/v1/materials/lessons/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('video_link', response.data[1])
+        self.assertIn('course', response.data[2])
+        self.assertFalse(Lesson.objects.exists())
+
+    @override_settings(LESSONS_BULK_MAX_SIZE=2)
+    def test_max_size(self):
+        data = [self.lesson_data(i) for i in range(3)]
+        response = self.client.post('/api/v1/materials/lessons/bulk/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_partial_update(self):
+        lessons = Lesson.objects.bulk_create([
+            Lesson(owner=self.user, course=self.course, **{
+                key: value for key, value in self.lesson_data(i).items() if key != 'course'
+            })
+            for i in range(3)
+        ])
+        # Ответ списка закеширован до обновления
+        self.client.get('/api/v1/materials/lessons/')
+
+        data = [
+            {'id': lessons[0].id, 'title': 'Новое название'},
+            {'id': lessons[1].id, 'course': self.other_course.id},
+        ]
+        with mock.patch('materials.views.notify_course_update') as notify, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch('/api/v1/materials/lessons/bulk/', data, format='json')
+            # До коммита поколения не сдвигаются
+            self.assertEqual(self.client.get('/api/v1/materials/lessons/')['X-Cache'], 'HIT')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(notify.call_count, 2)
+
+        lessons[0].refresh_from_db()
+        lessons[1].refresh_from_db()
+        self.assertEqual(lessons[0].title, 'Новое название')
+        self.assertEqual(lessons[0].video_link, 'https://www.youtube.com/watch?v=bulk0')
+        self.assertEqual(lessons[1].course, self.other_course)
+
+        response = self.client.get('/api/v1/materials/lessons/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('Новое название', [lesson['title'] for lesson in response.data['results']])
+
+    def test_update_unknown_and_duplicate_ids(self):
+        lesson = Lesson.objects.create(owner=self.user, **{**self.lesson_data(0), 'course': self.course})
+        response = self.client.patch('/api/v1/materials/lessons/bulk/', [{'id': 999, 'title': 'x'}], format='json')
+        self.assertIn('id', response.data[0])
+        response = self.client.patch(
+            '/api/v1/materials/lessons/bulk/',
+            [{'id': lesson.id, 'title': 'a'}, {'id': lesson.id, 'title': 'b'}],
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_index_updated(self):
+        index = get_index('lessons')
+        index.build()
+        with mock.patch('materials.views.notify_course_update'), \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/v1/materials/lessons/bulk/',
+                [{**self.lesson_data(0), 'title': 'Квантовые вычисления'}],
+                format='json'
+            )
+        self.assertEqual(list(index.search('квантовые')), [response.data[0]['id']])
+
+
+class BulkSubscriptionTestCase(TestCase):
+    """Пакетная подписка и отписка"""
+    url = '/api/v1/materials/subscriptions/bulk/'
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='testpass123')
+        self.client.force_authenticate(user=self.admin)
+        self.users = [User.objects.create_user(email=f'student{i}@test.com') for i in range(4)]
+        self.courses = [
+            Course.objects.create(title=f'Курс {i}', description='Описание', owner=self.admin)
+            for i in range(2)
+        ]
+        Subscription.objects.create(user=self.users[0], course=self.courses[0])
+        Subscription.objects.create(user=self.users[1], course=self.courses[0], is_active=False)
+
+    def post(self, action, users=None, courses=None):
+        return self.client.post(self.url, {
+            'user_ids': [user.id for user in users or self.users],
+            'course_ids': [course.id for course in courses or self.courses],
+            'action': action,
+        }, format='json')
+
+    def test_subscribe_is_idempotent(self):
+        # Множество подписок закешировано до пакетной операции
+        self.assertEqual(get_subscribed_course_ids(self.users[1].pk), frozenset())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post('subscribe')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'created': 6, 'updated': 1, 'unchanged': 1})
+        self.assertEqual(Subscription.objects.filter(is_active=True).count(), 8)
+        self.assertEqual(get_subscribed_course_ids(self.users[1].pk), {course.id for course in self.courses})
+
+        response = self.post('subscribe')
+        self.assertEqual(response.data, {'created': 0, 'updated': 0, 'unchanged': 8})
+
+    def test_unsubscribe_does_not_create_rows(self):
+        response = self.post('unsubscribe', courses=self.courses[:1])
+        self.assertEqual(response.data, {'created': 0, 'updated': 1, 'unchanged': 3})
+        self.assertEqual(Subscription.objects.count(), 2)
+        self.assertFalse(Subscription.objects.filter(is_active=True).exists())
+
+    def test_validation(self):
+        response = self.client.post(self.url, {
+            'user_ids': [self.users[0].id, 9999], 'course_ids': [self.courses[0].id], 'action': 'subscribe'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('9999', str(response.data['user_ids']))
+
+        with override_settings(SUBSCRIPTIONS_BULK_MAX_PAIRS=7):
+            self.assertEqual(self.post('subscribe').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=self.users[0])
+        self.assertEqual(self.post('subscribe').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class RolePermissionTestCase(TestCase):
+    """Группы пользователя для проверок прав загружаются один раз"""
+
+    def setUp(self):
+        cache.clear()
+        self.group = Group.objects.create(name='moderators')
+        self.owner = User.objects.create_user(email='owner@test.com', password='testpass123')
+        self.moderator = User.objects.create_user(email='moderator@test.com', password='testpass123')
+        self.moderator.groups.add(self.group)
+        self.courses = [
+            Course.objects.create(title=f'Курс {i}', description='Описание', owner=self.owner)
+            for i in range(5)
+        ]
+
+    def request_for(self, user):
+        # Новый объект пользователя на каждый запрос, как после аутентификации
+        request = mock.Mock()
+        request.user = User.objects.get(pk=user.pk)
+        return request
+
+    def test_groups_loaded_once_per_request_and_cached(self):
+        request = self.request_for(self.moderator)
+        permission = IsOwnerOrModerator()
+        with self.assertNumQueries(1):
+            self.assertTrue(all(permission.has_object_permission(request, None, c) for c in self.courses))
+            self.assertTrue(IsModerator().has_permission(request, None))
+            self.assertFalse(IsNotModerator().has_permission(request, None))
+
+        request = self.request_for(self.moderator)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsModerator().has_permission(request, None))
+
+    def test_owner_check_needs_no_groups(self):
+        request = self.request_for(self.owner)
+        with self.assertNumQueries(0):
+            self.assertTrue(IsOwnerOrModerator().has_object_permission(request, None, self.courses[0]))
+
+    def test_membership_changes_invalidate_cache(self):
+        self.assertTrue(IsModerator().has_permission(self.request_for(self.moderator), None))
+        self.assertFalse(IsModerator().has_permission(self.request_for(self.owner), None))
+
+        self.moderator.groups.remove(self.group)
+        self.group.user_set.add(self.owner)
+        self.assertFalse(IsModerator().has_permission(self.request_for(self.moderator), None))
+        self.assertTrue(IsModerator().has_permission(self.request_for(self.owner), None))
+
+        self.group.user_set.clear()
+        self.assertFalse(IsModerator().has_permission(self.request_for(self.owner), None))
+
+    def test_same_user_object_sees_own_changes(self):
+        request = self.request_for(self.owner)
+        self.assertFalse(IsModerator().has_permission(request, None))
+        request.user.groups.add(self.group)
+        self.assertTrue(IsModerator().has_permission(request, None))
+
+    def test_group_rename_invalidates_cache(self):
+        self.assertTrue(IsModerator().has_permission(self.request_for(self.moderator), None))
+        self.group.name = 'editors'
+        self.group.save()
+        self.assertFalse(IsModerator().has_permission(self.request_for(self.moderator), None))
+
+
+class AsyncReadViewTestCase(TestCase):
+    """Чтение courses/ и lessons/ по JWT совпадает с ответами синхронных viewset"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='student@test.com', password='testpass123')
+        self.courses = [
+            Course.objects.create(title=f'Курс {i}', description='Описание', owner=self.user,
+                                  is_published=i % 2 == 0, price=100 + i)
+            for i in range(10)
+        ]
+        Lesson.objects.bulk_create([
+            Lesson(title=f'Урок {i}', description='Описание урока', video_link='https://www.youtube.com/watch?v=test',
+                   course=self.courses[i % 3], owner=self.user, order=i)
+            for i in range(7)
+        ])
+        Subscription.objects.create(user=self.user, course=self.courses[1])
+        self.token = str(CustomTokenObtainPairSerializer.get_token(self.user).access_token)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        # Без JWT запрос обслуживает синхронный viewset
+        self.sync_client = APIClient()
+        self.sync_client.force_authenticate(user=self.user)
+
+    def get_async(self, url):
+        with mock.patch.object(AsyncReadView, 'sync_response') as sync_response:
+            response = self.client.get(url)
+        sync_response.assert_not_called()
+        return response
+
+    def get_both(self, url):
+        sync_response = self.sync_client.get(url)
+        cache.clear()
+        async_response = self.get_async(url)
+        self.assertEqual(sync_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(async_response.status_code, status.HTTP_200_OK)
+        return sync_response.json(), async_response.json()
+
+    def test_course_list_matches_sync(self):
+        for params in ('', '?expand=lessons', '?fields=id,title,is_subscribed', '?page=2&page_size=3',
+                       '?is_published=true', '?pagination=cursor&with_count=1'):
+            sync_data, async_data = self.get_both(f'/api/v1/materials/courses/{params}')
+            self.assertEqual(async_data, sync_data, params)
+
+    def test_walk_pages(self):
+        for url in ('/api/v1/materials/courses/', '/api/v1/materials/courses/?pagination=cursor'):
+            seen = []
+            while url:
+                data = self.get_async(url).json()
+                seen.extend(course['id'] for course in data['results'])
+                url = data['next']
+            self.assertEqual(seen, [course.id for course in self.courses])
+
+    def test_course_detail_matches_sync(self):
+        course = self.courses[1]
+        sync_data, async_data = self.get_both(f'/api/v1/materials/courses/{course.id}/')
+        self.assertEqual(async_data, sync_data)
+        self.assertTrue(async_data['is_subscribed'])
+        self.assertEqual(len(async_data['lessons']), 2)
+
+    def test_lessons_match_sync(self):
+        course = self.courses[0]
+        sync_data, async_data = self.get_both(f'/api/v1/materials/lessons/?course={course.id}')
+        self.assertEqual(async_data, sync_data)
+        lesson_id = async_data['results'][0]['id']
+        sync_data, async_data = self.get_both(f'/api/v1/materials/lessons/{lesson_id}/')
+        self.assertEqual(async_data, sync_data)
+
+    def test_cached_response(self):
+        url = '/api/v1/materials/courses/'
+        self.assertEqual(self.get_async(url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_async(url)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(title='Новый курс', description='Описание', owner=self.user)
+        self.assertEqual(self.get_async(url)['X-Cache'], 'MISS')
+
+    def test_unsupported_params_served_by_viewset(self):
+        response = self.client.get('/api/v1/materials/courses/?ordering=-title')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['results'][0]['title'], 'Курс 9')
+        response = self.client.get('/api/v1/materials/lessons/?course=999999')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_writes_served_by_viewset(self):
+        response = self.client.patch(f'/api/v1/materials/courses/{self.courses[0].id}/', {'title': 'Новое'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_async(f'/api/v1/materials/courses/{self.courses[0].id}/').json()['title'], 'Новое')
+        response = self.client.delete(f'/api/v1/materials/courses/{self.courses[0].id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_jwt_writes_pass_csrf(self):
+        client = APIClient(enforce_csrf_checks=True)
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        response = client.post('/api/v1/materials/courses/', {'title': 'Курс', 'description': 'Описание'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = client.patch(f'/api/v1/materials/courses/{self.courses[0].id}/', {'title': 'Новое'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Вход по сессии без CSRF-токена отклоняет SessionAuthentication viewset'а
+        session_client = APIClient(enforce_csrf_checks=True)
+        session_client.login(email='student@test.com', password='testpass123')
+        response = session_client.patch(f'/api/v1/materials/courses/{self.courses[0].id}/', {'title': 'Иное'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_options_returns_drf_metadata(self):
+        response = self.client.options('/api/v1/materials/courses/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('actions', response.json())
+
+    def test_errors(self):
+        response = self.get_async('/api/v1/materials/courses/999999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.get_async('/api/v1/materials/courses/?page=99')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = APIClient().get('/api/v1/materials/courses/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+        response = APIClient().get('/api/v1/materials/courses/', HTTP_AUTHORIZATION='Bearer garbage')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.get_async('/api/v1/materials/courses/?fields=id,titel')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('titel', response.json()['fields'])
+
+    async def test_concurrent_requests(self):
+        client = AsyncClient()
+        headers = {'Authorization': f'Bearer {self.token}'}
+        responses = await asyncio.gather(*(
+            client.get(f'/api/v1/materials/courses/{course.id}/', headers=headers) for course in self.courses
+        ))
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_200_OK] * 10)
+        self.assertEqual([response.json()['id'] for response in responses], [course.id for course in self.courses])
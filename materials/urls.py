@@ -1,6 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import CourseViewSet, LessonViewSet, SubscriptionAPIView
+from .async_views import CourseAsyncView, LessonAsyncView
+from .views import (
+    BulkSubscriptionAPIView,
+    CacheStatsAPIView,
+    CatalogAPIView,
+    CourseViewSet,
+    IndexSearchAPIView,
+    LessonViewSet,
+    SubscriptionAPIView,
+    SubscriptionExportAPIView,
+)
 
 app_name = 'materials'  # Добавляем пространство имен
 
@@ -9,6 +19,16 @@ router.register(r'courses', CourseViewSet, basename='courses')  # Добавля
 router.register(r'lessons', LessonViewSet, basename='lessons')  # Добавляем basename
 
 urlpatterns = [
+    # Чтение курсов и уроков без потока на запрос (под ASGI), остальное - viewset
+    path('courses/', CourseAsyncView.as_view(), name='courses-async-list'),
+    path('courses/<int:pk>/', CourseAsyncView.as_view(), name='courses-async-detail'),
+    path('lessons/', LessonAsyncView.as_view(), name='lessons-async-list'),
+    path('lessons/<int:pk>/', LessonAsyncView.as_view(), name='lessons-async-detail'),
     path('', include(router.urls)),
     path('subscription/', SubscriptionAPIView.as_view(), name='subscription'),
+    path('subscriptions/bulk/', BulkSubscriptionAPIView.as_view(), name='subscriptions-bulk'),
+    path('subscriptions/export/', SubscriptionExportAPIView.as_view(), name='subscriptions-export'),
+    path('cache-stats/', CacheStatsAPIView.as_view(), name='cache-stats'),
+    path('search/', IndexSearchAPIView.as_view(), name='search'),
+    path('catalog/', CatalogAPIView.as_view(), name='catalog'),
 ]
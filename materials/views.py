@@ -1,23 +1,55 @@
-from datetime import timedelta
-from django.utils import timezone
-from rest_framework import viewsets, status
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, serializers, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.authentication import BasicAuthentication, SessionAuthentication
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 
+from users.authentication import ClaimsJWTAuthentication
+from .filters import FullTextSearchFilter
+from .mixins import (
+    CachedReadMixin,
+    ExportMixin,
+    FastListMixin,
+    SparseFieldsetMixin,
+    SparseFieldsetSerializerMixin,
+)
 from .models import Course, Lesson, Subscription
+from .renderers import FastJSONRenderer
+from .paginators import (
+    CatalogPagination,
+    CourseSelectablePagination,
+    IndexSearchPagination,
+    LessonSelectablePagination,
+)
 from .serializers import (
+    BulkSubscriptionSerializer,
+    CourseDetailSerializer,
+    CourseListSerializer,
     CourseSerializer,
+    IndexSearchQuerySerializer,
+    LessonBulkSerializer,
+    LessonDetailSerializer,
+    LessonListSerializer,
     LessonSerializer,
-    CourseWithPriceSerializer,
+    SubscriptionSerializer,
 )
-from .permissions import IsOwnerOrStaff
+from .services import cache_service, catalog_service, inverted_index
+from .services.notification_service import schedule_course_update
+from .services.subscription_service import bulk_set_subscriptions, get_subscribed_course_ids, set_subscription
 
 # Пробуем импортировать Celery задачи
 try:
-    from materials.tasks import send_course_update_email
+    import materials.tasks  # noqa: F401
     CELERY_AVAILABLE = True
     print("✅ Celery задачи доступны")
 except ImportError as e:
@@ -25,23 +57,98 @@ except ImportError as e:
     print(f"⚠️  Celery задачи недоступны: {e}")
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+# Чтение курсов, уроков, каталога и поиска не загружает пользователя из БД
+CLAIMS_AUTHENTICATION_CLASSES = [ClaimsJWTAuthentication, SessionAuthentication, BasicAuthentication]
+
+# Порядок совпадает с индексом lesson_course_order_idx: выборка уроков страницы
+# курсов по course_id IN (...) читает индекс без сортировки
+LESSONS_PREFETCH_ORDERING = ('course_id', 'order', 'id')
+
+
+def requested_subscription_state(request):
+    """Значение is_active из запроса или None (переключить подписку)"""
+    value = request.data.get('is_active')
+    if value is None:
+        return None
+    try:
+        return serializers.BooleanField().to_internal_value(value)
+    except serializers.ValidationError as e:
+        raise serializers.ValidationError({'is_active': e.detail})
+
+
+def notify_course_update(course, summary):
+    """
+    Добавляет изменение в уведомление подписчиков курса: первая правка
+    уходит сразу, следующие за окно COURSE_UPDATE_DEBOUNCE_SECONDS - одним письмом.
+
+    Вызывается в транзакции изменения курса: пачка и запись outbox
+    фиксируются вместе с данными. Ошибка планирования откатывает только
+    свою точку сохранения и не отменяет изменение курса.
+    """
+    if not CELERY_AVAILABLE:
+        return
+
+    try:
+        with transaction.atomic():
+            if schedule_course_update(course.id, summary):
+                print(f"✅ Уведомление для курса '{course.title}' записано в outbox")
+    except Exception as e:
+        print(f"❌ Ошибка при планировании уведомления: {e}")
+
+
+class CourseViewSet(SparseFieldsetMixin, CachedReadMixin, FastListMixin, viewsets.ModelViewSet):
     """
     ViewSet для работы с курсами с поддержкой подписок и уведомлений
     """
     queryset = Course.objects.all()
+    cache_list_scopes = ('courses', 'lessons')
+    cache_object_scope = 'course'
+    cache_user_specific = True
     serializer_class = CourseSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    pagination_class = CourseSelectablePagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ['is_published']
     ordering_fields = ['title', 'price', 'created_at']
-    search_fields = ['title', 'description']
+    authentication_classes = CLAIMS_AUTHENTICATION_CLASSES
     permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Один запрос на страницу курсов: количество уроков считается в SQL,
+        уроки подгружаются одним prefetch-запросом.
+
+        В list/retrieve аннотация и prefetch добавляются, только если
+        их поля выбраны (?fields=, ?expand=lessons)
+        """
+        selected = self.get_selected_fields() if self.action in self.sparse_actions else None
+        queryset = Course.objects.order_by('id')
+        if selected is None or 'lessons_count' in selected:
+            queryset = queryset.annotate(lessons_count=catalog_service.lessons_count())
+        if selected is None or 'lessons' in selected:
+            lessons = Lesson.objects.order_by(*LESSONS_PREFETCH_ORDERING)
+            lesson_serializer = self.get_field_selection().fields['lessons'].child if selected else None
+            if isinstance(lesson_serializer, SparseFieldsetSerializerMixin):
+                lessons = lessons.only('course', *lesson_serializer.get_model_columns())
+            queryset = queryset.prefetch_related(Prefetch('lessons', queryset=lessons))
+        return queryset
+
+    def get_serializer_context(self):
+        """
+        Флаг подписки проверяется по закэшированному множеству курсов пользователя
+        """
+        context = super().get_serializer_context()
+        context['subscribed_course_ids'] = get_subscribed_course_ids(self.request.user.pk)
+        return context
+
     def get_serializer_class(self):
         """
         Выбираем сериализатор в зависимости от действия
         """
-        if self.action == 'list' or self.action == 'retrieve':
-            return CourseWithPriceSerializer
+        if self.action == 'list':
+            return CourseListSerializer
+        if self.action == 'retrieve':
+            return CourseDetailSerializer
         return CourseSerializer
 
     def perform_create(self, serializer):
@@ -51,41 +158,18 @@ class CourseViewSet(viewsets.ModelViewSet):
         """
         Переопределяем метод обновления для отправки уведомлений
         """
-        instance = serializer.save()
+        with transaction.atomic():
+            instance = serializer.save()
+            notify_course_update(instance, f"Курс '{instance.title}' был обновлен. Проверьте новые материалы!")
 
-        # Дополнительное задание: проверяем, обновлялся ли курс за последние 4 часа
-        four_hours_ago = timezone.now() - timedelta(hours=4)
-
-        if CELERY_AVAILABLE and instance.updated_at < four_hours_ago:
-            # Отправляем уведомление асинхронно
-            update_message = f"Курс '{instance.title}' был обновлен. Проверьте новые материалы!"
-
-            try:
-                # Запускаем Celery задачу асинхронно
-                send_course_update_email.delay(
-                    course_id=instance.id,
-                    update_message=update_message
-                )
-                print(f"✅ Задача на отправку уведомлений для курса '{instance.title}' отправлена в Celery")
-            except Exception as e:
-                print(f"❌ Ошибка при отправке задачи в Celery: {e}")
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def subscribe(self, request, pk=None):
         """
-        Подписка на курс
+        Подписка на курс: {"is_active": true/false} задает состояние
+        (двойной клик ничего не ломает), без параметра - переключает его
         """
         course = self.get_object()
-        user = request.user
-
-        subscription, created = Subscription.objects.get_or_create(
-            user=user,
-            course=course,
-            defaults={'is_active': True}
-        )
-
-        if not created:
-            subscription.is_active = not subscription.is_active
-            subscription.save()
+        subscription, _ = set_subscription(request.user.pk, course.id, requested_subscription_state(request))
 
         message = 'подписка оформлена' if subscription.is_active else 'подписка отменена'
 
@@ -100,26 +184,167 @@ class CourseViewSet(viewsets.ModelViewSet):
         """
         Список курсов, на которые подписан текущий пользователь
         """
+        subscribed_ids = get_subscribed_course_ids(request.user.pk)
+        courses = self.get_queryset().filter(id__in=subscribed_ids)
+        serializer = self.get_serializer(courses, many=True)
+
+        return Response(serializer.data)
+
+
+class SubscriptionAPIView(APIView):
+    """
+    Управление подписками текущего пользователя
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Список активных подписок пользователя
+        """
         subscriptions = Subscription.objects.filter(
             user=request.user,
             is_active=True
-        ).select_related('course')
+        )
+        serializer = SubscriptionSerializer(subscriptions, many=True)
+        return Response(serializer.data)
 
-        courses = [sub.course for sub in subscriptions]
-        serializer = self.get_serializer(courses, many=True)
+    def post(self, request):
+        """
+        Добавляет подписку на курс или удаляет существующую
+        """
+        course = get_object_or_404(Course, id=request.data.get('course_id'))
+        subscription, _ = set_subscription(request.user.pk, course.id, requested_subscription_state(request))
 
-        return Response(serializer.data)
-class LessonViewSet(viewsets.ModelViewSet):
+        message = 'подписка добавлена' if subscription.is_active else 'подписка удалена'
+
+        return Response({'message': message}, status=status.HTTP_200_OK)
+
+
+class SubscriptionExportAPIView(ExportMixin, generics.GenericAPIView):
+    """
+    Потоковая выгрузка подписок всех пользователей для администраторов
+    (?course=, ?user=, ?is_active=, ?export_format=ndjson|csv)
+    """
+    queryset = Subscription.objects.all()
+    permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_fields = ['course', 'user', 'is_active']
+    ordering_fields = ['subscribed_at']
+    export_fields = ('id', 'user_id', 'course_id', 'is_active', 'subscribed_at')
+    export_filename = 'subscriptions'
+
+    def get(self, request):
+        return self.export_response(request)
+
+
+class BulkSubscriptionAPIView(APIView):
+    """
+    Пакетная подписка для администраторов: {"user_ids": [...], "course_ids": [...],
+    "action": "subscribe" | "unsubscribe"}. Повторный запрос ничего не меняет;
+    в ответе - число созданных, измененных и оставшихся без изменений подписок
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        serializer = BulkSubscriptionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        counts = bulk_set_subscriptions(
+            serializer.validated_data['user_ids'],
+            serializer.validated_data['course_ids'],
+            is_active=serializer.validated_data['action'] == 'subscribe',
+        )
+        return Response(counts, status=status.HTTP_200_OK)
+
+
+class CatalogAPIView(APIView):
+    """
+    Публичный каталог опубликованных курсов.
+
+    Отдается из закешированной проекции (catalog_service.get_catalog):
+    без вложенных уроков, подписок и данных владельца, поэтому
+    одна проекция подходит всем пользователям, включая анонимных.
+    """
+    authentication_classes = CLAIMS_AUTHENTICATION_CLASSES
+    permission_classes = [AllowAny]
+    pagination_class = CatalogPagination
+
+    def get(self, request):
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(catalog_service.get_catalog(), request, view=self)
+        return paginator.get_paginated_response(page)
+
+
+class CacheStatsAPIView(APIView):
+    """
+    Счетчики попаданий и промахов кеша ответов курсов и уроков
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache_service.get_stats())
+
+
+class IndexSearchAPIView(APIView):
+    """
+    Поиск по инвертированному индексу в памяти процесса без запроса к БД.
+
+    ?q= - слова запроса ('прог*' - префикс), ?type=lessons|courses,
+    ?operator=and|or. Результаты упорядочены по id; из БД читаются
+    только поля записей текущей страницы.
+    """
+    authentication_classes = CLAIMS_AUTHENTICATION_CLASSES
+    permission_classes = [IsAuthenticated]
+    pagination_class = IndexSearchPagination
+    result_fields = {
+        'courses': ('id', 'title', 'description'),
+        'lessons': ('id', 'title', 'description', 'course_id'),
+    }
+
+    def get(self, request):
+        params = IndexSearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        name = params.validated_data['type']
+        index = inverted_index.get_index(name)
+
+        ids = index.search(params.validated_data['q'], params.validated_data['operator'])
+        paginator = self.pagination_class()
+        page_ids = paginator.paginate_queryset(ids, request, view=self)
+
+        rows = index.model.objects.filter(id__in=page_ids).values(*self.result_fields[name])
+        rows_by_id = {row['id']: row for row in rows}
+        # Удаленные в другом процессе записи пропускаются, пока индекс не применил журнал изменений
+        results = [rows_by_id[doc_id] for doc_id in page_ids if doc_id in rows_by_id]
+        return paginator.get_paginated_response(results)
+
+
+class LessonViewSet(SparseFieldsetMixin, CachedReadMixin, FastListMixin, ExportMixin, viewsets.ModelViewSet):
     """
     ViewSet для работы с уроками с поддержкой уведомлений
+    и потоковой выгрузкой (lessons/export/)
     """
     queryset = Lesson.objects.all()
+    cache_list_scopes = ('lessons',)
+    cache_object_scope = 'lesson'
     serializer_class = LessonSerializer
-    filter_backends = [DjangoFilterBackend, OrderingFilter, SearchFilter]
+    pagination_class = LessonSelectablePagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_fields = ['course']
     ordering_fields = ['title', 'order']
-    search_fields = ['title', 'description']
+    authentication_classes = CLAIMS_AUTHENTICATION_CLASSES
     permission_classes = [IsAuthenticated]
+    export_fields = ('id', 'course_id', 'order', 'title', 'description', 'video_link',
+                     'owner_id', 'created_at', 'updated_at')
+    export_filename = 'lessons'
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return LessonListSerializer
+        if self.action == 'retrieve':
+            return LessonDetailSerializer
+        if self.action == 'bulk':
+            return LessonBulkSerializer
+        return LessonSerializer
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -128,28 +353,37 @@ class LessonViewSet(viewsets.ModelViewSet):
         """
         Переопределяем метод обновления урока для отправки уведомлений
         """
-        instance = serializer.save()
-        course = instance.course
-
-        if not CELERY_AVAILABLE:
-            return
-
-        # Проверяем, обновлялся ли курс за последние 4 часа
-        four_hours_ago = timezone.now() - timedelta(hours=4)
-
-        if course.updated_at < four_hours_ago:
-            # Обновляем время обновления курса
-            course.updated_at = timezone.now()
-            course.save()
-            # Отправляем уведомление асинхронно
-            update_message = f"В курсе '{course.title}' был обновлен урок: '{instance.title}'"
-
-            try:
-                # Запускаем Celery задачу асинхронно
-                send_course_update_email.delay(
-                    course_id=course.id,
-                    update_message=update_message
-                )
-                print(f"✅ Задача на отправку уведомлений для курса '{course.title}' отправлена в Celery")
-            except Exception as e:
-                print(f"❌ Ошибка при отправке задачи в Celery: {e}")
+        with transaction.atomic():
+            instance = serializer.save()
+            notify_course_update(instance.course, f"Обновлен урок: '{instance.title}'")
+
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk(self, request):
+        """
+        Пакетное создание (POST) или частичное обновление (PATCH, элементы с id)
+        до LESSONS_BULK_MAX_SIZE уроков одной транзакцией.
+
+        Подписчики каждого затронутого курса получают одно уведомление
+        на весь запрос, а не по одному на урок
+        """
+        creating = request.method == 'POST'
+        serializer = self.get_serializer(
+            None if creating else self.get_queryset(),
+            data=request.data,
+            many=True,
+            partial=not creating,
+            max_length=settings.LESSONS_BULK_MAX_SIZE,
+        )
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            lessons = serializer.save(owner=request.user) if creating else serializer.save()
+            counts = Counter(lesson.course_id for lesson in lessons)
+            verb = 'Добавлено' if creating else 'Обновлено'
+            for course in Course.objects.filter(id__in=counts):
+                notify_course_update(course, f'{verb} уроков: {counts[course.id]}')
+
+        return Response(
+            serializer.data,
+            status=status.HTTP_201_CREATED if creating else status.HTTP_200_OK
+        )
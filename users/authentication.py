@@ -0,0 +1,151 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from materials.services.role_service import aget_roles_version, get_roles_version
+from . import user_cache
+
+# Claims ролей, которые CustomTokenObtainPairSerializer добавляет в токен
+ROLES_VERSION_CLAIM = 'roles_version'
+GROUPS_CLAIM = 'groups'
+
+
+class ClaimsUser(TokenUser):
+    """
+    Пользователь из claims токена без обращения к БД.
+
+    Группы берутся из токена и запоминаются так же, как их запоминает
+    role_service.get_user_groups, поэтому проверки прав (IsModerator и др.)
+    тоже не делают запросов
+    """
+
+    def __init__(self, token):
+        super().__init__(token)
+        self._group_names = frozenset(token.get(GROUPS_CLAIM, ()))
+
+    @cached_property
+    def id(self):
+        # В токене id строкой; сравнения вида obj.owner_id == user.pk ждут тип поля модели
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def email(self):
+        return self.token.get('email', '')
+
+    @cached_property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @cached_property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication, которая берет пользователя из users.user_cache
+    (кеш процесса и общий кеш) вместо SELECT на каждый запрос.
+    Проверки активности и отзыва токена - как в JWTAuthentication.get_user
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user = user_cache.get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        # Хеша пароля в кеше нет, при включенной проверке он читается из БД
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+
+        return user
+
+
+class ClaimsJWTAuthentication(CachedJWTAuthentication):
+    """
+    JWTAuthentication без SELECT пользователя на запросах чтения.
+
+    Для GET/HEAD/OPTIONS пользователь строится из claims (ClaimsUser),
+    если версия ролей в токене совпадает с текущей. Изменение групп, прав,
+    пароля или блокировка сдвигают версию (role_service.bump_roles_version),
+    и такие токены, как и запросы на запись, проходят обычную проверку
+    пользователя (CachedJWTAuthentication).
+
+    Для представлений, которым на чтении достаточно id, email, is_staff
+    и групп пользователя: request.user здесь не объект модели.
+
+    Версии ролей должны быть общими для процессов: без SHARED_CACHE
+    (Redis) блокировка в Celery не отозвала бы claims в веб-воркерах,
+    поэтому claims не используются и проверка та же, что в
+    CachedJWTAuthentication.
+    """
+
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS:
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        user = self.get_claims_user(validated_token) or self.get_user(validated_token)
+        return user, validated_token
+
+    async def aauthenticate(self, request):
+        """
+        authenticate для async-представлений чтения (django.http.HttpRequest).
+
+        Версия ролей читается асинхронным API кеша; если claims отозваны,
+        пользователь загружается в потоке (sync_to_async)
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        user = await self.aget_claims_user(validated_token)
+        if user is None:
+            user = await sync_to_async(self.get_user)(validated_token)
+        return user, validated_token
+
+    def get_claims_user(self, validated_token):
+        """ClaimsUser или None, если claims ролей в токене нет, они отозваны или кеш не общий"""
+        if not settings.SHARED_CACHE:
+            return None
+        version = validated_token.get(ROLES_VERSION_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if version is None or user_id is None or version != get_roles_version(user_id):
+            return None
+        return ClaimsUser(validated_token)
+
+    async def aget_claims_user(self, validated_token):
+        if not settings.SHARED_CACHE:
+            return None
+        version = validated_token.get(ROLES_VERSION_CLAIM)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if version is None or user_id is None or version != await aget_roles_version(user_id):
+            return None
+        return ClaimsUser(validated_token)
@@ -0,0 +1,14 @@
+from rest_framework.exceptions import Throttled
+from rest_framework.views import exception_handler as drf_exception_handler
+
+from .hashers import HashingPoolSaturated
+
+
+def exception_handler(exc, context):
+    """Обработчик DRF, который отвечает 429 на переполнение пула хеширования паролей"""
+    if isinstance(exc, HashingPoolSaturated):
+        exc = Throttled(
+            wait=exc.retry_after,
+            detail='Слишком много одновременных входов и регистраций, повторите позже.'
+        )
+    return drf_exception_handler(exc, context)
@@ -0,0 +1,164 @@
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+    PBKDF2PasswordHasher,
+)
+
+# Доля нового замера в скользящей средней длительности хеширования
+DURATION_SMOOTHING = 0.2
+
+
+class HashingPoolSaturated(Exception):
+    """
+    Очередь пула хеширования заполнена.
+
+    Не зависит от DRF, чтобы хешеры работали в админке, командах и задачах;
+    в API переводится в 429 (users.exceptions.exception_handler).
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f'Очередь хеширования паролей заполнена, повторите через {retry_after} с')
+        self.retry_after = retry_after
+
+
+class PasswordHashingPool:
+    """
+    Ограниченный пул потоков для хеширования и проверки паролей.
+
+    hashlib.pbkdf2_hmac, argon2-cffi и bcrypt отпускают GIL, поэтому потоки
+    пула считают хеши параллельно, а число одновременно занятых ядер не
+    превышает PASSWORD_HASHING_WORKERS: при всплеске входов поток запроса
+    ждет свою очередь, а ядра остаются другим запросам. Если в очереди больше PASSWORD_HASHING_MAX_PENDING
+    операций, новая отклоняется HashingPoolSaturated (в API - 429 и Retry-After,
+    рассчитанный по средней длительности хеширования), - иначе ожидание
+    превысит таймауты клиентов.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.workers = None
+        self.pending = 0
+        self.average_duration = None
+        self.local = threading.local()
+
+    def get_executor(self):
+        workers = settings.PASSWORD_HASHING_WORKERS or os.cpu_count() or 1
+        with self.lock:
+            if self.executor is None or self.workers != workers:
+                if self.executor is not None:
+                    self.executor.shutdown(wait=False)
+                self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hashing')
+                self.workers = workers
+            return self.executor
+
+    def retry_after(self):
+        """Через сколько секунд очередь пула разберется при текущей скорости"""
+        duration = self.average_duration or 1.0
+        return max(1, math.ceil(self.pending * duration / (self.workers or 1)))
+
+    def acquire(self):
+        with self.lock:
+            if self.pending >= settings.PASSWORD_HASHING_MAX_PENDING:
+                raise HashingPoolSaturated(self.retry_after())
+            self.pending += 1
+
+    def release(self, duration):
+        with self.lock:
+            self.pending -= 1
+            if self.average_duration is None:
+                self.average_duration = duration
+            else:
+                self.average_duration += DURATION_SMOOTHING * (duration - self.average_duration)
+
+    def _timed(self, func, args):
+        started = time.monotonic()
+        self.local.active = True
+        try:
+            return func(*args)
+        finally:
+            self.local.active = False
+            self.release(time.monotonic() - started)
+
+    def submit(self, func, args):
+        executor = self.get_executor()
+        self.acquire()
+        try:
+            return executor.submit(self._timed, func, args)
+        except BaseException:
+            self.release(0.0)
+            raise
+
+    def run(self, func, *args):
+        """Выполняет func в пуле и ждет результат в текущем потоке"""
+        # verify PBKDF2 и bcrypt вызывает encode: внутри пула считаем сразу,
+        # иначе занятые потоки ждали бы друг друга
+        if getattr(self.local, 'active', False):
+            return func(*args)
+        return self.submit(func, args).result()
+
+
+
+hashing_pool = PasswordHashingPool()
+
+
+class PooledHasherMixin:
+    """
+    Хешер, который считает encode и verify в hashing_pool.
+
+    Разбор хеша, must_update и пересохранение пароля после входа остаются
+    в потоке запроса: в пуле нет обращений к БД.
+    """
+
+    def encode(self, password, salt, *args, **kwargs):
+        return hashing_pool.run(partial(super().encode, password, salt, *args, **kwargs))
+
+    def verify(self, password, encoded):
+        return hashing_pool.run(super().verify, password, encoded)
+
+
+class TunedArgon2PasswordHasher(PooledHasherMixin, Argon2PasswordHasher):
+    """
+    Argon2id с параметрами из настроек.
+
+    По умолчанию - рекомендация OWASP (19 МиБ, 2 прохода, 1 поток) вместо
+    100 МиБ и 8 потоков Django: на воркере с несколькими процессами это в разы
+    меньше памяти и CPU на вход. После изменения параметров хеш пересчитывается
+    при следующем входе пользователя (must_update).
+    """
+
+    @property
+    def time_cost(self):
+        return settings.PASSWORD_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        return settings.PASSWORD_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class TunedBCryptSHA256PasswordHasher(PooledHasherMixin, BCryptSHA256PasswordHasher):
+    """bcrypt(SHA256(пароль)) с log2 числа раундов из PASSWORD_BCRYPT_ROUNDS"""
+
+    @property
+    def rounds(self):
+        return settings.PASSWORD_BCRYPT_ROUNDS
+
+
+class TunedPBKDF2PasswordHasher(PooledHasherMixin, PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 с числом итераций из PASSWORD_PBKDF2_ITERATIONS"""
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_PBKDF2_ITERATIONS
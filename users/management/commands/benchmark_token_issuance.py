@@ -0,0 +1,112 @@
+import threading
+import time
+from importlib.util import find_spec
+from statistics import quantiles
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from users.serializers import CustomTokenObtainPairSerializer
+
+User = get_user_model()
+
+PASSWORD = 'benchmark-Passw0rd'
+
+# Стандартный PBKDF2 Django в потоке запроса - точка отсчета
+BASELINE_HASHER = 'django.contrib.auth.hashers.PBKDF2PasswordHasher'
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет пропускную способность выдачи JWT (токенов/сек, p50/p99) '
+        'для стандартного PBKDF2 Django и настроенных хешеров из '
+        'PASSWORD_HASHER_STRATEGIES при разном числе одновременных входов'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', nargs='+', default=None,
+                            help='baseline и/или argon2, bcrypt, pbkdf2; по умолчанию все установленные')
+        parser.add_argument('--concurrency', nargs='+', type=int, default=[1, 8, 32],
+                            help='Число одновременных входов')
+        parser.add_argument('--requests', type=int, default=64, help='Входов на каждое измерение')
+
+    def handle(self, *args, **options):
+        hashers = options['hashers'] or ['baseline'] + [
+            name for name, (library, _) in settings.PASSWORD_HASHER_STRATEGIES.items()
+            if library is None or find_spec(library) is not None
+        ]
+        unknown = set(hashers) - {'baseline'} - set(settings.PASSWORD_HASHER_STRATEGIES)
+        if unknown:
+            raise CommandError(f"Неизвестные хешеры: {', '.join(sorted(unknown))}")
+
+        self.stdout.write(
+            f'Потоков пула хеширования: {settings.PASSWORD_HASHING_WORKERS or "по числу ядер"}, '
+            f'максимум в очереди: {settings.PASSWORD_HASHING_MAX_PENDING}'
+        )
+        self.stdout.write(f"{'хешер':>10} {'входов':>7} {'токенов/сек':>12} {'p50, мс':>9} {'p99, мс':>9}")
+        for name in hashers:
+            path = BASELINE_HASHER if name == 'baseline' else settings.PASSWORD_HASHER_STRATEGIES[name][1]
+            # Потоки бенчмарка читают пользователя своими соединениями,
+            # поэтому пользователь сохраняется без транзакции и удаляется в конце
+            with override_settings(PASSWORD_HASHERS=[path]):
+                user = User.objects.create_user(email=f'token-benchmark-{name}@example.com', password=PASSWORD)
+                try:
+                    self.issue_token(user.email)
+                    for concurrency in options['concurrency']:
+                        rate, durations = self.measure(user.email, concurrency, options['requests'])
+                        p50, p99 = self.percentiles(durations)
+                        self.stdout.write(f'{name:>10} {concurrency:>7} {rate:>12.1f} {p50:>9.1f} {p99:>9.1f}')
+                finally:
+                    user.delete()
+
+    @staticmethod
+    def issue_token(email):
+        serializer = CustomTokenObtainPairSerializer(data={'email': email, 'password': PASSWORD})
+        if not serializer.is_valid():
+            raise CommandError(f'Токен не выдан: {serializer.errors}')
+        return serializer.validated_data['access']
+
+    def measure(self, email, concurrency, requests):
+        durations = []
+        errors = []
+        counter = iter(range(requests))
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    with lock:
+                        if next(counter, None) is None:
+                            return
+                    started = time.perf_counter()
+                    try:
+                        self.issue_token(email)
+                    except Exception as exc:
+                        errors.append(exc)
+                        continue
+                    durations.append(time.perf_counter() - started)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            self.stdout.write(self.style.WARNING(f'Ошибок при {concurrency} входах: {len(errors)} ({errors[0]})'))
+        return len(durations) / elapsed, durations
+
+    @staticmethod
+    def percentiles(durations):
+        if len(durations) < 2:
+            value = durations[0] * 1000 if durations else 0.0
+            return value, value
+        cuts = quantiles(durations, n=100, method='inclusive')
+        return cuts[49] * 1000, cuts[98] * 1000
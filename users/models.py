@@ -82,6 +82,12 @@ class Payment(models.Model):
         verbose_name = 'Платеж'
         verbose_name_plural = 'Платежи'
         ordering = ['-payment_date']
+        indexes = [
+            # Список платежей пользователя, новые первыми
+            models.Index(fields=['user', '-payment_date'], name='payment_user_date_idx'),
+            models.Index(fields=['course_id'], name='payment_course_idx'),
+            models.Index(fields=['lesson_id'], name='payment_lesson_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user} - {self.amount} - {self.payment_date}'
@@ -89,21 +95,46 @@ class Payment(models.Model):
     @property
     def course(self):
         """Получаем объект курса если course_id указан"""
-        if self.course_id:
-            try:
-                from materials.models import Course
-                return Course.objects.get(id=self.course_id)
-            except:
-                return None
-        return None
+        return self._get_related('course', self.course_id)
 
     @property
     def lesson(self):
         """Получаем объект урока если lesson_id указан"""
-        if self.lesson_id:
-            try:
-                from materials.models import Lesson
-                return Lesson.objects.get(id=self.lesson_id)
-            except:
-                return None
-        return None
\ No newline at end of file
+        return self._get_related('lesson', self.lesson_id)
+
+    def _get_related(self, name, object_id):
+        """Возвращает связанный объект, запрашивая его из БД не более одного раза"""
+        if not object_id:
+            return None
+        cache = self.__dict__.setdefault('_related_cache', {})
+        if (name, object_id) not in cache:
+            model = self._related_models()[name]
+            cache[(name, object_id)] = model.objects.filter(id=object_id).first()
+        return cache[(name, object_id)]
+
+    @staticmethod
+    def _related_models():
+        from materials.models import Course, Lesson
+        return {'course': Course, 'lesson': Lesson}
+
+    @classmethod
+    def resolve_related(cls, payments, names=None, only=None):
+        """
+        Загружает курсы и уроки для списка платежей двумя запросами in_bulk
+        и кеширует их на экземплярах, чтобы свойства course/lesson не ходили в БД.
+
+        names ограничивает связи ('course', 'lesson'), only - загружаемые поля
+        """
+        for name, model in cls._related_models().items():
+            if names is not None and name not in names:
+                continue
+            ids = {getattr(payment, f'{name}_id') for payment in payments}
+            ids.discard(None)
+            queryset = model.objects.only(*only) if only else model.objects
+            objects = queryset.in_bulk(ids) if ids else {}
+            for payment in payments:
+                object_id = getattr(payment, f'{name}_id')
+                if object_id:
+                    cache = payment.__dict__.setdefault('_related_cache', {})
+                    cache[(name, object_id)] = objects.get(object_id)
+        return payments
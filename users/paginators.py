@@ -0,0 +1,12 @@
+from rest_framework.pagination import PageNumberPagination
+
+from materials.paginators import KeysetPagination, SelectablePagination
+
+
+class PaymentKeysetPagination(KeysetPagination):
+    ordering = ('-payment_date', '-id')
+
+
+class PaymentPagination(SelectablePagination):
+    page_number_class = PageNumberPagination
+    keyset_class = PaymentKeysetPagination
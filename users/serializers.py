@@ -3,6 +3,9 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 
+from materials.services.role_service import get_roles_version, get_user_groups
+from .authentication import GROUPS_CLAIM, ROLES_VERSION_CLAIM
+
 
 User = get_user_model()
 
@@ -57,4 +60,10 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['email'] = user.email
         token['first_name'] = user.first_name
         token['last_name'] = user.last_name
+        # Роли для ClaimsJWTAuthentication; версия читается до групп,
+        # чтобы изменение между чтениями сделало claims недействительными
+        token[ROLES_VERSION_CLAIM] = get_roles_version(user.pk)
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        token[GROUPS_CLAIM] = sorted(get_user_groups(user))
         return token
@@ -1,12 +1,30 @@
+from django.db import models
 from rest_framework import serializers
+
+from materials.mixins import SparseFieldsetSerializerMixin
 from .models import Payment  # Импортируем из models.py
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentListSerializer(serializers.ListSerializer):
+    """Список платежей с пакетной загрузкой курсов и уроков"""
+    # Поле с названием -> связь, которую оно читает
+    related_title_fields = {'course_title': 'course', 'lesson_title': 'lesson'}
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        names = [name for field, name in self.related_title_fields.items() if field in self.child.fields]
+        payments = list(iterable)
+        if names:
+            payments = Payment.resolve_related(payments, names=names, only=('id', 'title'))
+        return super().to_representation(payments)
+
+
+class PaymentSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     """Сериализатор для платежей с IntegerField"""
     course_title = serializers.SerializerMethodField()
     lesson_title = serializers.SerializerMethodField()
     user_email = serializers.CharField(source='user.email', read_only=True)
+    field_columns = {'course_title': ('course_id',), 'lesson_title': ('lesson_id',)}
     
     class Meta:
         model = Payment
@@ -15,16 +33,15 @@ class PaymentSerializer(serializers.ModelSerializer):
             'lesson_id', 'lesson_title', 'amount', 'payment_method'
         ]
         read_only_fields = ['user', 'payment_date']
+        list_serializer_class = PaymentListSerializer
     
     def get_course_title(self, obj):
-        if obj.course:
-            return obj.course.title
-        return None
+        course = obj.course
+        return course.title if course else None
     
     def get_lesson_title(self, obj):
-        if obj.lesson:
-            return obj.lesson.title
-        return None
+        lesson = obj.lesson
+        return lesson.title if lesson else None
 
 class PaymentCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания платежа"""
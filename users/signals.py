@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from materials.services.role_service import bump_roles_version
+from .user_cache import forget_users
+
+User = get_user_model()
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    """Общий кеш сбрасывает сдвиг версии ролей (revoke_role_claims), здесь - кеш процесса"""
+    forget_users([instance.pk])
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def revoke_role_claims(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Права, статус или пароль пользователя могли измениться: claims ролей
+    в его токенах больше не действуют (см. users.authentication)
+    """
+    if created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    bump_roles_version([instance.pk])
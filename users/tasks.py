@@ -1,10 +1,15 @@
+import csv
+from pathlib import Path
+
 from celery import shared_task
 from django.utils import timezone
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage, send_mail
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from datetime import timedelta
-from materials.models import Course, Subscription
+from materials import tasks as materials_tasks
+from .user_cache import invalidate_users
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,52 +19,32 @@ User = get_user_model()
 @shared_task
 def send_course_update_email(course_id, update_message):
     """
-    Отправка email подписчикам курса об обновлении
-    
-    Args:
-        course_id (int): ID курса
-        update_message (str): Сообщение об обновлении
+    Устаревшее имя задачи, оставлено для сообщений, уже стоящих в очереди.
+    Рассылка выполняется единственной реализацией из materials.tasks.
     """
-    try:
-        course = Course.objects.get(id=course_id)
-        subscriptions = Subscription.objects.filter(course=course, is_active=True)
-        
-        if not subscriptions.exists():
-            logger.info(f'Нет активных подписчиков для курса {course.title}')
-            return
-        
-        subject = f'Обновление курса: {course.title}'
-        message = f'''
-        Здравствуйте!
-        
-        Курс "{course.title}" был обновлен.
-        
-        {update_message}
-        
-        Перейдите по ссылке, чтобы ознакомиться с изменениями:
-        http://localhost:8000/api/courses/{course.id}/
-        
-        С уважением,
-        Команда образовательной платформы
-        '''
-        emails = [sub.user.email for sub in subscriptions if sub.user.email]
-        
-        if emails:
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.DEFAULT_FROM_EMAIL,
-                recipient_list=emails,
-                fail_silently=False,
-            )
-            logger.info(f'Отправлено {len(emails)} писем об обновлении курса {course.title}')
-        else:
-            logger.warning(f'Нет email адресов для отправки у подписчиков курса {course.title}')
-            
-    except Course.DoesNotExist:
-        logger.error(f'Курс с ID {course_id} не найден')
-    except Exception as e:
-        logger.error(f'Ошибка при отправке email: {e}')
+    return materials_tasks.send_course_update_email(course_id, update_message)
+
+
+def _deactivate_inactive_batch(threshold, last_id, batch_size):
+    """
+    Блокирует следующую по id пачку неактивных пользователей в короткой
+    транзакции и возвращает строки (id, email, last_login) заблокированных
+    """
+    with transaction.atomic():
+        # Строки пачки блокируются до UPDATE, поэтому отчет совпадает с изменениями
+        batch = list(
+            User.objects.select_for_update().filter(
+                id__gt=last_id,
+                last_login__lt=threshold,
+                is_active=True,
+                is_superuser=False,  # Не блокируем суперпользователей
+            ).order_by('id').values_list('id', 'email', 'last_login')[:batch_size]
+        )
+        if batch:
+            User.objects.filter(id__in=[row[0] for row in batch]).update(is_active=False)
+    # update() не отправляет сигналов: сбрасываем кеш и claims ролей заблокированных явно
+    invalidate_users([row[0] for row in batch])
+    return batch
 
 
 @shared_task
@@ -67,39 +52,52 @@ def check_inactive_users():
     """
     Проверка неактивных пользователей и их блокировка
     Пользователь блокируется, если не заходил более 30 дней
+
+    Пользователи обрабатываются пачками по INACTIVE_USERS_BATCH_SIZE
+    с пагинацией по id, каждая пачка - отдельная короткая транзакция.
+    Отчет для администратора пишется в CSV-файл построчно.
     """
     try:
         thirty_days_ago = timezone.now() - timedelta(days=30)
-        
-        # Находим активных пользователей, которые не заходили более 30 дней
-        inactive_users = User.objects.filter(
-            last_login__lt=thirty_days_ago,
-            is_active=True
-        ).exclude(is_superuser=True)  # Не блокируем суперпользователей
-        
-        count = inactive_users.count()
-        
+        batch_size = settings.INACTIVE_USERS_BATCH_SIZE
+
+        report_dir = Path(settings.INACTIVE_USERS_REPORT_DIR)
+        report_dir.mkdir(parents=True, exist_ok=True)
+        report_path = report_dir / f'inactive_users_{timezone.now():%Y%m%d_%H%M%S}.csv'
+
+        count = 0
+        last_id = 0
+        with open(report_path, 'w', newline='', encoding='utf-8') as report:
+            writer = csv.writer(report)
+            writer.writerow(['id', 'email', 'last_login'])
+            while batch := _deactivate_inactive_batch(thirty_days_ago, last_id, batch_size):
+                writer.writerows(batch)
+                count += len(batch)
+                last_id = batch[-1][0]
+
         if count > 0:
-            # Блокируем пользователей
-            inactive_users.update(is_active=False)
-            # Логируем действие
-            user_emails = list(inactive_users.values_list('email', flat=True))
-            logger.info(f'Заблокировано {count} неактивных пользователей: {user_emails}')
+            logger.info(f'Заблокировано {count} неактивных пользователей, отчет: {report_path}')
             
             # Отправляем уведомление администратору (опционально)
             try:
-                send_mail(
+                email = EmailMessage(
                     subject=f'Заблокировано {count} неактивных пользователей',
-                    message=f'Были заблокированы пользователи, которые не заходили более 30 дней.\n\nЗаблокированные email: {", ".join(user_emails)}',
+                    body=(
+                        f'Были заблокированы пользователи, которые не заходили более 30 дней.\n\n'
+                        f'Список заблокированных: {report_path}'
+                    ),
                     from_email=settings.DEFAULT_FROM_EMAIL,
-                    recipient_list=[settings.DEFAULT_FROM_EMAIL],
-                    fail_silently=True,
+                    to=[settings.DEFAULT_FROM_EMAIL],
                 )
-            except:
-                pass  # Игнорируем ошибки отправки email
+                if report_path.stat().st_size <= settings.INACTIVE_USERS_REPORT_ATTACHMENT_MAX_SIZE:
+                    email.attach_file(str(report_path), 'text/csv')
+                email.send(fail_silently=True)
+            except Exception as e:
+                logger.warning(f'Не удалось отправить отчет администратору: {e}')
             
             return f'Заблокировано {count} пользователей'
         else:
+            report_path.unlink()
             logger.info('Нет неактивных пользователей для блокировки')
             return 'Нет неактивных пользователей'
             
@@ -1,3 +1,388 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.db import connection
+from django.core import mail
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from materials import renderers
+from materials.models import Course, Lesson
+from materials.permissions import IsModerator
+from .authentication import ClaimsJWTAuthentication
+from .hashers import HashingPoolSaturated, hashing_pool
+from .models import Payment
+from .tasks import _deactivate_inactive_batch, check_inactive_users
+from .user_cache import get_user as get_cached_user, local_users
+
+User = get_user_model()
+
+
+class PaymentListTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='user@test.com',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.user)
+
+        self.course = Course.objects.create(
+            title='Курс',
+            description='Описание курса',
+            owner=self.user
+        )
+        self.lesson = Lesson.objects.create(
+            title='Урок',
+            description='Описание урока',
+            video_link='https://www.youtube.com/watch?v=test',
+            course=self.course,
+            owner=self.user
+        )
+
+    def create_payments(self, count):
+        Payment.objects.bulk_create([
+            Payment(
+                user=self.user,
+                course_id=self.course.id if i % 2 == 0 else None,
+                lesson_id=self.lesson.id if i % 2 else None,
+                amount=100,
+                payment_method='cash'
+            )
+            for i in range(count)
+        ])
+
+    def test_titles_resolved_in_bulk(self):
+        """Названия курсов и уроков загружаются двумя запросами на страницу"""
+        self.create_payments(10)
+        # COUNT, выборка платежей с пользователем, in_bulk курсов, in_bulk уроков
+        with self.assertNumQueries(4):
+            response = self.client.get('/api/v1/users/payments/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        titles = {(p['course_title'], p['lesson_title']) for p in response.data['results']}
+        self.assertEqual(titles, {('Курс', None), (None, 'Урок')})
+
+    def test_related_object_is_cached(self):
+        """Повторное обращение к свойству не делает запросов"""
+        self.create_payments(1)
+        payment = Payment.objects.get()
+        with self.assertNumQueries(1):
+            self.assertEqual(payment.course, self.course)
+            self.assertEqual(payment.course, self.course)
+
+    def test_sparse_fields(self):
+        """?fields= отбрасывает лишние связи и запросы названий"""
+        self.create_payments(2)
+        # COUNT и выборка платежей с email пользователя, без in_bulk
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/users/payments/?fields=amount,user_email')
+        self.assertEqual(response.data['results'][0], {'user_email': 'user@test.com', 'amount': '100.00'})
+
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/users/payments/?fields=course_title')
+        self.assertCountEqual([p['course_title'] for p in response.data['results']], [None, 'Курс'])
+
+    def test_keyset_pagination_newest_first(self):
+        self.create_payments(15)
+        ids = []
+        url = '/api/v1/users/payments/?pagination=cursor'
+        while url:
+            response = self.client.get(url)
+            ids.extend(payment['id'] for payment in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(ids, list(Payment.objects.order_by('-payment_date', '-id').values_list('id', flat=True)))
+
+    def test_missing_course_resolves_to_none(self):
+        Payment.objects.create(user=self.user, course_id=999, amount=100, payment_method='cash')
+        response = self.client.get('/api/v1/users/payments/')
+        self.assertIsNone(response.data['results'][0]['course_title'])
+
+    def test_export_all_users_for_admin(self):
+        """Выгрузка платежей доступна администратору и включает всех пользователей"""
+        self.create_payments(3)
+        admin = User.objects.create_superuser(email='admin@test.com', password='testpass123')
+        Payment.objects.create(user=admin, course_id=self.course.id, amount=50, payment_method='transfer')
+
+        response = self.client.get('/api/v1/users/payments/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=admin)
+        response = self.client.get(f'/api/v1/users/payments/export/?course_id={self.course.id}&export_format=csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode('utf-8-sig').splitlines()))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row['user__email'] for row in rows}, {'user@test.com', 'admin@test.com'})
+        self.assertEqual(rows[-1]['amount'], '50.00')
+
+    def test_ndjson_export_format_does_not_depend_on_encoder(self):
+        """Сумма - строкой без потери точности, дата - одним ISO-форматом с orjson и без него"""
+        admin = User.objects.create_superuser(email='admin@test.com', password='testpass123')
+        payment = Payment.objects.create(user=admin, amount='1234567.89', payment_method='cash')
+        self.client.force_authenticate(user=admin)
+
+        lines = []
+        for encoder in (renderers.orjson, None):
+            with mock.patch('materials.renderers.orjson', encoder):
+                response = self.client.get('/api/v1/users/payments/export/')
+                lines.append(b''.join(response.streaming_content))
+        self.assertEqual(lines[0], lines[1])
+
+        row = json.loads(lines[0])
+        self.assertEqual(row['amount'], '1234567.89')
+        self.assertEqual(row['payment_date'], payment.payment_date.isoformat().replace('+00:00', 'Z'))
+
+
+class CheckInactiveUsersTestCase(TestCase):
+    def setUp(self):
+        self.report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.report_dir.cleanup)
+
+        long_ago = timezone.now() - timedelta(days=31)
+        self.inactive = [
+            User.objects.create_user(email=f'inactive{i}@test.com', last_login=long_ago)
+            for i in range(5)
+        ]
+        self.active = User.objects.create_user(email='active@test.com', last_login=timezone.now())
+        self.admin = User.objects.create_superuser(email='admin@test.com', last_login=long_ago)
+
+    def run_task(self, **settings):
+        with override_settings(INACTIVE_USERS_REPORT_DIR=self.report_dir.name, **settings):
+            return check_inactive_users()
+
+    def test_default_report_dir_is_not_public(self):
+        report_dir = Path(settings.INACTIVE_USERS_REPORT_DIR).resolve()
+        self.assertFalse(report_dir.is_relative_to(Path(settings.MEDIA_ROOT).resolve()))
+
+    def test_inactive_users_blocked_in_batches(self):
+        with mock.patch('users.tasks._deactivate_inactive_batch', wraps=_deactivate_inactive_batch) as batch:
+            result = self.run_task(INACTIVE_USERS_BATCH_SIZE=2)
+
+        # 3 пачки по 2 пользователя и пустая пачка-признак окончания
+        self.assertEqual(batch.call_count, 4)
+
+        self.assertEqual(result, 'Заблокировано 5 пользователей')
+        self.assertFalse(User.objects.filter(email__startswith='inactive', is_active=True).exists())
+        self.assertTrue(User.objects.get(pk=self.active.pk).is_active)
+        self.assertTrue(User.objects.get(pk=self.admin.pk).is_active)
+
+    def test_report_streamed_to_file_and_attached(self):
+        self.run_task(INACTIVE_USERS_BATCH_SIZE=2)
+
+        report_path, = Path(self.report_dir.name).iterdir()
+        with open(report_path, encoding='utf-8') as report:
+            rows = list(csv.DictReader(report))
+        self.assertEqual(
+            [row['email'] for row in rows],
+            [f'inactive{i}@test.com' for i in range(5)]
+        )
+
+        message, = mail.outbox
+        self.assertEqual(message.subject, 'Заблокировано 5 неактивных пользователей')
+        self.assertEqual(message.attachments[0][0], report_path.name)
+
+    def test_large_report_is_not_attached(self):
+        self.run_task(INACTIVE_USERS_REPORT_ATTACHMENT_MAX_SIZE=10)
+        self.assertEqual(mail.outbox[0].attachments, [])
+
+    def test_nothing_to_block(self):
+        User.objects.update(last_login=timezone.now())
+        self.assertEqual(self.run_task(), 'Нет неактивных пользователей')
+        self.assertEqual(list(Path(self.report_dir.name).iterdir()), [])
+
+
+@override_settings(SHARED_CACHE=True)
+class RoleClaimsTestCase(TestCase):
+    """Чтение по claims ролей из JWT без запроса пользователя"""
+
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        self.addCleanup(local_users.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='moderator@test.com', password='testpass123')
+        self.user.groups.add(Group.objects.create(name='moderators'))
+        self.course = Course.objects.create(title='Курс', description='Описание', owner=self.user)
+
+    def obtain_token(self):
+        response = self.client.post(
+            '/api/v1/users/token/', {'email': 'moderator@test.com', 'password': 'testpass123'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        return AccessToken(response.data['access'])
+
+    def user_queries(self, method, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url)
+        self.assertLess(response.status_code, 400)
+        return [query['sql'] for query in queries if 'FROM "users_user"' in query['sql']]
+
+    def test_token_contains_roles(self):
+        token = self.obtain_token()
+        self.assertEqual(token['groups'], ['moderators'])
+        self.assertFalse(token['is_staff'])
+        self.assertIn('roles_version', token)
+
+    def test_reads_skip_user_select(self):
+        self.obtain_token()
+        self.assertEqual(self.user_queries('get', '/api/v1/materials/courses/'), [])
+        # Запись загружает пользователя (через кеш пользователей)
+        self.assertTrue(self.user_queries('post', f'/api/v1/materials/courses/{self.course.id}/subscribe/'))
+        # Представления без ClaimsJWTAuthentication получают объект модели
+        response = self.client.get('/api/v1/users/profile/')
+        self.assertEqual(response.data['email'], 'moderator@test.com')
+
+    def test_claims_user_roles(self):
+        token = self.obtain_token()
+        user = ClaimsJWTAuthentication().get_claims_user(token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.email, 'moderator@test.com')
+        with self.assertNumQueries(0):
+            self.assertTrue(IsModerator().has_permission(mock.Mock(user=user), None))
+
+    @override_settings(SHARED_CACHE=False)
+    def test_claims_ignored_without_shared_cache(self):
+        token = self.obtain_token()
+        self.assertIsNone(ClaimsJWTAuthentication().get_claims_user(token))
+        self.assertTrue(self.user_queries('get', '/api/v1/materials/courses/'))
+
+    def test_role_change_revokes_claims(self):
+        self.obtain_token()
+        self.user.groups.clear()
+        self.assertTrue(self.user_queries('get', '/api/v1/materials/courses/'))
+
+    def test_deactivation_revokes_claims(self):
+        self.obtain_token()
+        User.objects.filter(pk=self.user.pk).update(is_active=False, last_login=timezone.now() - timedelta(days=31))
+        User.objects.filter(pk=self.user.pk).update(is_active=True)
+        _deactivate_inactive_batch(timezone.now() - timedelta(days=30), 0, 10)
+        response = self.client.get('/api/v1/materials/courses/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserCacheTestCase(TestCase):
+    """Пользователь для JWT-аутентификации берется из кеша"""
+
+    def setUp(self):
+        cache.clear()
+        local_users.clear()
+        self.addCleanup(local_users.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='user@test.com', password='testpass123', city='Москва',
+            last_login=timezone.now() - timedelta(days=31)
+        )
+        token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def user_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/users/profile/')
+        return response, [query['sql'] for query in queries if 'FROM "users_user"' in query['sql']]
+
+    def test_user_select_is_cached(self):
+        response, queries = self.user_queries()
+        self.assertEqual(response.data['city'], 'Москва')
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"password"', queries[0])
+
+        response, queries = self.user_queries()
+        self.assertEqual(response.data['email'], 'user@test.com')
+        self.assertEqual(queries, [])
+
+        # Другой процесс: локального кеша нет, строка берется из общего
+        with override_settings(SHARED_CACHE=True):
+            local_users.clear()
+            self.user_queries()
+            local_users.clear()
+            self.assertEqual(self.user_queries()[1], [])
+
+    def test_local_memory_cache_is_not_shared_tier(self):
+        self.user_queries()
+        local_users.clear()
+        # Без общего кеша другой процесс читает строку из БД
+        self.assertEqual(len(self.user_queries()[1]), 1)
+
+    def test_save_invalidates_cache(self):
+        self.user_queries()
+        response = self.client.patch('/api/v1/users/profile/', {'city': 'Казань'}, format='json')
+        self.assertEqual(response.data['city'], 'Казань')
+        response, queries = self.user_queries()
+        self.assertEqual(response.data['city'], 'Казань')
+        self.assertEqual(len(queries), 1)
+
+    def test_bulk_deactivation_invalidates_cache(self):
+        self.user_queries()
+        _deactivate_inactive_batch(timezone.now() - timedelta(days=30), 0, 10)
+        response, _ = self.user_queries()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(USER_CACHE_LOCAL_SIZE=1)
+    def test_local_cache_is_bounded(self):
+        other = User.objects.create_user(email='other@test.com', password='testpass123')
+        get_cached_user(self.user.pk)
+        get_cached_user(other.pk)
+        self.assertEqual(list(local_users.entries), [other.pk])
+
+
+@override_settings(
+    PASSWORD_HASHERS=[
+        'users.hashers.TunedPBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    ],
+    PASSWORD_PBKDF2_ITERATIONS=1000,
+)
+class PasswordHashingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(email='user@test.com', password='testpass123')
+
+    def obtain_token(self):
+        return self.client.post(
+            '/api/v1/users/token/', {'email': 'user@test.com', 'password': 'testpass123'}, format='json'
+        )
+
+    def test_new_password_uses_tuned_parameters(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_legacy_hash_is_replaced_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('testpass123', hasher='pbkdf2_sha1'))
+        self.assertEqual(self.obtain_token().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+
+    def test_changed_parameters_rehash_on_login(self):
+        with override_settings(PASSWORD_PBKDF2_ITERATIONS=2000):
+            self.assertEqual(self.obtain_token().status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$2000$'))
+
+    @override_settings(PASSWORD_HASHING_WORKERS=1)
+    def test_single_worker_pool_does_not_deadlock(self):
+        # verify PBKDF2 вызывает encode изнутри пула
+        self.assertTrue(check_password('testpass123', self.user.password))
+        self.assertFalse(check_password('wrong', self.user.password))
+
+    @override_settings(PASSWORD_HASHING_MAX_PENDING=0)
+    def test_overloaded_pool_rejects_login(self):
+        response = self.obtain_token()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(hashing_pool.pending, 0)
+        # Вне API - собственное исключение, а не ответ DRF
+        with self.assertRaises(HashingPoolSaturated):
+            check_password('testpass123', self.user.password)
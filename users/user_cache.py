@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from materials.services.role_service import bump_roles_version, get_roles_version
+
+KEY_PREFIX = 'users'
+
+# Хеш пароля в кеш не попадает: при обращении к нему поле дозагружается из БД
+EXCLUDED_FIELDS = ('password',)
+
+
+class LocalUserCache:
+    """
+    LRU-кеш строк пользователей в памяти процесса.
+
+    Записи живут USER_CACHE_LOCAL_TIMEOUT секунд, размер ограничен
+    USER_CACHE_LOCAL_SIZE. Изменения в других процессах становятся
+    видны не позже чем через USER_CACHE_LOCAL_TIMEOUT.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, values = entry
+            if expires_at <= time.monotonic():
+                del self.entries[user_id]
+                return None
+            self.entries.move_to_end(user_id)
+            return values
+
+    def set(self, user_id, values):
+        with self.lock:
+            self.entries[user_id] = (time.monotonic() + settings.USER_CACHE_LOCAL_TIMEOUT, values)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > settings.USER_CACHE_LOCAL_SIZE:
+                self.entries.popitem(last=False)
+
+    def delete(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_users = LocalUserCache()
+
+
+def _fields():
+    # Порядок concrete_fields нужен Model.from_db для отложенных полей
+    return [
+        field.attname for field in get_user_model()._meta.concrete_fields
+        if field.attname not in EXCLUDED_FIELDS
+    ]
+
+
+def _shared_key(user_id, version):
+    return f'{KEY_PREFIX}:user:{user_id}:{version}'
+
+
+def get_user(user_id):
+    """
+    Пользователь по id: из кеша процесса, общего кеша (Redis) или БД.
+
+    Запись общего кеша привязана к версии ролей пользователя, которую
+    сдвигает любое его изменение (users.signals, invalidate_users),
+    и живет не дольше USER_CACHE_TIMEOUT. Без SHARED_CACHE сдвиг из
+    другого процесса (Celery) сюда не дойдет, поэтому общий уровень
+    пропускается и строка читается из БД. Каждый вызов возвращает новый
+    объект, поэтому изменения request.user не попадают в другие запросы.
+    None - пользователя нет.
+    """
+    User = get_user_model()
+    user_id = User._meta.pk.to_python(user_id)
+    fields = _fields()
+
+    values = local_users.get(user_id)
+    if values is None:
+        key = _shared_key(user_id, get_roles_version(user_id)) if settings.SHARED_CACHE else None
+        values = cache.get(key) if key else None
+        if values is None:
+            values = User.objects.filter(pk=user_id).values(*fields).first()
+            if values is None:
+                return None
+            if key:
+                cache.set(key, values, settings.USER_CACHE_TIMEOUT)
+        local_users.set(user_id, values)
+    return User.from_db(DEFAULT_DB_ALIAS, fields, [values[field] for field in fields])
+
+
+def forget_users(user_ids):
+    """Убирает пользователей из кеша этого процесса"""
+    for user_id in user_ids:
+        local_users.delete(user_id)
+
+
+def invalidate_users(user_ids):
+    """
+    Сбрасывает кеш пользователей, измененных без сигналов (update()).
+    Записи общего кеша становятся недоступны со сдвигом версии ролей
+    """
+    bump_roles_version(user_ids)
+    forget_users(user_ids)
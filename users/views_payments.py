@@ -2,16 +2,22 @@ from rest_framework import viewsets, filters
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
 
+from materials.mixins import ExportMixin, SparseFieldsetMixin
 from .models import Payment  # Импортируем из models.py
+from .paginators import PaymentPagination
 from .serializers_payments import PaymentSerializer, PaymentCreateSerializer
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
-    """ViewSet для управления платежами"""
+class PaymentViewSet(SparseFieldsetMixin, ExportMixin, viewsets.ModelViewSet):
+    """ViewSet для управления платежами и их потоковой выгрузки (payments/export/)"""
     permission_classes = [IsAuthenticated]
+    pagination_class = PaymentPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['course_id', 'lesson_id', 'payment_method']
     ordering_fields = ['payment_date', 'amount']
+    export_fields = ('id', 'user_id', 'user__email', 'payment_date', 'course_id', 'lesson_id',
+                     'amount', 'payment_method')
+    export_filename = 'payments'
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -19,8 +25,11 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return PaymentSerializer
     
     def get_queryset(self):
+        # Выгрузка доступна только администраторам и включает платежи всех пользователей
+        if self.action == 'export':
+            return Payment.objects.all()
         # Пользователь видит только свои платежи
-        return Payment.objects.filter(user=self.request.user)
+        return Payment.objects.filter(user=self.request.user).select_related('user')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)